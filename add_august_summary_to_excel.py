@@ -1,7 +1,36 @@
 import pandas as pd
-from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
+from august_metrics import AugustMetrics, VWE_COLUMN, format_percentage
+from binning import column_range
+from derived_columns import DerivedColumnEngine
+from sheet_writer import write_dataframe
+from xlsx_patch import inject_sheets, new_sheet
+
+# Hidden sheet holding the per-student helper columns the summary formulas read.
+# The August data sheet is left untouched, so its content hash (and every
+# cached result keyed on it) survives running this report.
+HELPER_SHEET = 'August_Helpers'
+HELPER_RULES = [
+    {'column': 'Industry_Module_Count', 'type': 'industry_count'},
+    {'column': 'Modules_Per_Session', 'type': 'tags_per_session'},
+]
+
+def breakdown_rows(metrics, name, range_ref, total_label, total_formula):
+    """Breakdown table rows with the COUNTIFS formula reproducing each count"""
+    spec, _ = metrics.breakdowns()[name]
+    table = metrics.breakdown(name, total_label)
+    formulas = spec.countifs_formulas(range_ref) + [total_formula]
+    return [[row.Label, row.Count, format_percentage(row.Percentage), formula]
+            for row, formula in zip(table.itertuples(index=False), formulas)]
+
+def helper_sheet(august_df):
+    """Hidden sheet with the student email and helper columns, one row per August data row"""
+    helpers = DerivedColumnEngine(HELPER_RULES).evaluate(august_df)
+    helpers.insert(0, 'Email', august_df['Email'])
+    sheet = new_sheet(HELPER_SHEET)
+    write_dataframe(sheet, helpers)
+    return sheet
 
 def add_august_summary_to_excel():
     """Add August metrics summary to the Excel file with proper formatting"""
@@ -10,14 +39,19 @@ def add_august_summary_to_excel():
         file_path = "August_Export_SD_2_Sept_updated.xlsx"
         print(f"Adding August metrics summary to: {file_path}")
         
-        # Load the workbook
-        workbook = load_workbook(file_path)
+        # Compute the metrics from the August sheet and the helper columns beside it
+        metrics = AugustMetrics.from_excel(file_path)
+        helpers = helper_sheet(metrics.august_df)
         
-        # Create or get the August Summary sheet
-        if 'August_Summary' in workbook.sheetnames:
-            workbook.remove(workbook['August_Summary'])
+        # Bounded ranges over the August data rows and the matching helper rows
+        last_row = metrics.total_students + 1
+        vwe_range = column_range('August', metrics.column_letter(VWE_COLUMN), 2, last_row)
+        industry_count_range = column_range(HELPER_SHEET, 'B', 2, last_row)
+        session_range = column_range(HELPER_SHEET, 'C', 2, last_row)
+        student_range = column_range('August', 'A', 2, last_row)
         
-        summary_sheet = workbook.create_sheet('August_Summary')
+        # Build the August Summary sheet on its own; an existing one is replaced when it is injected
+        summary_sheet = new_sheet('August_Summary')
         
         # Define styles
         title_font = Font(bold=True, size=16, color="FFFFFF")
@@ -53,26 +87,26 @@ def add_august_summary_to_excel():
         data_rows = [
             {
                 'Metric': 'Total Students in August',
-                'Value': 374,
-                'Formula': '=COUNTA(August!A:A)-1',
+                'Value': metrics.total_students,
+                'Formula': f'=ROWS({student_range})',
                 'Description': 'Total number of students in August dataset'
             },
             {
                 'Metric': 'Average VWE modules commenced per student',
-                'Value': 1.60,
-                'Formula': '=AVERAGE(August!K:K)',
+                'Value': round(metrics.avg_vwe, 2),
+                'Formula': f'=AVERAGE({vwe_range})',
                 'Description': 'Average Virtual Work Experience modules started per student'
             },
             {
                 'Metric': 'Average industry-based modules completed per student',
-                'Value': 4.13,
-                'Formula': '=AVERAGE(Industry_Module_Count)',
+                'Value': round(metrics.avg_industry_modules, 2),
+                'Formula': f'=AVERAGE({industry_count_range})',
                 'Description': 'Average number of industry modules completed per student'
             },
             {
                 'Metric': 'Average modules engaged with per session per student',
-                'Value': 2.54,
-                'Formula': '=AVERAGE(Modules_Per_Session)',
+                'Value': round(metrics.avg_modules_per_session, 2),
+                'Formula': f'=AVERAGE({session_range})',
                 'Description': 'Average modules engaged per web session per student'
             }
         ]
@@ -99,14 +133,8 @@ def add_august_summary_to_excel():
         summary_sheet.cell(row=row_start, column=1, value="VWE MODULES BREAKDOWN").font = Font(bold=True, size=14)
         summary_sheet.merge_cells(f'A{row_start}:D{row_start}')
         
-        vwe_breakdown = [
-            ['VWE Level', 'Count', 'Percentage', 'Formula'],
-            ['1 Module', 103, '53.6%', '=COUNTIF(August!K:K,1)'],
-            ['2 Modules', 66, '34.4%', '=COUNTIF(August!K:K,2)'],
-            ['3 Modules', 19, '9.9%', '=COUNTIF(August!K:K,3)'],
-            ['4 Modules', 4, '2.1%', '=COUNTIF(August!K:K,4)'],
-            ['Total with VWE', 192, '100.0%', '=COUNTA(August!K:K)']
-        ]
+        vwe_breakdown = [['VWE Level', 'Count', 'Percentage', 'Formula']]
+        vwe_breakdown += breakdown_rows(metrics, 'VWE', vwe_range, 'Total with VWE', f'=COUNT({vwe_range})')
         
         for row_idx, row_data in enumerate(vwe_breakdown, row_start + 1):
             for col_idx, value in enumerate(row_data, 1):
@@ -121,17 +149,13 @@ def add_august_summary_to_excel():
                         cell.font = Font(bold=True)
         
         # Industry Modules Breakdown
-        row_start = 18
+        row_start += len(vwe_breakdown) + 2
         summary_sheet.cell(row=row_start, column=1, value="INDUSTRY MODULES BREAKDOWN").font = Font(bold=True, size=14)
         summary_sheet.merge_cells(f'A{row_start}:D{row_start}')
         
-        industry_breakdown = [
-            ['Module Count Range', 'Students', 'Percentage', 'Formula'],
-            ['1-3 Modules', 168, '50.5%', '=COUNTIFS(Industry_Module_Count,"<=3")'],
-            ['4-6 Modules', 117, '35.1%', '=COUNTIFS(Industry_Module_Count,">=4",Industry_Module_Count,"<=6")'],
-            ['7+ Modules', 48, '14.4%', '=COUNTIFS(Industry_Module_Count,">=7")'],
-            ['Total with Industry Data', 333, '100.0%', '=COUNTA(August!J:J)']
-        ]
+        industry_breakdown = [['Module Count Range', 'Students', 'Percentage', 'Formula']]
+        industry_breakdown += breakdown_rows(metrics, 'Industry', industry_count_range, 'Total with Industry Data',
+                                             f'=COUNT({industry_count_range})')
         
         for row_idx, row_data in enumerate(industry_breakdown, row_start + 1):
             for col_idx, value in enumerate(row_data, 1):
@@ -146,17 +170,13 @@ def add_august_summary_to_excel():
                         cell.font = Font(bold=True)
         
         # Engagement Breakdown
-        row_start = 26
+        row_start += len(industry_breakdown) + 2
         summary_sheet.cell(row=row_start, column=1, value="ENGAGEMENT PER SESSION BREAKDOWN").font = Font(bold=True, size=14)
         summary_sheet.merge_cells(f'A{row_start}:D{row_start}')
         
-        engagement_breakdown = [
-            ['Modules per Session', 'Students', 'Percentage', 'Formula'],
-            ['0-2 Modules', 135, '49.6%', '=COUNTIFS(Modules_Per_Session,"<=2")'],
-            ['3-5 Modules', 98, '36.0%', '=COUNTIFS(Modules_Per_Session,">=3",Modules_Per_Session,"<=5")'],
-            ['6+ Modules', 39, '14.4%', '=COUNTIFS(Modules_Per_Session,">=6")'],
-            ['Total with Engagement Data', 272, '100.0%', '=COUNTA(August!E:E)']
-        ]
+        engagement_breakdown = [['Modules per Session', 'Students', 'Percentage', 'Formula']]
+        engagement_breakdown += breakdown_rows(metrics, 'Session', session_range, 'Total with Engagement Data',
+                                               f'=COUNT({session_range})')
         
         for row_idx, row_data in enumerate(engagement_breakdown, row_start + 1):
             for col_idx, value in enumerate(row_data, 1):
@@ -171,7 +191,7 @@ def add_august_summary_to_excel():
                         cell.font = Font(bold=True)
         
         # Add notes section
-        row_start = 35
+        row_start += len(engagement_breakdown) + 2
         summary_sheet.cell(row=row_start, column=1, value="NOTES & DEFINITIONS").font = Font(bold=True, size=14, color="FFFFFF")
         summary_sheet.merge_cells(f'A{row_start}:D{row_start}')
         summary_sheet.cell(row=row_start, column=1).fill = title_fill
@@ -209,8 +229,8 @@ def add_august_summary_to_excel():
             adjusted_width = min(max_length + 2, 50)
             summary_sheet.column_dimensions[column_letter].width = adjusted_width
         
-        # Save the workbook
-        workbook.save(file_path)
+        # Add both sheets without loading or rewriting the rest of the workbook
+        inject_sheets(file_path, [summary_sheet, helpers], hidden=[HELPER_SHEET])
         print(f"August summary sheet added successfully to: {file_path}")
         
         # Display what was added
@@ -1,6 +1,6 @@
 import pandas as pd
-from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill
+from xlsx_patch import inject_sheet, load_sheet, sheet_names
 
 def add_formulas_to_comparison():
     """Add Excel formulas to the comparison sheet for calculating increases"""
@@ -9,15 +9,12 @@ def add_formulas_to_comparison():
         file_path = "August_Export_SD_2_Sept_updated.xlsx"
         print(f"Adding formulas to: {file_path}")
         
-        # Load the workbook
-        workbook = load_workbook(file_path)
-        
-        # Get the comparison sheet
-        if 'July_August_Comparison' not in workbook.sheetnames:
+        # Load only the comparison sheet
+        if 'July_August_Comparison' not in sheet_names(file_path):
             print("Error: July_August_Comparison sheet not found!")
             return
         
-        comparison_sheet = workbook['July_August_Comparison']
+        comparison_sheet = load_sheet(file_path, 'July_August_Comparison')
         
         # Add formula headers
         print("Adding formula headers...")
@@ -128,8 +125,8 @@ def add_formulas_to_comparison():
             elif i > 0 and i <= 3:  # Formula rows
                 cell.font = Font(bold=True, color="0000FF")
         
-        # Save the workbook
-        workbook.save(file_path)
+        # Write the sheet back without rewriting the rest of the workbook
+        inject_sheet(file_path, comparison_sheet)
         print(f"Formulas and summary added successfully to: {file_path}")
         
         # Show what was added
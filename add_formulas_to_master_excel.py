@@ -7,67 +7,39 @@ that automatically calculate the data from the August sheet.
 
 import pandas as pd
 import openpyxl
-from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 import numpy as np
 import re
+from industry_mapping import INDUSTRY_ORDER, load_industry_mapping
+from xlsx_patch import inject_sheets, new_sheet, sheet_names
 
 def add_industry_preferences_with_formulas():
     """Add industry preferences table with Excel formulas to the master Excel file"""
     
     master_file = "August Export_SD 2 Sept.xlsx"
     
-    # Load the master workbook
+    # Check existing sheets without loading the master workbook
     print(f"Loading master Excel file: {master_file}")
-    wb = load_workbook(master_file)
-    
-    # Check existing sheets
-    print(f"Existing sheets: {wb.sheetnames}")
+    existing_sheets = sheet_names(master_file)
+    print(f"Existing sheets: {existing_sheets}")
     
     # Load data from existing sheets to understand structure
     print("Analyzing data structure...")
     august_data = pd.read_excel(master_file, sheet_name='August')
-    industry_mapping = {}
-    
-    # Load industry mapping from Sheet 7
-    sheet7_data = pd.read_excel(master_file, sheet_name='Sheet7', header=None)
-    for i in range(2, len(sheet7_data)):
-        row = sheet7_data.iloc[i]
-        if pd.notna(row[1]) and pd.notna(row[2]):
-            industry_number = int(row[1])
-            industry_name = str(row[2]).strip()
-            industry_mapping[industry_number] = industry_name
-    
+    industry_mapping = load_industry_mapping(master_file)
     print(f"Loaded {len(industry_mapping)} industry mappings")
     
     # Define the exact industry order requested
-    industry_order = [
-        'Accounting', 'Advertising, Media, Journalism, and Communications',
-        'Agriculture and Environment', 'Animals and Vet', 'Architecture',
-        'Arts, Humanities, and Politics', 'Building and Construction',
-        'Business and Commerce', 'Community and Social Work',
-        'Creative Arts and Music', 'Design', 'Economics and Finance',
-        'Education, Childcare and Teaching', 'Engineering', 'Entrepreneur',
-        'Food and Beverage', 'Government, Defence and Policing',
-        'Hair and Beauty', 'Health and Sport Sciences', 'Law',
-        'Marketing and Public Relations', 'Mathematics',
-        'Medical Sciences and Medicine', 'Nursing and Midwifery',
-        'Property and Real Estate', 'Psychology', 'Science', 'Technology',
-        'Trades and Mining', 'Sports', 'Transport, Tourism and Hospitality',
-        'Fashion', 'Australian Defence Force', 'Energy'
-    ]
+    industry_order = INDUSTRY_ORDER
     
     # Create new sheet in master workbook
     print("Creating Industry Preferences with Formulas sheet in master workbook...")
     
-    # Remove existing sheet if it exists
-    if "Industry Preferences with Formulas" in wb.sheetnames:
-        wb.remove(wb["Industry Preferences with Formulas"])
-        print("Removed existing Industry Preferences with Formulas sheet")
-    
-    # Create new sheet
-    ws = wb.create_sheet("Industry Preferences with Formulas")
+    # Build the sheet on its own; an existing sheet of the same name is replaced when it is injected
+    if "Industry Preferences with Formulas" in existing_sheets:
+        print("Replacing existing Industry Preferences with Formulas sheet")
+    ws = new_sheet("Industry Preferences with Formulas")
     
     # Title
     ws.merge_cells('A1:L1')
@@ -116,12 +88,7 @@ def add_industry_preferences_with_formulas():
     # Add formulas for Engineering faculty
     print("Adding Engineering faculty formulas...")
     for row_idx, industry in enumerate(industry_order, 4):
-        # Find the industry number for this industry
-        industry_num = None
-        for num, name in industry_mapping.items():
-            if name == industry:
-                industry_num = num
-                break
+        industry_num = industry_mapping.code(industry)
         
         if industry_num is not None:
             # Add formulas for each year
@@ -134,12 +101,7 @@ def add_industry_preferences_with_formulas():
     # Add formulas for Arts faculty
     print("Adding Arts faculty formulas...")
     for row_idx, industry in enumerate(industry_order, 4):
-        # Find the industry number for this industry
-        industry_num = None
-        for num, name in industry_mapping.items():
-            if name == industry:
-                industry_num = num
-                break
+        industry_num = industry_mapping.code(industry)
         
         if industry_num is not None:
             # Add formulas for each year
@@ -205,10 +167,7 @@ def add_industry_preferences_with_formulas():
     
     # Create a formula explanation sheet
     print("Creating formula explanation sheet...")
-    if "Formula Guide" in wb.sheetnames:
-        wb.remove(wb["Formula Guide"])
-    
-    ws_guide = wb.create_sheet("Formula Guide")
+    ws_guide = new_sheet("Formula Guide")
     
     # Title
     ws_guide.merge_cells('A1:C1')
@@ -266,9 +225,9 @@ def add_industry_preferences_with_formulas():
         adjusted_width = min(max_length + 2, 50)
         ws_guide.column_dimensions[column_letter].width = adjusted_width
     
-    # Save the updated master workbook
+    # Add both sheets to the master workbook without rewriting the other sheets
     print("Saving updated master workbook...")
-    wb.save(master_file)
+    inject_sheets(master_file, [ws, ws_guide])
     
     print(f"\n✅ Successfully added 'Industry Preferences with Formulas' sheet to {master_file}")
     print("The table now contains Excel formulas that automatically calculate from your data!")
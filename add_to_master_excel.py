@@ -7,114 +7,46 @@ directly to the master Excel file "August Export_SD 2 Sept.xlsx".
 
 import pandas as pd
 import openpyxl
-from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 import numpy as np
-import re
+from cohorts import CohortIndex
+from count_cube import engineering_vs_arts, industry_cube
+from industry_mapping import INDUSTRY_ORDER, load_industry_mapping
+from ranking import top_k_indices
+from xlsx_patch import inject_sheet, new_sheet, sheet_names
 
 def add_industry_preferences_to_master():
     """Add industry preferences table to the master Excel file"""
     
     master_file = "August Export_SD 2 Sept.xlsx"
     
-    # Load the master workbook
+    # Check existing sheets without loading the master workbook
     print(f"Loading master Excel file: {master_file}")
-    wb = load_workbook(master_file)
-    
-    # Check existing sheets
-    print(f"Existing sheets: {wb.sheetnames}")
+    print(f"Existing sheets: {sheet_names(master_file)}")
     
     # Load data from existing sheets
     print("Loading data from existing sheets...")
     august_data = pd.read_excel(master_file, sheet_name='August')
-    industry_mapping = {}
-    
-    # Load industry mapping from Sheet 7
-    sheet7_data = pd.read_excel(master_file, sheet_name='Sheet7', header=None)
-    for i in range(2, len(sheet7_data)):
-        row = sheet7_data.iloc[i]
-        if pd.notna(row[1]) and pd.notna(row[2]):
-            industry_number = int(row[1])
-            industry_name = str(row[2]).strip()
-            industry_mapping[industry_number] = industry_name
-    
+    industry_mapping = load_industry_mapping(master_file)
     print(f"Loaded {len(industry_mapping)} industry mappings")
     
     # Define the exact industry order requested
-    industry_order = [
-        'Accounting', 'Advertising, Media, Journalism, and Communications',
-        'Agriculture and Environment', 'Animals and Vet', 'Architecture',
-        'Arts, Humanities, and Politics', 'Building and Construction',
-        'Business and Commerce', 'Community and Social Work',
-        'Creative Arts and Music', 'Design', 'Economics and Finance',
-        'Education, Childcare and Teaching', 'Engineering', 'Entrepreneur',
-        'Food and Beverage', 'Government, Defence and Policing',
-        'Hair and Beauty', 'Health and Sport Sciences', 'Law',
-        'Marketing and Public Relations', 'Mathematics',
-        'Medical Sciences and Medicine', 'Nursing and Midwifery',
-        'Property and Real Estate', 'Psychology', 'Science', 'Technology',
-        'Trades and Mining', 'Sports', 'Transport, Tourism and Hospitality',
-        'Fashion', 'Australian Defence Force', 'Energy'
-    ]
-    
-    # Initialize results table
-    results = {}
-    for industry in industry_order:
-        results[industry] = {
-            'Engineering': {'1st Year': 0, '2nd Year': 0, '3rd Year': 0, '4th Year': 0, '5th Year': 0},
-            'Arts': {'1st Year': 0, '2nd Year': 0, '3rd Year': 0, '4th Year': 0, '5th Year': 0}
-        }
-    
-    # Process each student
+    industry_order = INDUSTRY_ORDER
+    
+    # Count every student's preferences by industry, faculty and year group
     print("Processing student data...")
-    for _, student in august_data.iterrows():
-        # Get faculty
-        faculty = str(student.get('Faculty', '')).replace("'", "").replace("|", "").strip()
-        if "Faculty of Engineering" in faculty:
-            faculty_type = "Engineering"
-        elif "Faculty of Arts and Social Sciences" in faculty:
-            faculty_type = "Arts"
-        else:
-            continue  # Skip other faculties
-        
-        # Get year
-        year = str(student.get('Course Year', '')).replace("'", "").replace("|", "").strip()
-        if "1st Year" in year or year == "1":
-            year_type = "1st Year"
-        elif "2nd Year" in year or year == "2":
-            year_type = "2nd Year"
-        elif "3rd Year" in year or year == "3":
-            year_type = "3rd Year"
-        elif "4th Year" in year or year == "4":
-            year_type = "4th Year"
-        elif "5th Year" in year or year == "5":
-            year_type = "5th Year"
-        else:
-            continue  # Skip unknown years
-        
-        # Get industry preferences
-        industries_str = str(student.get('Industries', ''))
-        if pd.notna(industries_str) and industries_str != 'nan':
-            # Parse industry numbers
-            numbers = re.findall(r'\d+', industries_str)
-            for num in numbers:
-                industry_num = int(num)
-                if industry_num in industry_mapping:
-                    industry_name = industry_mapping[industry_num]
-                    if industry_name in results:
-                        results[industry_name][faculty_type][year_type] += 1
+    cube = industry_cube(industry_mapping, august_data['Industries'], CohortIndex(august_data))
+    focused = engineering_vs_arts(cube, industry_order)
+    table = focused.table()
     
     # Create new sheet in master workbook
     print("Creating Industry Preferences sheet in master workbook...")
     
-    # Remove existing sheet if it exists
-    if "Industry Preferences" in wb.sheetnames:
-        wb.remove(wb["Industry Preferences"])
-        print("Removed existing Industry Preferences sheet")
-    
-    # Create new sheet
-    ws = wb.create_sheet("Industry Preferences")
+    # Build the sheet on its own; an existing Industry Preferences sheet is replaced when it is injected
+    if "Industry Preferences" in sheet_names(master_file):
+        print("Replacing existing Industry Preferences sheet")
+    ws = new_sheet("Industry Preferences")
     
     # Title
     ws.merge_cells('A1:L1')
@@ -161,15 +93,9 @@ def add_industry_preferences_to_master():
         ws.cell(row=row_idx, column=1, value=industry)
         ws.cell(row=row_idx, column=1).font = Font(bold=True)
         
-        # Engineering data
-        for col_idx, year in enumerate(year_headers):
-            value = results[industry]['Engineering'][year]
-            ws.cell(row=row_idx, column=col_idx+2, value=value)
-        
-        # Arts data
-        for col_idx, year in enumerate(year_headers):
-            value = results[industry]['Arts'][year]
-            ws.cell(row=row_idx, column=col_idx+7, value=value)
+        # Engineering years, then Arts years
+        for col_idx, value in enumerate(table.loc[industry].tolist(), 2):
+            ws.cell(row=row_idx, column=col_idx, value=value)
     
     # Add borders
     thin_border = Border(
@@ -196,39 +122,34 @@ def add_industry_preferences_to_master():
         adjusted_width = min(max_length + 2, 50)
         ws.column_dimensions[column_letter].width = adjusted_width
     
-    # Save the updated master workbook
+    # Add the sheet to the master workbook without rewriting the other sheets
     print("Saving updated master workbook...")
-    wb.save(master_file)
+    inject_sheet(master_file, ws)
     
     # Print summary
     print("\n" + "="*80)
     print("INDUSTRY PREFERENCES SUMMARY")
     print("="*80)
     
-    total_engineering = sum(sum(results[industry]['Engineering'].values()) for industry in industry_order)
-    total_arts = sum(sum(results[industry]['Arts'].values()) for industry in industry_order)
+    faculty_totals = focused.marginal('faculty', 'industry')
+    total_engineering, total_arts = faculty_totals.sum(axis=1).tolist()
     
     print(f"Total Engineering preferences: {total_engineering}")
     print(f"Total Arts preferences: {total_arts}")
     print(f"Total preferences: {total_engineering + total_arts}")
     
     # Show top industries for each faculty
-    print("\nTop 5 Industries for Engineering:")
-    engineering_totals = [(industry, sum(results[industry]['Engineering'].values())) for industry in industry_order]
-    engineering_totals.sort(key=lambda x: x[1], reverse=True)
-    for i, (industry, count) in enumerate(engineering_totals[:5]):
-        print(f"  {i+1}. {industry}: {count}")
-    
-    print("\nTop 5 Industries for Arts:")
-    arts_totals = [(industry, sum(results[industry]['Arts'].values())) for industry in industry_order]
-    arts_totals.sort(key=lambda x: x[1], reverse=True)
-    for i, (industry, count) in enumerate(arts_totals[:5]):
-        print(f"  {i+1}. {industry}: {count}")
+    faculties = ['Engineering', 'Arts']
+    faculty_totals = faculty_totals.to_numpy()
+    for faculty, totals, top_industries in zip(faculties, faculty_totals, top_k_indices(faculty_totals, 5)):
+        print(f"\nTop 5 Industries for {faculty}:")
+        for rank, index in enumerate(top_industries, 1):
+            print(f"  {rank}. {industry_order[index]}: {totals[index]}")
     
     print(f"\n✅ Successfully added 'Industry Preferences' sheet to {master_file}")
     print("The table shows exactly the format you requested with all 34 industries!")
     
-    return results
+    return cube
 
 if __name__ == "__main__":
     print("ADDING INDUSTRY PREFERENCES TABLE TO MASTER EXCEL FILE")
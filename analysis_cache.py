@@ -0,0 +1,358 @@
+"""
+Analysis Result Cache
+This module memoizes computed analysis results on disk, keyed on the content
+hash of the input workbook (or of the individual sheets an analysis reads),
+the identity of the function that produced them, the source of the project
+modules that function can reach and its parameters.
+
+Results are stored as pickles in a local cache directory. When the directory
+grows beyond its size budget the least recently used entries are evicted, so
+re-running a report whose inputs have not changed skips the computation.
+Parsed sheets go to a memory-mapped column store beside them instead (see
+columnar_store.py), so every process reading a sheet shares one copy; each
+sheet store counts as one entry of the same budget.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import sysconfig
+import tempfile
+import types
+import zipfile
+
+import pandas as pd
+
+from columnar_store import load_mapped_sheet, store_entries, store_exists
+from xlsx_patch import sheet_part_names
+
+DEFAULT_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR", ".analysis_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_STDLIB_DIR = os.path.abspath(sysconfig.get_paths()["stdlib"])
+_file_hash_memo = {}
+
+
+def file_content_hash(path):
+    """Return the SHA-256 hex digest of a file's bytes"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _file_hash_memo:
+        return _file_hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    _file_hash_memo[memo_key] = digest.hexdigest()
+    return _file_hash_memo[memo_key]
+
+
+def sheet_content_hash(path, sheet_names):
+    """
+    Return a digest covering only the named sheets of an .xlsx workbook
+
+    Adding or restyling other sheets (summary and comparison sheets written
+    back into the same file) leaves the digest unchanged. Falls back to the
+    whole-file hash when the file is not a zip package or a sheet is missing.
+    """
+    if isinstance(sheet_names, str):
+        sheet_names = [sheet_names]
+
+    try:
+        with zipfile.ZipFile(path) as package:
+            parts = sheet_part_names(package)
+            digest = hashlib.sha256()
+            for sheet_name in sheet_names:
+                if sheet_name not in parts:
+                    return file_content_hash(path)
+                digest.update(sheet_name.encode("utf-8"))
+                digest.update(package.read(parts[sheet_name]))
+            # Cell text may live in the shared string table
+            if "xl/sharedStrings.xml" in package.namelist():
+                digest.update(package.read("xl/sharedStrings.xml"))
+            return digest.hexdigest()
+    except zipfile.BadZipFile:
+        return file_content_hash(path)
+
+
+def values_digest(values):
+    """Return an order-independent digest of a collection of values"""
+    digest = hashlib.sha256()
+    for value in sorted(str(v) for v in values):
+        digest.update(value.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, func_id, content_hash, params=None):
+        """Build the cache key for a function applied to some input content"""
+        digest = hashlib.sha256()
+        digest.update(func_id.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(content_hash.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(repr(_canonical_params(params)).encode("utf-8"))
+        return digest.hexdigest()
+
+    @property
+    def store_dir(self):
+        """Directory of the memory-mapped sheet stores"""
+        return os.path.join(self.cache_dir, "columns")
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Return (True, value) on a hit or (False, None) on a miss"""
+        if not self.enabled:
+            return False, None
+
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as handle:
+                value = pickle.load(handle)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            print(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return False, None
+
+        # Refresh the entry's position in the LRU order
+        os.utime(path, None)
+        return True, value
+
+    def put(self, key, value):
+        """Store a value and evict old entries if the cache is over budget"""
+        if not self.enabled:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(key)
+
+        # Write to a temporary file first so readers never see a partial pickle
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        self.evict()
+
+    def cached_call(self, func, content_hash, params=None, key_params=None):
+        """
+        Return func(**params) for this input, computing it only on a miss
+
+        The key covers the input content hash, the function's identity
+        (qualified name and bytecode), the source of its module and of every
+        project module that module imports (see source_identity) and the
+        parameters. Editing the function or any code it can reach therefore
+        invalidates its entries; so does editing unrelated code in those
+        modules. Pass key_params to key on a compact stand-in for large params.
+        """
+        params = params or {}
+        if key_params is None:
+            key_params = params
+        func_id = f"{function_identity(func)}:{source_identity(func)}"
+        key = self.make_key(func_id, content_hash, key_params)
+        hit, value = self.get(key)
+        if hit:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = func(**params)
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def evict(self):
+        """
+        Evict least recently used entries until the cache fits its budget
+
+        Each sheet store under store_dir counts as one entry, sized by its
+        files and as recent as its last open.
+        """
+        entries = store_entries(self.store_dir)
+        total_bytes = sum(size for _, size, _ in entries)
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return 0
+
+        for name in names:
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        evicted = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                self._remove(path)
+            total_bytes -= size
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        """Remove every cache entry and sheet store"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _canonical_params(params):
+    """Turn parameters into a stable, order-independent representation"""
+    if isinstance(params, dict):
+        return tuple(sorted((str(k), _canonical_params(v)) for k, v in params.items()))
+    if isinstance(params, (list, tuple)):
+        return tuple(_canonical_params(v) for v in params)
+    if isinstance(params, (set, frozenset)):
+        return tuple(sorted(repr(_canonical_params(v)) for v in params))
+    return params
+
+
+def function_identity(func):
+    """Identify a function by its qualified name and a digest of its code"""
+    func = getattr(func, "__func__", func)
+    digest = hashlib.sha256()
+    code = getattr(func, "__code__", None)
+    if code is not None:
+        _hash_code(code, digest)
+    else:
+        # Builtins and C extensions: fall back to the defining package version
+        package = sys.modules.get(func.__module__.split(".")[0])
+        digest.update(str(getattr(package, "__version__", "")).encode("utf-8"))
+    return f"{func.__module__}.{func.__qualname__}:{digest.hexdigest()[:16]}"
+
+
+def _project_module(value, root):
+    """The module a global belongs to, when that module is a source file under root"""
+    name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, "__module__", None)
+    module = sys.modules.get(name) if isinstance(name, str) else None
+    path = getattr(module, "__file__", None)
+    if not path or not path.endswith(".py"):
+        return None
+    path = os.path.abspath(path)
+    if os.path.commonpath([path, root]) != root or _is_library(path):
+        return None
+    return module
+
+
+def _is_library(path):
+    """Whether a source file belongs to the standard library or an installed package"""
+    parts = path.split(os.sep)
+    return ("site-packages" in parts or "dist-packages" in parts
+            or os.path.commonpath([path, _STDLIB_DIR]) == _STDLIB_DIR)
+
+
+def source_identity(func):
+    """
+    Digest of the source of a function's module and the project modules it reaches
+
+    Project modules are the .py files under the function's module directory.
+    Every module, class or function a module's globals take from another
+    project module pulls that module in, transitively, so delegating the
+    work to other modules still keys on their code. Functions defined
+    outside a source file (builtins, pandas) have an empty identity.
+    """
+    func = getattr(func, "__func__", func)
+    start = sys.modules.get(getattr(func, "__module__", None) or "")
+    path = getattr(start, "__file__", None)
+    if not path or not path.endswith(".py") or _is_library(os.path.abspath(path)):
+        return ""
+    root = os.path.dirname(os.path.abspath(path))
+    seen, pending = {}, [start]
+    while pending:
+        module = pending.pop()
+        module_path = os.path.abspath(module.__file__)
+        if module_path in seen:
+            continue
+        seen[module_path] = file_content_hash(module_path)
+        for value in list(vars(module).values()):
+            dependency = _project_module(value, root)
+            if dependency is not None and os.path.abspath(dependency.__file__) not in seen:
+                pending.append(dependency)
+
+    digest = hashlib.sha256()
+    for module_path in sorted(seen):
+        digest.update(os.path.relpath(module_path, root).encode("utf-8"))
+        digest.update(seen[module_path].encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _hash_code(code, digest):
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _hash_code(const, digest)
+        else:
+            digest.update(repr(const).encode("utf-8"))
+    digest.update(repr(code.co_names).encode("utf-8"))
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Return the process-wide cache shared by the analysis classes"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache()
+    return _default_cache
+
+
+def read_sheet_cached(file_path, sheet_name, cache=None, **read_kwargs):
+    """
+    Read one sheet with pandas, reusing the parsed frame while the sheet is unchanged
+
+    Whole sheets, or a list of their columns, come from the memory-mapped
+    column store; reads with other pandas options are cached as pickles.
+    """
+    cache = cache or get_default_cache()
+    content_hash = sheet_content_hash(file_path, sheet_name)
+    usecols = read_kwargs.get('usecols')
+    if cache.enabled and set(read_kwargs) <= {'usecols'} and (usecols is None or isinstance(usecols, list)):
+        written = not store_exists(cache.store_dir, content_hash)
+        frame = load_mapped_sheet(file_path, sheet_name, cache.store_dir, content_hash, columns=usecols)
+        if written:
+            # A new store counts against the cache's byte budget like any entry
+            cache.evict()
+        return frame
+    params = dict(read_kwargs, io=file_path, sheet_name=sheet_name)
+    return cache.cached_call(pd.read_excel, content_hash, params=params)
@@ -12,17 +12,49 @@ from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.utils import get_column_letter
 import numpy as np
+from analysis_cache import get_default_cache, read_sheet_cached, sheet_content_hash
+from chunked import DEFAULT_BATCH_SIZE, BasicStatsPartial, LoginPivotPartial, fold_sheet
+from distinct_users import count_distinct
+from cohorts import CohortIndex, cohort_columns
+from lazy_query import LazyFrame, col
+from parallel import parallel_fold
+from pivot_engine import year_international_pivot
 
 class AugustAnalysis:
-    def __init__(self, file_path):
+    def __init__(self, file_path, cache=None):
         self.file_path = file_path
         self.august_data = None
         self.analysis_results = {}
+        self.cache = cache or get_default_cache()
+        self._cohorts = None
+        self._login_pivot = None
         
+    def content_hash(self):
+        """Hash of the August sheet, used to key cached results"""
+        return sheet_content_hash(self.file_path, 'August')
+    
+    def query(self, rows=None):
+        """Lazy query over the August sheet (or some row positions), reusing the loaded frame when there is one"""
+        if self.august_data is not None:
+            return LazyFrame.from_frame(self.august_data, rows=rows)
+        return LazyFrame.scan_sheet(self.file_path, 'August', cache=self.cache, rows=rows)
+    
+    def cohorts(self):
+        """Faculty / year / international status row index, built once per load"""
+        if self._cohorts is None:
+            self._cohorts = CohortIndex(self.query().select(*cohort_columns()).collect())
+        return self._cohorts
+    
+    def cohort_rows(self, cohort):
+        """Row positions of a cohort selector; None for the whole sheet"""
+        return None if not cohort else self.cohorts().rows(cohort)
+    
     def load_august_data(self):
         """Load August data from the Excel file"""
         try:
-            self.august_data = pd.read_excel(self.file_path, sheet_name='August')
+            self.august_data = read_sheet_cached(self.file_path, 'August', cache=self.cache)
+            self._cohorts = None
+            self._login_pivot = None
             print(f"August data loaded: {len(self.august_data)} rows")
             print(f"August columns: {list(self.august_data.columns)}")
             return True
@@ -30,35 +62,19 @@ class AugustAnalysis:
             print(f"Error loading August data: {e}")
             return False
     
-    def analyze_basic_stats(self):
-        """Analyze basic statistics from August data"""
+    def analyze_basic_stats(self, cohort=None):
+        """Analyze basic statistics from August data, optionally for one cohort"""
         if self.august_data is None:
             print("No August data loaded.")
             return False
             
         try:
-            # Total users (unique emails)
-            total_users = self.august_data['Email'].nunique()
-            
-            # Total login count (sum of all login counts)
-            # Note: August data has 'Web sessions' instead of 'Login Count'
-            login_count_column = 'Web sessions' if 'Web sessions' in self.august_data.columns else 'Login Count'
-            total_login_count = self.august_data[login_count_column].sum()
-            
-            # Average time spent per session
-            avg_time_column = 'Avg Login Time'
-            avg_time_per_session = self.august_data[avg_time_column].mean()
+            stats = self.cache.cached_call(self._compute_basic_stats, self.content_hash(), params={'cohort': cohort})
+            self.analysis_results['basic_stats'] = stats
             
-            self.analysis_results['basic_stats'] = {
-                'total_users': total_users,
-                'total_login_count': total_login_count,
-                'avg_time_per_session': avg_time_per_session,
-                'login_count_column': login_count_column
-            }
-            
-            print(f"Total Users: {total_users}")
-            print(f"Total Login Count (Web Sessions): {total_login_count}")
-            print(f"Average Time per Session: {avg_time_per_session:.2f} seconds")
+            print(f"Total Users: {stats['total_users']}")
+            print(f"Total Login Count (Web Sessions): {stats['total_login_count']}")
+            print(f"Average Time per Session: {stats['avg_time_per_session']:.2f} seconds")
             
             return True
             
@@ -66,70 +82,37 @@ class AugustAnalysis:
             print(f"Error analyzing basic stats: {e}")
             return False
     
-    def create_pivot_table(self):
-        """Create pivot table for Login Count by Year group and International status"""
+    def _compute_basic_stats(self, cohort=None):
+        """Compute the basic statistics dictionary from the loaded data"""
+        query = self.query(self.cohort_rows(cohort))
+        
+        # Note: August data has 'Web sessions' instead of 'Login Count'
+        login_count_column = 'Web sessions' if 'Web sessions' in query.columns else 'Login Count'
+        
+        # Total users (unique emails; exact for small exports, sketched for large ones),
+        # total login count and average time spent per session
+        stats = query.agg(
+            total_users=col('Email').agg(count_distinct),
+            total_login_count=col(login_count_column).sum(),
+            avg_time_per_session=col('Avg Login Time').mean()
+        ).collect().to_dict('records')[0]
+        
+        return {
+            'total_users': stats['total_users'],
+            'total_login_count': stats['total_login_count'],
+            'avg_time_per_session': stats['avg_time_per_session'],
+            'login_count_column': login_count_column
+        }
+    
+    def create_pivot_table(self, cohort=None):
+        """Create pivot table for Login Count by Year group and International status, optionally for one cohort"""
         if self.august_data is None:
             print("No August data loaded.")
             return None
             
         try:
-            # Prepare data for pivot table
-            pivot_data = self.august_data.copy()
-            
-            # Clean and standardize column names
-            year_column = 'Course Year'
-            international_column = 'International Status'
-            login_column = 'Web sessions' if 'Web sessions' in self.august_data.columns else 'Login Count'
-            
-            # Clean the data
-            pivot_data[year_column] = pivot_data[year_column].fillna('(blank)')
-            pivot_data[international_column] = pivot_data[international_column].fillna('(blank)')
-            pivot_data[login_column] = pivot_data[login_column].fillna(0)
-            
-            # Standardize year values (remove pipe characters and clean)
-            pivot_data[year_column] = pivot_data[year_column].astype(str).str.strip()
-            pivot_data[year_column] = pivot_data[year_column].str.replace("'|", "").str.replace("|'", "").str.replace("|", "")
-            pivot_data[year_column] = pivot_data[year_column].replace({
-                '1st Year': '1st Year',
-                '2nd Year': '2nd Year', 
-                '3rd Year': '3rd Year',
-                '4th Year': '4th Year',
-                '5th Year': '5th Year',
-                'nan': '(blank)',
-                '': '(blank)'
-            })
-            
-            # Standardize international status (remove pipe characters and clean)
-            pivot_data[international_column] = pivot_data[international_column].astype(str).str.strip()
-            pivot_data[international_column] = pivot_data[international_column].str.replace("'|", "").str.replace("|'", "").str.replace("|", "")
-            pivot_data[international_column] = pivot_data[international_column].replace({
-                'Domestic': 'Domestic',
-                'International': 'International',
-                'nan': '(blank)',
-                '': '(blank)'
-            })
-            
-            # Create pivot table
-            pivot_table = pd.pivot_table(
-                pivot_data,
-                values=login_column,
-                index=international_column,
-                columns=year_column,
-                aggfunc='sum',
-                fill_value=0,
-                margins=True,
-                margins_name='Grand Total'
-            )
-            
-            # Reorder columns to match the requested format
-            year_order = ['1st Year', '2nd Year', '3rd Year', '4th Year', '5th Year', '(blank)', 'Grand Total']
-            existing_columns = [col for col in year_order if col in pivot_table.columns]
-            pivot_table = pivot_table[existing_columns]
-            
-            # Reorder rows to match the requested format
-            row_order = ['Domestic', 'International', '(blank)', 'Grand Total']
-            existing_rows = [row for row in row_order if row in pivot_table.index]
-            pivot_table = pivot_table.reindex(existing_rows)
+            pivot_table = self.cache.cached_call(self._compute_pivot_table, self.content_hash(),
+                                                 params={'cohort': cohort})
             
             self.analysis_results['pivot_table'] = pivot_table
             
@@ -142,6 +125,68 @@ class AugustAnalysis:
             print(f"Error creating pivot table: {e}")
             return None
     
+    def login_pivot(self):
+        """Coded Year group x International status login pivot, built once per load"""
+        if self._login_pivot is None:
+            query = self.query()
+            year_column = 'Course Year'
+            international_column = 'International Status'
+            login_column = 'Web sessions' if 'Web sessions' in query.columns else 'Login Count'
+            
+            # Only the three pivot columns are taken from the sheet
+            pivot_data = query.select(year_column, international_column, login_column).collect()
+            
+            # Sum logins on the cleaned (International status, Year group) codes, in report order
+            self._login_pivot = year_international_pivot(pivot_data, login_column, year_column, international_column)
+        return self._login_pivot
+    
+    def _compute_pivot_table(self, cohort=None):
+        """Build the Year group x International status login pivot from the loaded data"""
+        # A cohort only touches its own rows of the coded pivot
+        return self.login_pivot().table(self.cohort_rows(cohort))
+    
+    def analyze_chunked(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Basic statistics and the login pivot, streaming the sheet in row batches
+        
+        For exports too large to load: the August data is never held in
+        memory, only one batch and the partial aggregates.
+        """
+        try:
+            stats, pivot = fold_sheet(self.file_path, 'August', [BasicStatsPartial(), LoginPivotPartial()],
+                                      batch_size)
+            return self._store_partials(stats, pivot)
+            
+        except Exception as e:
+            print(f"Error analyzing August data in batches: {e}")
+            return False
+    
+    def analyze_parallel(self, workers=None):
+        """Basic statistics and the login pivot of the loaded data, computed over row partitions in a process pool"""
+        if self.august_data is None:
+            print("No August data loaded.")
+            return False
+            
+        try:
+            stats, pivot = parallel_fold(self.august_data, [BasicStatsPartial(), LoginPivotPartial()],
+                                         workers=workers)
+            return self._store_partials(stats, pivot)
+            
+        except Exception as e:
+            print(f"Error analyzing August data in parallel: {e}")
+            return False
+    
+    def _store_partials(self, stats, pivot):
+        stats = stats.result()
+        self.analysis_results['basic_stats'] = stats
+        self.analysis_results['pivot_table'] = pivot.result()
+        
+        print(f"Total Users: {stats['total_users']}")
+        print(f"Total Login Count (Web Sessions): {stats['total_login_count']}")
+        print(f"Average Time per Session: {stats['avg_time_per_session']:.2f} seconds")
+        
+        return True
+    
     def create_excel_report(self, output_filename="August_Analysis_Report.xlsx"):
         """Create Excel report with analysis results"""
         try:
@@ -156,8 +201,9 @@ class AugustAnalysis:
             # Create Pivot Table sheet
             self.create_pivot_sheet(wb)
             
-            # Create Raw Data sheet
-            self.create_raw_data_sheet(wb)
+            # Create Raw Data sheet (not available when the sheet was streamed in batches)
+            if self.august_data is not None:
+                self.create_raw_data_sheet(wb)
             
             # Save workbook
             wb.save(output_filename)
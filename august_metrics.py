@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+August Metrics Engine
+This module computes the August summary metrics (students, VWE modules,
+industry modules, modules per web session) and their breakdown tables in one
+vectorized pass over the August sheet.
+
+The same results feed the August_Summary sheet and the detailed metrics
+report, so the published numbers always come from the loaded data.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from binning import BinSpec
+from derived_columns import count_delimited
+from person_tags import PERSON_TAG_COLUMN, TagIndex
+
+VWE_COLUMN = 'Virtual Work Experience'
+INDUSTRY_COLUMN = 'Industries'
+WEB_SESSIONS_COLUMN = 'Web sessions'
+
+INDUSTRY_BINS = BinSpec([('1-3 Modules', 1, 3), ('4-6 Modules', 4, 6), ('7+ Modules', 7, None)])
+# Modules per session is a ratio, so its bins must leave no gaps between bounds
+SESSION_BINS = BinSpec([('0-2 Modules', 0, 2), ('2-5 Modules', 2, 5), ('5+ Modules', 5, None)], left_open=True)
+
+# Columns grouped on for per-cohort breakdowns
+GROUP_COLUMNS = ['Faculty', 'Course Year', 'International Status']
+
+
+class AugustMetrics:
+    def __init__(self, august_df):
+        self.august_df = august_df
+        self.total_students = len(august_df)
+
+        vwe = pd.to_numeric(august_df[VWE_COLUMN], errors='coerce') if VWE_COLUMN in august_df else pd.Series(dtype=float)
+        self.vwe_values = vwe.dropna().to_numpy(dtype=np.float64)
+
+        if INDUSTRY_COLUMN in august_df:
+            industries = august_df[INDUSTRY_COLUMN]
+            self.industry_counts = count_delimited(industries)[industries.notna().to_numpy()]
+        else:
+            self.industry_counts = np.empty(0, dtype=np.int64)
+
+        if PERSON_TAG_COLUMN in august_df and WEB_SESSIONS_COLUMN in august_df:
+            ratios = TagIndex(august_df[PERSON_TAG_COLUMN]).tags_per_session(august_df[WEB_SESSIONS_COLUMN])
+            self.modules_per_session = ratios[~np.isnan(ratios)]
+        else:
+            self.modules_per_session = np.empty(0)
+
+    @classmethod
+    def from_excel(cls, file_path, sheet_name='August'):
+        august_df = pd.read_excel(file_path, sheet_name=sheet_name)
+        august_df.columns = august_df.columns.str.strip()
+        return cls(august_df)
+
+    @property
+    def avg_vwe(self):
+        return float(self.vwe_values.mean()) if self.vwe_values.size else np.nan
+
+    @property
+    def avg_industry_modules(self):
+        return float(self.industry_counts.mean()) if self.industry_counts.size else np.nan
+
+    @property
+    def avg_modules_per_session(self):
+        return float(self.modules_per_session.mean()) if self.modules_per_session.size else np.nan
+
+    def summary(self):
+        """Headline metrics as a dictionary"""
+        return {
+            'Total Students': self.total_students,
+            'Students with VWE Data': int(self.vwe_values.size),
+            'Average VWE': self.avg_vwe,
+            'Students with Industry Data': int(self.industry_counts.size),
+            'Average Industry Modules': self.avg_industry_modules,
+            'Students with Session Data': int(self.modules_per_session.size),
+            'Average Modules Per Session': self.avg_modules_per_session,
+        }
+
+    def breakdowns(self):
+        """(bin spec, values) for the VWE, industry and modules-per-session breakdowns"""
+        return {
+            'VWE': (BinSpec.from_values(self.vwe_values), self.vwe_values),
+            'Industry': (INDUSTRY_BINS, self.industry_counts),
+            'Session': (SESSION_BINS, self.modules_per_session),
+        }
+
+    def breakdown(self, name, total_label=None):
+        spec, values = self.breakdowns()[name]
+        return spec.table(values, total_label)
+
+    def grouped_breakdown(self, name, by=GROUP_COLUMNS):
+        """Breakdown counts per faculty / course year / international status"""
+        spec, _ = self.breakdowns()[name]
+        by = [column for column in by if column in self.august_df]
+        return spec.grouped_counts(self.row_values(name), self.august_df[by])
+
+    def row_values(self, name):
+        """Per-row values behind a breakdown, NaN where a student has no data"""
+        if name == 'VWE':
+            return pd.to_numeric(self.august_df[VWE_COLUMN], errors='coerce').to_numpy(dtype=np.float64)
+        if name == 'Industry':
+            counts = count_delimited(self.august_df[INDUSTRY_COLUMN]).astype(np.float64)
+            counts[self.august_df[INDUSTRY_COLUMN].isna().to_numpy()] = np.nan
+            return counts
+        return TagIndex(self.august_df[PERSON_TAG_COLUMN]).tags_per_session(self.august_df[WEB_SESSIONS_COLUMN])
+
+    def column_letter(self, column):
+        return get_column_letter(self.august_df.columns.get_loc(column) + 1)
+
+
+def format_percentage(value):
+    return f"{value:.1f}%"
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August_Export_SD_2_Sept_updated.xlsx"
+    metrics = AugustMetrics.from_excel(file_path)
+
+    print("AUGUST METRICS")
+    print("="*50)
+    for name, value in metrics.summary().items():
+        print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
+
+    for title, name in [("VWE modules", 'VWE'), ("Industry modules", 'Industry'),
+                        ("Modules per session", 'Session')]:
+        print(f"\n{title}:")
+        for row in metrics.breakdown(name).itertuples(index=False):
+            print(f"  {row.Label}: {row.Count} ({format_percentage(row.Percentage)})")
+        print(metrics.grouped_breakdown(name, by=['International Status']).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 from openpyxl import load_workbook
+from binning import BinSpec
+from derived_columns import count_delimited
+from person_tags import TagIndex
 
 def calculate_august_metrics():
     """Calculate August metrics for VWE modules, industry modules, and engagement per session"""
@@ -75,21 +78,15 @@ def calculate_august_metrics():
                 print(f"Sample data: {industry_data.head().tolist()}")
                 
                 # Check if it's a list/comma-separated values
-                if industry_data.dtype == 'object':
-                    # Count modules per student
-                    module_counts = []
-                    for value in industry_data:
-                        if pd.notna(value) and isinstance(value, str):
-                            # Split by comma and count
-                            modules = [m.strip() for m in str(value).split(',') if m.strip()]
-                            module_counts.append(len(modules))
-                        else:
-                            module_counts.append(0)
+                if not pd.api.types.is_numeric_dtype(industry_data):
+                    # Count comma-separated modules per student
+                    module_counts = count_delimited(industry_data, sep=',')
                     
-                    if module_counts:
+                    if len(module_counts):
                         avg_industry_modules = np.mean(module_counts)
                         print(f"Average industry-based modules completed per student: {avg_industry_modules:.2f}")
-                        print(f"Module count distribution: {np.unique(module_counts, return_counts=True)}")
+                        print("Module count distribution:")
+                        print(BinSpec.from_values(module_counts).table(module_counts).to_string(index=False))
                     else:
                         print("No valid module counts found")
                 else:
@@ -161,19 +158,15 @@ def calculate_august_metrics():
             print(f"Students with Person tag data: {len(person_tags)}")
             
             # Count different types of engagement per student
-            engagement_counts = []
-            for tag in person_tags:
-                if isinstance(tag, str):
-                    # Count different engagement types
-                    engagements = [e.strip() for e in str(tag).split(',') if e.strip()]
-                    engagement_counts.append(len(engagements))
-                else:
-                    engagement_counts.append(0)
+            tag_index = TagIndex(august_df[person_tag_col])
+            engagement_counts = tag_index.tags_per_row()[august_df[person_tag_col].notna().to_numpy()]
             
-            if engagement_counts:
+            if len(engagement_counts):
                 avg_engagements = np.mean(engagement_counts)
                 print(f"Average engagement types per student: {avg_engagements:.2f}")
-                print(f"Engagement count distribution: {np.unique(engagement_counts, return_counts=True)}")
+                print("Engagement count distribution:")
+                distribution = BinSpec.from_values(engagement_counts, 'Engagement', 'Engagements')
+                print(distribution.table(engagement_counts).to_string(index=False))
         
         # Summary
         print("\n" + "="*80)
@@ -0,0 +1,150 @@
+"""
+Breakdown Binning
+This module turns bin specifications into breakdown tables (counts and
+percentages) and the COUNTIFS formulas that reproduce them in Excel.
+
+Values are mapped to integer bin codes once with np.digitize and counted with
+np.bincount, so one pass produces the overall table as well as counts per
+faculty, course year or international status.
+"""
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import quote_sheetname
+
+
+class BinSpec:
+    """
+    Contiguous bins given as (label, low, high) with inclusive bounds
+
+    None leaves the first bin's low or the last bin's high unbounded. With
+    left_open, a bound shared by two bins belongs to the lower one (for ratios
+    such as 0-2 / 2-5 / 5+); otherwise bins are closed on the left, which suits
+    integer counts such as 1-3 / 4-6 / 7+.
+    """
+
+    def __init__(self, bins, left_open=False):
+        self.bins = list(bins)
+        self.labels = [label for label, _, _ in self.bins]
+        self.left_open = left_open
+        if left_open:
+            self.edges = np.asarray([high for _, _, high in self.bins[:-1]], dtype=np.float64)
+        else:
+            self.edges = np.asarray([low for _, low, _ in self.bins[1:]], dtype=np.float64)
+        self.low = self.bins[0][1]
+        self.high = self.bins[-1][2]
+
+    @classmethod
+    def levels(cls, levels, singular='Module', plural='Modules'):
+        """One bin per integer level, e.g. 1 Module, 2 Modules, ..."""
+        return cls([(f"{level} {singular if level == 1 else plural}", level, level) for level in levels])
+
+    @classmethod
+    def from_values(cls, values, singular='Module', plural='Modules'):
+        """One bin per distinct integer level present in the values"""
+        values = np.asarray(values, dtype=np.float64)
+        return cls.levels(np.unique(values[~np.isnan(values)]).astype(np.int64), singular, plural)
+
+    def __len__(self):
+        return len(self.bins)
+
+    def codes(self, values):
+        """Bin index per value; -1 for missing or out-of-range values"""
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+        codes = np.digitize(values, self.edges, right=self.left_open)
+        outside = np.isnan(values)
+        # The outer bounds are inclusive in both modes
+        if self.low is not None:
+            outside |= values < self.low
+        if self.high is not None:
+            outside |= values > self.high
+        # Level bins (low == high) only take exact matches
+        lows = np.asarray([np.nan if low is None or low != high else low for _, low, high in self.bins])
+        exact = lows[codes.clip(0, len(self.bins) - 1)]
+        outside |= ~np.isnan(exact) & (values != exact)
+        codes[outside] = -1
+        return codes
+
+    def counts(self, values):
+        codes = self.codes(values)
+        return np.bincount(codes[codes >= 0], minlength=len(self.bins))
+
+    def table(self, values, total_label=None):
+        """Breakdown table with Label, Count and Percentage (of binned values) columns"""
+        counts = self.counts(values)
+        total = counts.sum()
+        table = pd.DataFrame({
+            'Label': self.labels,
+            'Count': counts,
+            'Percentage': counts / total * 100 if total else np.zeros(len(counts))
+        })
+        if total_label is not None:
+            table.loc[len(table)] = [total_label, total, 100.0 if total else 0.0]
+        return table
+
+    def grouped_counts(self, values, groups):
+        """
+        Counts per bin for every combination of the group columns
+
+        groups is a Series or DataFrame aligned with values (e.g. Faculty,
+        Course Year, International Status). Rows with a missing group value
+        are left out, as are combinations that never occur.
+        """
+        groups = groups.to_frame() if isinstance(groups, pd.Series) else groups
+        groups = groups.reset_index(drop=True)
+        codes = self.codes(values)
+
+        factorized = [pd.factorize(groups[column], sort=True) for column in groups.columns]
+        group_codes = [column_codes for column_codes, _ in factorized]
+        shape = tuple(len(labels) for _, labels in factorized)
+        n_cells = int(np.prod(shape))
+
+        has_group = np.logical_and.reduce([column_codes >= 0 for column_codes in group_codes])
+        present = np.bincount(np.ravel_multi_index([c[has_group] for c in group_codes], shape),
+                              minlength=n_cells) > 0
+
+        valid = has_group & (codes >= 0)
+        cells = np.ravel_multi_index([c[valid] for c in group_codes], shape)
+        counts = np.bincount(cells * len(self.bins) + codes[valid], minlength=n_cells * len(self.bins))
+
+        if len(factorized) == 1:
+            index = pd.Index(factorized[0][1], name=groups.columns[0])
+        else:
+            index = pd.MultiIndex.from_product([labels for _, labels in factorized], names=list(groups.columns))
+        table = pd.DataFrame(counts.reshape(n_cells, len(self.bins)), index=index, columns=self.labels)
+        return table[present]
+
+    def criteria(self, index):
+        """COUNTIFS criteria strings for one bin"""
+        _, low, high = self.bins[index]
+        if low is not None and low == high:
+            return [_format_number(low)]
+        criteria = []
+        if low is not None:
+            criteria.append(f'">{_format_number(low)}"' if self.left_open and index > 0 else f'">={_format_number(low)}"')
+        if high is not None:
+            criteria.append(f'"<={_format_number(high)}"')
+        return criteria
+
+    def countifs_formulas(self, range_ref, extra_criteria=()):
+        """
+        One COUNTIFS formula per bin over a bounded range
+
+        extra_criteria is a list of (range, criterion) pairs added to every
+        formula, e.g. a faculty filter.
+        """
+        formulas = []
+        for index in range(len(self.bins)):
+            parts = [f'{range_ref},{criterion}' for criterion in self.criteria(index)]
+            parts += [f'{ref},{criterion}' for ref, criterion in extra_criteria]
+            formulas.append(f"=COUNTIFS({','.join(parts)})")
+        return formulas
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def column_range(sheet_name, column_letter, first_row, last_row):
+    """Absolute, bounded range reference such as 'August'!$K$2:$K$374"""
+    return f"{quote_sheetname(sheet_name)}!${column_letter}${first_row}:${column_letter}${last_row}"
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Chunked Sheet Processing
+This module runs the analyses over exports too large to hold in memory. The
+loader streams a sheet with openpyxl's read-only reader and yields row
+batches of only the columns the analyses need; each analysis folds the
+batches into a small partial aggregate and the partials are merged at the
+end.
+
+Partials keep fixed-size state (sums, coded grids, count cubes, tag counts,
+a bounded set or sketch of distinct users), so peak memory depends on the
+batch size, not on the number of rows in the export. Every partial has
+update(batch), merge(other) and result(), so partials built over separate
+parts of an export (or separate files) combine into the same answer.
+
+    partials = fold_sheet(file_path, 'August', [BasicStatsPartial(), LoginPivotPartial()])
+    stats, pivot = (partial.result() for partial in partials)
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from cohorts import STANDARD_FACULTIES, STANDARD_YEARS, CohortIndex
+from count_cube import CountCube, industry_cube
+from distinct_users import DEFAULT_EXACT_THRESHOLD, HyperLogLog, hash_values
+from industry_mapping import load_industry_mapping
+from person_tags import PERSON_TAG_COLUMN, TagIndex
+from pivot_engine import INTERNATIONAL_ORDER, YEAR_ORDER, CodedPivot, clean_pipe_labels, encode
+from summary_stats import RunningStats
+
+DEFAULT_BATCH_SIZE = 50000
+
+# Every label the cohort cleaners can produce, so partial cubes share their axes
+FACULTY_AXIS = STANDARD_FACULTIES + ['Other', 'Unknown']
+YEAR_AXIS = STANDARD_YEARS + ['Unknown']
+
+
+def sheet_header(file_path, sheet_name):
+    """Column names of a sheet, read from its first row only"""
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        first_row = next(wb[sheet_name].iter_rows(max_row=1, values_only=True), ())
+        return _column_names(first_row)
+    finally:
+        wb.close()
+
+
+def _column_names(header_row):
+    return [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header_row)]
+
+
+def iter_sheet_batches(file_path, sheet_name, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield a sheet as DataFrames of at most batch_size rows
+
+    Only the named columns are kept (columns the sheet does not have are
+    skipped); None keeps them all. Blank rows are skipped as read_excel does.
+    Batches carry the sheet row position as their index.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        names = _column_names(next(rows, ()))
+        if columns is None:
+            positions = list(range(len(names)))
+        else:
+            wanted = set(columns)
+            positions = [i for i, name in enumerate(names) if name in wanted]
+        selected = [names[i] for i in positions]
+
+        batch, index, position = [], [], 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append([row[i] if i < len(row) else None for i in positions])
+            index.append(position)
+            position += 1
+            if len(batch) == batch_size:
+                yield _batch_frame(batch, index, selected)
+                batch, index = [], []
+        if batch:
+            yield _batch_frame(batch, index, selected)
+    finally:
+        wb.close()
+
+
+def _batch_frame(batch, index, columns):
+    frame = pd.DataFrame(batch, index=pd.Index(index), columns=columns)
+    # Columns blank throughout the batch come out as None objects; read_excel gives NaN
+    blank = [column for column in frame.columns if frame[column].dtype == object and frame[column].isna().all()]
+    if blank:
+        frame[blank] = np.nan
+    return frame
+
+
+def fold_sheet(file_path, sheet_name, partials, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream a sheet once, folding every batch into each partial"""
+    columns = set()
+    for partial in partials:
+        columns |= set(partial.columns)
+    for batch in iter_sheet_batches(file_path, sheet_name, columns, batch_size):
+        for partial in partials:
+            partial.update(batch)
+    return partials
+
+
+def merge_partials(partials):
+    """Merge a list of partials of the same kind into the first"""
+    merged = partials[0]
+    for partial in partials[1:]:
+        merged.merge(partial)
+    return merged
+
+
+class DistinctPartial:
+    """Distinct non-missing values: exact (as hashes) up to a threshold, HyperLogLog above it"""
+
+    def __init__(self, exact_threshold=DEFAULT_EXACT_THRESHOLD, p=14):
+        self.exact_threshold = exact_threshold
+        self.p = p
+        self.hashes = set()
+        self.sketch = None
+
+    def update(self, values):
+        return self._add(hash_values(values))
+
+    def _add(self, hashes):
+        if self.sketch is not None:
+            self.sketch.update_hashes(np.asarray(hashes, dtype=np.uint64))
+            return self
+        self.hashes.update(hashes.tolist() if isinstance(hashes, np.ndarray) else hashes)
+        if len(self.hashes) > self.exact_threshold:
+            self.sketch = HyperLogLog(self.p)
+            self.sketch.update_hashes(np.fromiter(self.hashes, dtype=np.uint64, count=len(self.hashes)))
+            self.hashes = set()
+        return self
+
+    def merge(self, other):
+        if other.sketch is not None:
+            if self.sketch is None:
+                self.sketch = HyperLogLog(self.p)
+                self._add(np.fromiter(self.hashes, dtype=np.uint64, count=len(self.hashes)))
+                self.hashes = set()
+            self.sketch.merge(other.sketch)
+            return self
+        return self._add(np.fromiter(other.hashes, dtype=np.uint64, count=len(other.hashes)))
+
+    def count(self):
+        return len(self.hashes) if self.sketch is None else self.sketch.count()
+
+
+class BasicStatsPartial:
+    """Distinct users, total web sessions and mean login time (AugustAnalysis basic stats)"""
+
+    columns = ['Email', 'Web sessions', 'Login Count', 'Avg Login Time']
+
+    def __init__(self):
+        self.users = DistinctPartial()
+        self.login_count_column = None
+        self.total_login_count = 0
+        self.login_time = RunningStats()
+
+    def update(self, batch):
+        # August exports have 'Web sessions' where July ones have 'Login Count'
+        if self.login_count_column is None:
+            self.login_count_column = 'Web sessions' if 'Web sessions' in batch.columns else 'Login Count'
+        self.users.update(batch['Email'])
+        self.total_login_count += batch[self.login_count_column].sum().item()
+        self.login_time.update(pd.to_numeric(batch['Avg Login Time'], errors='coerce').to_numpy(dtype=np.float64))
+        return self
+
+    def merge(self, other):
+        self.login_count_column = self.login_count_column or other.login_count_column
+        self.users.merge(other.users)
+        self.total_login_count += other.total_login_count
+        self.login_time.merge(other.login_time)
+        return self
+
+    def result(self):
+        return {
+            'total_users': self.users.count(),
+            'total_login_count': self.total_login_count,
+            'avg_time_per_session': self.login_time.mean_or_nan(),
+            'login_count_column': self.login_count_column
+        }
+
+
+class LoginPivotPartial:
+    """Web sessions by International status and Course Year, as coded sum and occurrence grids"""
+
+    columns = ['Course Year', 'International Status', 'Web sessions', 'Login Count']
+
+    def __init__(self, year_column='Course Year', international_column='International Status'):
+        self.year_column = year_column
+        self.international_column = international_column
+        self.login_column = None
+        self.sums = None
+        self.occurrences = None
+
+    def _pivot(self, batch):
+        values = batch[self.login_column].fillna(0).to_numpy()
+        return CodedPivot(encode(clean_pipe_labels(batch[self.international_column]), INTERNATIONAL_ORDER),
+                          INTERNATIONAL_ORDER,
+                          encode(clean_pipe_labels(batch[self.year_column]), YEAR_ORDER), YEAR_ORDER, values,
+                          row_name=self.international_column, col_name=self.year_column)
+
+    def update(self, batch):
+        if self.login_column is None:
+            self.login_column = 'Web sessions' if 'Web sessions' in batch.columns else 'Login Count'
+        sums, occurrences = self._pivot(batch).grids()
+        return self._add(sums, occurrences)
+
+    def _add(self, sums, occurrences):
+        if self.sums is None:
+            self.sums, self.occurrences = sums, occurrences
+        else:
+            self.sums = self.sums + sums
+            self.occurrences = self.occurrences + occurrences
+        return self
+
+    def merge(self, other):
+        self.login_column = self.login_column or other.login_column
+        if other.sums is not None:
+            self._add(other.sums, other.occurrences)
+        return self
+
+    def result(self):
+        """The Year group x International status pivot table with Grand Total margins"""
+        layout = CodedPivot([], INTERNATIONAL_ORDER, [], YEAR_ORDER,
+                            row_name=self.international_column, col_name=self.year_column)
+        if self.sums is None:
+            empty = np.zeros((len(INTERNATIONAL_ORDER) + 1, len(YEAR_ORDER) + 1), dtype=np.int64)
+            return layout.layout(empty, empty)
+        return layout.layout(self.sums, self.occurrences)
+
+
+class IndustryCubePartial:
+    """Industry x faculty x year preference counts on fixed axes"""
+
+    columns = ['Industries', 'Faculty', 'Course Year', 'International Status']
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+        self.cube = CountCube(np.zeros((len(mapping.axis), len(FACULTY_AXIS), len(YEAR_AXIS))),
+                              mapping.axis, FACULTY_AXIS, YEAR_AXIS)
+
+    def update(self, batch):
+        batch_cube = industry_cube(self.mapping, batch['Industries'], CohortIndex(batch))
+        return self._add(batch_cube.sel(faculty=FACULTY_AXIS, year=YEAR_AXIS))
+
+    def _add(self, cube):
+        self.cube = CountCube(self.cube.counts + cube.counts, self.cube.axes['industry'],
+                              FACULTY_AXIS, YEAR_AXIS)
+        return self
+
+    def merge(self, other):
+        return self._add(other.cube)
+
+    def result(self):
+        return self.cube
+
+
+def _add_counts(left, right):
+    """Sum two count Series or DataFrames over the union of their labels"""
+    if left is None or right is None:
+        return right if left is None else left
+    return left.add(right, fill_value=0).fillna(0).astype(np.int64)
+
+
+class TagCountsPartial:
+    """Rows holding each person tag, overall and by one grouping column"""
+
+    def __init__(self, group_column='Faculty', column=PERSON_TAG_COLUMN, sep=','):
+        self.column = column
+        self.group_column = group_column
+        self.sep = sep
+        self.columns = [column] + ([group_column] if group_column else [])
+        self.counts = None
+        self.counts_by = None
+        self.token_total = 0
+
+    def update(self, batch):
+        index = TagIndex(batch[self.column], sep=self.sep)
+        self.token_total += int(index.tags_per_row().sum())
+        self.counts = _add_counts(self.counts, index.tag_counts())
+        if self.group_column:
+            self.counts_by = _add_counts(self.counts_by, index.tag_counts_by(batch[self.group_column]))
+        return self
+
+    def merge(self, other):
+        self.token_total += other.token_total
+        self.counts = _add_counts(self.counts, other.counts)
+        self.counts_by = _add_counts(self.counts_by, other.counts_by)
+        return self
+
+    def result(self):
+        counts = pd.Series(dtype=np.int64) if self.counts is None else self.counts
+        counts = counts.rename_axis('Tag').rename('Rows').sort_values(ascending=False, kind='stable')
+        return counts, self.counts_by
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August Export_SD 2 Sept.xlsx"
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BATCH_SIZE
+
+    print("CHUNKED AUGUST ANALYSIS")
+    print("="*50)
+    print(f"Streaming {file_path} in batches of {batch_size} rows")
+
+    try:
+        mapping = load_industry_mapping(file_path)
+        stats, pivot, industries, tags = fold_sheet(
+            file_path, 'August',
+            [BasicStatsPartial(), LoginPivotPartial(), IndustryCubePartial(mapping), TagCountsPartial()],
+            batch_size)
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return
+
+    stats = stats.result()
+    print(f"\nTotal Users: {stats['total_users']}")
+    print(f"Total Login Count (Web Sessions): {stats['total_login_count']}")
+    print(f"Average Time per Session: {stats['avg_time_per_session']:.2f} seconds")
+
+    print("\nLogin Count by International Status and Year Group:")
+    print(pivot.result().to_string())
+
+    cube = industries.result()
+    print(f"\nIndustry preferences recorded: {cube.total()}")
+    print(cube.marginal('industry').sort_values(ascending=False, kind='stable').head(10).to_string())
+
+    tag_counts, _ = tags.result()
+    print("\nMost common person tags:")
+    print(tag_counts.head(10).to_string())
+
+
+if __name__ == "__main__":
+    main()
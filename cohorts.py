@@ -0,0 +1,166 @@
+"""
+Cohort Index
+This module precomputes, once per load, the row positions of every faculty,
+year group and international status cohort and of their intersections, so
+analyses can be restricted to a cohort without scanning or expanding the
+whole sheet.
+
+A cohort selector is a dictionary from dimension to one label or a list of
+labels; dimensions left out are unrestricted:
+
+    {'faculty': 'Faculty of Engineering', 'year': ['1st Year', '2nd Year']}
+
+Rows are grouped by their combined (faculty, year, international) code, so a
+selection gathers the postings of the matching cells and costs time
+proportional to the size of the slice.
+"""
+
+import numpy as np
+import pandas as pd
+
+STANDARD_FACULTIES = [
+    'Faculty of Engineering',
+    'Faculty of Arts and Social Sciences',
+    'University of Sydney Business School',
+    'Faculty of Medicine and Health',
+    'Sydney School of Architecture, Design and Planning',
+    'Sydney Law School',
+    'Sydney Conservatorium of Music',
+]
+
+STANDARD_YEARS = ['1st Year', '2nd Year', '3rd Year', '4th Year', '5th Year']
+
+
+def clean_faculty_name(faculty_string):
+    """Standard faculty name; the first listed faculty wins for students in several"""
+    if pd.isna(faculty_string):
+        return "Unknown"
+    faculty = str(faculty_string).replace("'", "").replace("|", "").strip()
+    for name in STANDARD_FACULTIES:
+        if name in faculty:
+            return name
+    return "Other"
+
+
+def clean_year_name(year_string):
+    """Standard year group name such as '1st Year'"""
+    if pd.isna(year_string):
+        return "Unknown"
+    year = str(year_string).replace("'", "").replace("|", "").strip()
+    for number, name in enumerate(STANDARD_YEARS, 1):
+        if name in year or year == str(number):
+            return name
+    return "Unknown"
+
+
+def clean_international_status(status_string):
+    """'International', 'Domestic' or 'Unknown'"""
+    if pd.isna(status_string):
+        return "Unknown"
+    status = str(status_string)
+    if "International" in status:
+        return "International"
+    if "Domestic" in status:
+        return "Domestic"
+    return "Unknown"
+
+
+# Dimension -> (source column, label cleaner)
+COHORT_DIMENSIONS = {
+    'faculty': ('Faculty', clean_faculty_name),
+    'year': ('Course Year', clean_year_name),
+    'international': ('International Status', clean_international_status),
+}
+
+
+def cohort_columns(dimensions=COHORT_DIMENSIONS):
+    return [column for column, _ in dimensions.values()]
+
+
+class CohortIndex:
+    def __init__(self, df, dimensions=COHORT_DIMENSIONS):
+        self.n_rows = len(df)
+        self.dimensions = list(dimensions)
+        self.categories = {}
+        self._codes = {}
+
+        for dimension, (column, clean) in dimensions.items():
+            # Clean each distinct raw value once
+            raw_codes, raw_values = pd.factorize(df[column].reset_index(drop=True), use_na_sentinel=True)
+            raw_labels = [clean(value) for value in raw_values] + [clean(np.nan)]
+            codes, categories = pd.factorize(np.asarray(raw_labels, dtype=object), sort=True)
+            self.categories[dimension] = pd.Index(categories, name=dimension)
+            self._codes[dimension] = codes[raw_codes]
+
+        # Postings of every (faculty, year, international) cell, rows in order within a cell
+        self.shape = tuple(len(self.categories[dimension]) for dimension in self.dimensions)
+        cells = np.ravel_multi_index([self._codes[dimension] for dimension in self.dimensions], self.shape)
+        self._cell_rows = np.argsort(cells, kind='stable')
+        self._cell_ptr = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=int(np.prod(self.shape))))])
+
+    def codes(self, dimension):
+        """Position of every row's label in categories[dimension]"""
+        return self._codes[dimension]
+
+    def labels(self, dimension):
+        """Cleaned label of every row for one dimension"""
+        return self.categories[dimension].to_numpy()[self._codes[dimension]]
+
+    def sizes(self, dimension):
+        """Number of rows in each cohort of one dimension"""
+        counts = np.bincount(self._codes[dimension], minlength=len(self.categories[dimension]))
+        return pd.Series(counts, index=self.categories[dimension], name='Rows')
+
+    def cell_mask(self, selector=None, **dimensions):
+        """Boolean (faculty, year, international) grid of the cells a selector covers"""
+        selector = merge_selectors(selector, dimensions)
+        unknown = set(selector) - set(self.dimensions)
+        if unknown:
+            raise ValueError(f"Unknown cohort dimension(s): {sorted(unknown)}")
+        mask = np.ones(self.shape, dtype=bool)
+        for axis, dimension in enumerate(self.dimensions):
+            if dimension not in selector:
+                continue
+            keep = self.categories[dimension].isin(selector[dimension])
+            shape = [1] * len(self.shape)
+            shape[axis] = -1
+            mask &= keep.reshape(shape)
+        return mask
+
+    def rows(self, selector=None, **dimensions):
+        """Sorted row positions of the cohort; an empty selector selects every row"""
+        selector = merge_selectors(selector, dimensions)
+        if not selector:
+            return np.arange(self.n_rows)
+        cells = np.flatnonzero(self.cell_mask(selector))
+        postings = [self._cell_rows[self._cell_ptr[cell]:self._cell_ptr[cell + 1]] for cell in cells]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(postings))
+
+    def mask(self, selector=None, **dimensions):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.rows(selector, **dimensions)] = True
+        return mask
+
+
+def merge_selectors(selector, dimensions):
+    """Combine two selectors; a dimension restricted in both keeps the labels common to both"""
+    merged = {dimension: _as_list(labels) for dimension, labels in (selector or {}).items()}
+    for dimension, labels in dimensions.items():
+        labels = _as_list(labels)
+        if dimension in merged:
+            labels = [label for label in merged[dimension] if label in labels]
+        merged[dimension] = labels
+    return merged
+
+
+def _as_list(labels):
+    return [labels] if isinstance(labels, str) else list(labels)
+
+
+def describe_selector(selector):
+    """Readable cohort description for report titles"""
+    if not selector:
+        return "All students"
+    return ", ".join(f"{dimension}: {' / '.join(_as_list(labels))}" for dimension, labels in selector.items())
@@ -0,0 +1,193 @@
+"""
+Memory-Mapped Column Store
+This module writes a decoded sheet to disk once, as one .npy file per column,
+and gives every later reader a memory-mapped view of it instead of parsing
+the workbook or unpickling a private copy of the frame.
+
+Numeric, boolean and datetime columns are mapped straight into the frame, so
+loading them costs no copying and processes reading the same sheet share the
+physical pages. The mapping is copy-on-write: a reader that edits a column in
+place gets private pages and never changes the store. Text columns are
+dictionary encoded: their int32 codes are mapped and only the distinct values
+are decoded. Columns holding a mix of types are pickled as they are.
+
+A store lives in its own directory named after the sheet's content hash and
+is written to a temporary directory and renamed into place, so readers never
+see a partial store and a changed sheet gets a new one. Opening a store
+touches its meta file, so store_entries can report stores in least recently
+used order for the analysis cache's byte budget.
+
+    content_hash = sheet_content_hash("August Export_SD 2 Sept.xlsx", 'August')
+    frame = load_mapped_sheet("August Export_SD 2 Sept.xlsx", 'August', '.analysis_cache/columns', content_hash)
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+_META_FILE = "meta.pkl"
+_OBJECTS_FILE = "objects.pkl"
+
+
+def can_store(df):
+    """Whether a frame round-trips through the store (a default RangeIndex and unique columns)"""
+    index = df.index
+    return (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+            and index.name is None and df.columns.is_unique)
+
+
+def write_store(df, path):
+    """Write a frame as a column store at path, replacing nothing that is already there"""
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+    try:
+        specs, objects = [], {}
+        for position, name in enumerate(df.columns):
+            spec = _write_column(df.iloc[:, position], tmp_path, position, objects)
+            specs.append(spec)
+        if objects:
+            with open(os.path.join(tmp_path, _OBJECTS_FILE), "wb") as handle:
+                pickle.dump(objects, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        meta = {'n_rows': len(df), 'columns': df.columns, 'specs': specs}
+        with open(os.path.join(tmp_path, _META_FILE), "wb") as handle:
+            pickle.dump(meta, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process finished the same store first
+            if not os.path.isdir(path):
+                raise
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def _write_column(series, path, position, objects):
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+        np.save(os.path.join(path, f"{position}.npy"), np.ascontiguousarray(series.to_numpy()))
+        return {'kind': 'array', 'dtype': dtype}
+
+    if isinstance(dtype, pd.StringDtype) and dtype.na_value is np.nan:
+        # Dictionary encoding: int32 codes (-1 missing) plus the distinct values as UTF-8
+        codes, uniques = pd.factorize(series)
+        encoded = [value.encode('utf-8') for value in uniques]
+        offsets = np.concatenate([[0], np.cumsum([len(value) for value in encoded], dtype=np.int64)])
+        np.save(os.path.join(path, f"{position}.codes.npy"), codes.astype(np.int32))
+        np.save(os.path.join(path, f"{position}.offsets.npy"), offsets.astype(np.int64))
+        np.save(os.path.join(path, f"{position}.data.npy"), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        return {'kind': 'text', 'dtype': dtype}
+
+    # Mixed cells keep their Python types
+    objects[position] = series.to_numpy(copy=True)
+    return {'kind': 'object', 'dtype': dtype}
+
+
+def open_store(path, columns=None):
+    """
+    Frame backed by the column store at path
+
+    columns picks a subset, kept in stored order; only their files are
+    opened. Raises ValueError for names the store does not have.
+    """
+    with open(os.path.join(path, _META_FILE), "rb") as handle:
+        meta = pickle.load(handle)
+    stored = meta['columns']
+    positions = range(len(stored))
+    if columns is not None:
+        missing = [name for name in columns if name not in stored]
+        if missing:
+            raise ValueError(f"Columns not found in the store: {missing}")
+        wanted = set(columns)
+        positions = [position for position in positions if stored[position] in wanted]
+
+    objects = None
+    arrays = []
+    for position in positions:
+        spec = meta['specs'][position]
+        if spec['kind'] == 'object' and objects is None:
+            with open(os.path.join(path, _OBJECTS_FILE), "rb") as handle:
+                objects = pickle.load(handle)
+        arrays.append(_read_column(spec, path, position, objects))
+
+    # Keep the readers' view fresh in the LRU order
+    os.utime(os.path.join(path, _META_FILE), None)
+    frame = pd.DataFrame(dict(enumerate(arrays)), index=pd.RangeIndex(meta['n_rows']), copy=False)
+    frame.columns = stored[list(positions)]
+    return frame
+
+
+def _read_column(spec, path, position, objects):
+    if spec['kind'] == 'array':
+        # Copy-on-write map: no copy on load, private pages only if the reader writes
+        return np.load(os.path.join(path, f"{position}.npy"), mmap_mode='c').view(np.ndarray)
+    if spec['kind'] == 'object':
+        return pd.Series(objects[position], dtype=spec['dtype'], copy=False)
+
+    codes = np.load(os.path.join(path, f"{position}.codes.npy"), mmap_mode='r')
+    offsets = np.load(os.path.join(path, f"{position}.offsets.npy"))
+    data = np.load(os.path.join(path, f"{position}.data.npy")).tobytes()
+    uniques = np.empty(len(offsets), dtype=object)
+    uniques[:-1] = [data[start:stop].decode('utf-8') for start, stop in zip(offsets[:-1], offsets[1:])]
+    # The extra last slot turns code -1 into a missing value
+    uniques[-1] = np.nan
+    return pd.Series(uniques[codes], dtype=spec['dtype'], copy=False)
+
+
+def store_exists(store_dir, content_hash):
+    return os.path.isfile(os.path.join(store_dir, content_hash, _META_FILE))
+
+
+def store_entries(store_dir):
+    """
+    (last opened, size in bytes, path) of every complete store in store_dir
+
+    The last opened time is the meta file's mtime, which open_store touches.
+    Stores still being written (.tmp directories) are left out.
+    """
+    try:
+        names = os.listdir(store_dir)
+    except FileNotFoundError:
+        return []
+
+    entries = []
+    for name in names:
+        if name.endswith(".tmp"):
+            continue
+        path = os.path.join(store_dir, name)
+        try:
+            last_opened = os.stat(os.path.join(path, _META_FILE)).st_mtime_ns
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        entries.append((last_opened, size, path))
+    return entries
+
+
+def load_mapped_sheet(file_path, sheet_name, store_dir, content_hash, columns=None):
+    """
+    One sheet of a workbook as a memory-mapped frame
+
+    The first reader of a sheet snapshot parses it with pandas and writes
+    the store; later readers, in any process, only map it. A frame the
+    store cannot hold faithfully is returned as parsed.
+    """
+    path = os.path.join(store_dir, content_hash)
+    if store_exists(store_dir, content_hash):
+        try:
+            return open_store(path, columns)
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError) as e:
+            print(f"Discarding unreadable column store {path}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    if not can_store(df):
+        return df if columns is None else df[[name for name in df.columns if name in set(columns)]]
+    write_store(df, path)
+    return open_store(path, columns)
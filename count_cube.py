@@ -0,0 +1,148 @@
+"""
+Industry Count Cube
+This module holds industry preference counts as one dense int32 array
+indexed by (industry, faculty, year) position, built with a single
+np.bincount over the exploded preferences.
+
+Every industry table is a view of the cube: slicing picks labels along an
+axis, marginals sum over the others, and the Engineering vs Arts layout and
+the full faculty x year pivot are reshapes of a slice, so no nested
+dictionaries, per-cell loops or pandas.pivot_table calls are needed.
+
+    cube = industry_cube(mapping, df['Industries'], cohorts)
+    focused = engineering_vs_arts(cube)
+    focused.table()                     # industries x (faculty, year)
+    focused.marginal('industry')        # preferences per industry
+"""
+
+import numpy as np
+import pandas as pd
+
+from cohorts import STANDARD_YEARS
+
+ENGINEERING_VS_ARTS = ['Faculty of Engineering', 'Faculty of Arts and Social Sciences']
+
+AXES = ('industry', 'faculty', 'year')
+AXIS_NAMES = {'industry': 'Industry', 'faculty': 'Faculty', 'year': 'Year'}
+
+
+class CountCube:
+    def __init__(self, counts, industries, faculties, years):
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.axes = {
+            'industry': pd.Index(industries, name=AXIS_NAMES['industry']),
+            'faculty': pd.Index(faculties, name=AXIS_NAMES['faculty']),
+            'year': pd.Index(years, name=AXIS_NAMES['year']),
+        }
+        if self.counts.shape != tuple(len(self.axes[axis]) for axis in AXES):
+            raise ValueError(f"Count array of shape {self.counts.shape} does not match the axis labels")
+
+    @classmethod
+    def from_codes(cls, industry_codes, faculty_codes, year_codes, industries, faculties, years):
+        """Count (industry, faculty, year) code triples; triples with a negative code are skipped"""
+        codes = [np.asarray(c, dtype=np.int64) for c in (industry_codes, faculty_codes, year_codes)]
+        shape = (len(industries), len(faculties), len(years))
+        keep = (codes[0] >= 0) & (codes[1] >= 0) & (codes[2] >= 0)
+        cells = np.ravel_multi_index([c[keep] for c in codes], shape)
+        counts = np.bincount(cells, minlength=int(np.prod(shape))).reshape(shape)
+        return cls(counts, industries, faculties, years)
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def sel(self, industry=None, faculty=None, year=None):
+        """
+        Sub-cube of the given labels, in the order given
+
+        Axes left as None are kept whole; labels an axis does not have give
+        zero slices, so fixed layouts always come out the same shape.
+        """
+        counts = self.counts
+        labels = {}
+        for position, (axis, wanted) in enumerate(zip(AXES, (industry, faculty, year))):
+            if wanted is None:
+                labels[axis] = self.axes[axis]
+                continue
+            wanted = pd.Index([wanted] if isinstance(wanted, str) else list(wanted))
+            indexer = self.axes[axis].get_indexer(wanted)
+            # Gather with an extra zero slice at the end for missing labels
+            padding = [(0, 0)] * counts.ndim
+            padding[position] = (0, 1)
+            counts = np.take(np.pad(counts, padding), np.where(indexer < 0, self.axes[axis].size, indexer),
+                             axis=position)
+            labels[axis] = wanted
+        return CountCube(counts, labels['industry'], labels['faculty'], labels['year'])
+
+    def marginal(self, *axes):
+        """
+        Counts summed over every axis not named
+
+        One axis gives a Series, two a DataFrame (first axis as rows) and
+        none the grand total.
+        """
+        unknown = set(axes) - set(AXES)
+        if unknown:
+            raise ValueError(f"Unknown cube axes: {sorted(unknown)}")
+        summed = self.counts.sum(axis=tuple(i for i, axis in enumerate(AXES) if axis not in axes),
+                                 dtype=np.int64)
+        if not axes:
+            return int(summed)
+        # Put the remaining axes in the order asked for
+        kept = [axis for axis in AXES if axis in axes]
+        summed = np.transpose(summed, [kept.index(axis) for axis in axes])
+        if len(axes) == 1:
+            return pd.Series(summed, index=self.axes[axes[0]], name='Preferences')
+        return pd.DataFrame(summed, index=self.axes[axes[0]], columns=self.axes[axes[1]])
+
+    def table(self, drop_empty_rows=False, drop_empty_columns=False):
+        """Industries as rows, (faculty, year) pairs as columns, in axis order"""
+        grid = self.counts.reshape(self.shape[0], -1).astype(np.int64)
+        columns = pd.MultiIndex.from_product([self.axes['faculty'], self.axes['year']])
+        table = pd.DataFrame(grid, index=self.axes['industry'], columns=columns)
+        if drop_empty_rows:
+            table = table.loc[grid.sum(axis=1) > 0]
+        if drop_empty_columns:
+            table = table.loc[:, grid.sum(axis=0) > 0]
+        return table
+
+    def pivot(self, margins_name=None):
+        """
+        The table pandas.pivot_table gives on the exploded preferences
+
+        Only industries and (faculty, year) pairs with preferences appear,
+        sorted by label; margins_name adds row and column totals.
+        """
+        table = self.table(drop_empty_rows=True, drop_empty_columns=True)
+        table = table.sort_index().sort_index(axis=1)
+        table.index.name = 'Industry_Name'
+        table.columns.names = ['Faculty', 'Year']
+        if margins_name is not None:
+            table[(margins_name, '')] = table.sum(axis=1)
+            table.loc[margins_name] = table.sum(axis=0)
+        return table
+
+
+def industry_cube(mapping, industry_strings, cohorts, rows=None):
+    """
+    Count cube of the students' industry preferences
+
+    industry_strings holds the preference strings of the given row positions
+    of the CohortIndex cohorts (all rows by default). The industry axis is
+    the mapping's table axis; the faculty and year axes are the cohort
+    categories.
+    """
+    positions, numbers = mapping.explode(industry_strings)
+    if rows is not None:
+        positions = np.asarray(rows)[positions]
+    return CountCube.from_codes(mapping.axis_positions(numbers),
+                                cohorts.codes('faculty')[positions], cohorts.codes('year')[positions],
+                                mapping.axis, cohorts.categories['faculty'], cohorts.categories['year'])
+
+
+def engineering_vs_arts(cube, industries=None):
+    """Engineering and Arts slice over the five standard years, the layout of the requested table"""
+    return cube.sel(industry=industries, faculty=ENGINEERING_VS_ARTS, year=STANDARD_YEARS)
@@ -12,6 +12,9 @@ from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 import numpy as np
 import re
+from cohorts import CohortIndex
+from count_cube import engineering_vs_arts, industry_cube
+from industry_mapping import INDUSTRY_ORDER, load_industry_mapping
 
 class ExactIndustryTableCreator:
     def __init__(self, file_path):
@@ -22,17 +25,7 @@ class ExactIndustryTableCreator:
     def load_industry_mapping(self):
         """Load industry number to name mapping from Sheet 7"""
         try:
-            # Read Sheet 7
-            df = pd.read_excel(self.file_path, sheet_name='Sheet7', header=None)
-            
-            # Extract industry mappings (rows 2 onwards)
-            for i in range(2, len(df)):
-                row = df.iloc[i]
-                if pd.notna(row[1]) and pd.notna(row[2]):  # Check if both number and name exist
-                    industry_number = int(row[1])
-                    industry_name = str(row[2]).strip()
-                    self.industry_mapping[industry_number] = industry_name
-            
+            self.industry_mapping = load_industry_mapping(self.file_path)
             print(f"Loaded {len(self.industry_mapping)} industry mappings")
             return True
             
@@ -103,87 +96,12 @@ class ExactIndustryTableCreator:
             return None
             
         try:
-            # Prepare data
-            data = self.august_data.copy()
-            
-            # Clean faculty and year data
-            data['Clean_Faculty'] = data['Faculty'].apply(self.clean_faculty_name)
-            data['Clean_Year'] = data['Course Year'].apply(self.clean_year_name)
-            
-            # Parse industry preferences
-            data['Industry_Numbers'] = data['Industries'].apply(self.parse_industry_numbers)
-            
-            # Create expanded dataset (one row per industry preference)
-            expanded_data = []
-            for _, row in data.iterrows():
-                if row['Industry_Numbers']:  # If student has industry preferences
-                    for industry_num in row['Industry_Numbers']:
-                        expanded_data.append({
-                            'Faculty': row['Clean_Faculty'],
-                            'Year': row['Clean_Year'],
-                            'Industry_Number': industry_num,
-                            'Industry_Name': self.industry_mapping.get(industry_num, f"Unknown_{industry_num}"),
-                            'Student_Count': 1
-                        })
-            
-            expanded_df = pd.DataFrame(expanded_data)
-            
-            # Filter for only Engineering and Arts faculties
-            focused_faculties = ['Faculty of Engineering', 'Faculty of Arts and Social Sciences']
-            focused_data = expanded_df[expanded_df['Faculty'].isin(focused_faculties)]
-            
-            # Create pivot table
-            pivot_table = pd.pivot_table(
-                focused_data,
-                values='Student_Count',
-                index='Industry_Name',
-                columns=['Faculty', 'Year'],
-                aggfunc='sum',
-                fill_value=0
-            )
-            
-            # Reorder columns to match requested format
-            year_order = ['1st Year', '2nd Year', '3rd Year', '4th Year', '5th Year']
-            faculty_order = ['Faculty of Engineering', 'Faculty of Arts and Social Sciences']
-            
-            # Create new column structure
-            new_columns = []
-            for faculty in faculty_order:
-                for year in year_order:
-                    if (faculty, year) in pivot_table.columns:
-                        new_columns.append((faculty, year))
-            
-            if new_columns:
-                pivot_table = pivot_table[new_columns]
-            
-            # Reorder rows to match the requested industry list exactly
-            industry_order = [
-                'Accounting', 'Advertising, Media, Journalism, and Communications',
-                'Agriculture and Environment', 'Animals and Vet', 'Architecture',
-                'Arts, Humanities, and Politics', 'Building and Construction',
-                'Business and Commerce', 'Community and Social Work',
-                'Creative Arts and Music', 'Design', 'Economics and Finance',
-                'Education, Childcare and Teaching', 'Engineering', 'Entrepreneur',
-                'Food and Beverage', 'Government, Defence and Policing',
-                'Hair and Beauty', 'Health and Sport Sciences', 'Law',
-                'Marketing and Public Relations', 'Mathematics',
-                'Medical Sciences and Medicine', 'Nursing and Midwifery',
-                'Property and Real Estate', 'Psychology', 'Science', 'Technology',
-                'Trades and Mining', 'Sports', 'Transport, Tourism and Hospitality',
-                'Fashion', 'Australian Defence Force', 'Energy'
-            ]
-            
-            # Create final table with all industries (even if no data)
-            final_table = pd.DataFrame(index=industry_order)
-            
-            # Add data for existing columns
-            for col in pivot_table.columns:
-                final_table[col] = pivot_table[col]
-            
-            # Fill NaN with 0
-            final_table = final_table.fillna(0)
+            # Count preferences by industry, faculty and year group in one pass
+            cube = industry_cube(self.industry_mapping, self.august_data['Industries'],
+                                 CohortIndex(self.august_data))
             
-            return final_table
+            # Every requested industry, Engineering then Arts years, zero where there is no data
+            return engineering_vs_arts(cube, INDUSTRY_ORDER).table()
             
         except Exception as e:
             print(f"Error creating exact table: {e}")
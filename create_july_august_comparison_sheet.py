@@ -1,91 +1,96 @@
 import pandas as pd
 import numpy as np
-from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
+from analysis_cache import get_default_cache, sheet_content_hash
+from sheet_writer import CellStyle, sign_style_mask, write_block
+from xlsx_patch import inject_sheet, new_sheet
 
-def create_july_august_comparison_sheet():
-    """Create a new sheet comparing July and August emails with activity data"""
+def build_comparison_data(file_path):
+    """Build the per-user July vs August comparison frame from the workbook"""
+    # Read both sheets
+    july_df = pd.read_excel(file_path, sheet_name='July ')
+    august_df = pd.read_excel(file_path, sheet_name='August')
     
-    try:
-        file_path = "August_Export_SD_2_Sept_updated.xlsx"
-        print(f"Creating July-August comparison sheet in: {file_path}")
-        
-        # Load the workbook
-        workbook = load_workbook(file_path)
-        
-        # Read both sheets
-        july_df = pd.read_excel(file_path, sheet_name='July ')
-        august_df = pd.read_excel(file_path, sheet_name='August')
-        
-        print(f"July data shape: {july_df.shape}")
-        print(f"August data shape: {august_df.shape}")
-        
-        # Clean column names
-        july_df.columns = july_df.columns.str.strip()
-        august_df.columns = august_df.columns.str.strip()
+    print(f"July data shape: {july_df.shape}")
+    print(f"August data shape: {august_df.shape}")
+    
+    # Clean column names
+    july_df.columns = july_df.columns.str.strip()
+    august_df.columns = august_df.columns.str.strip()
+    
+    # Find existing users (emails that appear in both sheets)
+    july_emails = set(july_df['Email'].str.lower())
+    august_emails = set(august_df['Email'].str.lower())
+    existing_emails = july_emails.intersection(august_emails)
+    
+    print(f"Total unique emails in July: {len(july_emails)}")
+    print(f"Total unique emails in August: {len(august_emails)}")
+    print(f"Existing users (emails in both): {len(existing_emails)}")
+    
+    # Create comparison dataframe for existing users
+    comparison_data = []
+    
+    for email in existing_emails:
+        # Get July data
+        july_row = july_df[july_df['Email'].str.lower() == email].iloc[0]
+        # Get August data
+        august_row = august_df[august_df['Email'].str.lower() == email].iloc[0]
         
-        # Create or get the comparison sheet
-        if 'July_August_Email_Comparison' in workbook.sheetnames:
-            workbook.remove(workbook['July_August_Email_Comparison'])
+        # Extract values for comparison
+        july_login_count = july_row['Login Count']
+        august_web_sessions = august_row['Web sessions']
         
-        comparison_sheet = workbook.create_sheet('July_August_Email_Comparison')
+        july_avg_time = july_row['Avg Login Time']
+        august_avg_time = august_row['Avg Login Time']
         
-        # Find existing users (emails that appear in both sheets)
-        july_emails = set(july_df['Email'].str.lower())
-        august_emails = set(august_df['Email'].str.lower())
-        existing_emails = july_emails.intersection(august_emails)
+        july_vwe = july_row['Virtual Work Experience']
+        august_vwe = august_row['Virtual Work Experience']
         
-        print(f"Total unique emails in July: {len(july_emails)}")
-        print(f"Total unique emails in August: {len(august_emails)}")
-        print(f"Existing users (emails in both): {len(existing_emails)}")
+        # Calculate increases
+        login_increase = august_web_sessions - july_login_count
+        time_increase = august_avg_time - july_avg_time
+        vwe_increase = august_vwe - july_vwe if pd.notna(august_vwe) and pd.notna(july_vwe) else np.nan
         
-        # Create comparison dataframe for existing users
-        comparison_data = []
+        comparison_data.append({
+            'Email': email,
+            'First_Name_July': july_row['First name'],
+            'First_Name_August': august_row['First name'],
+            'July_Login_Count': july_login_count,
+            'August_Web_Sessions': august_web_sessions,
+            'Login_Increase': login_increase,
+            'July_Avg_Login_Time': july_avg_time,
+            'August_Avg_Login_Time': august_avg_time,
+            'Time_Increase_Seconds': time_increase,
+            'July_VWE': july_vwe,
+            'August_VWE': august_vwe,
+            'VWE_Increase': vwe_increase,
+            'July_Person_Tag': july_row['Person tag'],
+            'August_Person_Tag': august_row['Person tag'],
+            'July_Industries': july_row['Industries'],
+            'August_Industries': august_row['Industries'],
+            'Career_Profiling_Flag': august_row['Career_Profiling_Flag'] if 'Career_Profiling_Flag' in august_row else 0
+        })
+    
+    # Create comparison dataframe
+    comparison_df = pd.DataFrame(comparison_data)
+    
+    return comparison_df
+
+def create_july_august_comparison_sheet():
+    """Create a new sheet comparing July and August emails with activity data"""
+    
+    try:
+        file_path = "August_Export_SD_2_Sept_updated.xlsx"
+        print(f"Creating July-August comparison sheet in: {file_path}")
         
-        for email in existing_emails:
-            # Get July data
-            july_row = july_df[july_df['Email'].str.lower() == email].iloc[0]
-            # Get August data
-            august_row = august_df[august_df['Email'].str.lower() == email].iloc[0]
-            
-            # Extract values for comparison
-            july_login_count = july_row['Login Count']
-            august_web_sessions = august_row['Web sessions']
-            
-            july_avg_time = july_row['Avg Login Time']
-            august_avg_time = august_row['Avg Login Time']
-            
-            july_vwe = july_row['Virtual Work Experience']
-            august_vwe = august_row['Virtual Work Experience']
-            
-            # Calculate increases
-            login_increase = august_web_sessions - july_login_count
-            time_increase = august_avg_time - july_avg_time
-            vwe_increase = august_vwe - july_vwe if pd.notna(august_vwe) and pd.notna(july_vwe) else np.nan
-            
-            comparison_data.append({
-                'Email': email,
-                'First_Name_July': july_row['First name'],
-                'First_Name_August': august_row['First name'],
-                'July_Login_Count': july_login_count,
-                'August_Web_Sessions': august_web_sessions,
-                'Login_Increase': login_increase,
-                'July_Avg_Login_Time': july_avg_time,
-                'August_Avg_Login_Time': august_avg_time,
-                'Time_Increase_Seconds': time_increase,
-                'July_VWE': july_vwe,
-                'August_VWE': august_vwe,
-                'VWE_Increase': vwe_increase,
-                'July_Person_Tag': july_row['Person tag'],
-                'August_Person_Tag': august_row['Person tag'],
-                'July_Industries': july_row['Industries'],
-                'August_Industries': august_row['Industries'],
-                'Career_Profiling_Flag': august_row['Career_Profiling_Flag'] if 'Career_Profiling_Flag' in august_row else 0
-            })
+        # Build the comparison sheet on its own; an existing one is replaced when it is injected
+        comparison_sheet = new_sheet('July_August_Email_Comparison')
         
-        # Create comparison dataframe
-        comparison_df = pd.DataFrame(comparison_data)
+        # Reuse the comparison data while the July and August sheets are unchanged
+        comparison_df = get_default_cache().cached_call(
+            build_comparison_data, sheet_content_hash(file_path, ['July ', 'August']),
+            params={'file_path': file_path})
         
         print(f"Comparison data shape: {comparison_df.shape}")
         
@@ -125,36 +130,16 @@ def create_july_august_comparison_sheet():
             cell.fill = header_fill
             cell.alignment = Alignment(horizontal='center', vertical='center')
         
-        # Add data rows
-        for row_idx, (_, row_data) in enumerate(comparison_df.iterrows(), 4):
-            for col_idx, (key, value) in enumerate(row_data.items(), 1):
-                cell = comparison_sheet.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = data_font
-                
-                # Apply conditional formatting for increase columns
-                if col_idx == 6:  # Login Increase
-                    if pd.notna(value) and value > 0:
-                        cell.fill = positive_fill
-                    elif pd.notna(value) and value < 0:
-                        cell.fill = negative_fill
-                    elif pd.notna(value) and value == 0:
-                        cell.fill = neutral_fill
-                
-                elif col_idx == 9:  # Time Increase
-                    if pd.notna(value) and value > 0:
-                        cell.fill = positive_fill
-                    elif pd.notna(value) and value < 0:
-                        cell.fill = negative_fill
-                    elif pd.notna(value) and value == 0:
-                        cell.fill = neutral_fill
-                
-                elif col_idx == 12:  # VWE Increase
-                    if pd.notna(value) and value > 0:
-                        cell.fill = positive_fill
-                    elif pd.notna(value) and value < 0:
-                        cell.fill = negative_fill
-                    elif pd.notna(value) and value == 0:
-                        cell.fill = neutral_fill
+        # Add data rows, filling the increase columns by sign
+        data_styles = [
+            CellStyle(font=data_font),
+            CellStyle(font=data_font, fill=positive_fill),
+            CellStyle(font=data_font, fill=negative_fill),
+            CellStyle(font=data_font, fill=neutral_fill)
+        ]
+        style_mask = sign_style_mask(comparison_df, ['Login_Increase', 'Time_Increase_Seconds', 'VWE_Increase'],
+                                     positive=1, negative=2, neutral=3)
+        write_block(comparison_sheet, comparison_df, start_row=4, styles=data_styles, style_mask=style_mask)
         
         # Add summary section below the data
         summary_start_row = len(comparison_df) + 5
@@ -244,8 +229,8 @@ def create_july_august_comparison_sheet():
             adjusted_width = min(max_length + 2, 25)
             comparison_sheet.column_dimensions[column_letter].width = adjusted_width
         
-        # Save the workbook
-        workbook.save(file_path)
+        # Add the sheet without loading or rewriting the rest of the workbook
+        inject_sheet(file_path, comparison_sheet)
         print(f"July-August comparison sheet created successfully in: {file_path}")
         
         # Display summary
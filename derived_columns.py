@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Derived Column Engine
+This module evaluates declarative rules for derived columns (engagement flags,
+industry counts, tags per session) over a sheet in one vectorized pass and
+writes the results back by patching only those columns in the .xlsx package.
+
+A rule is a dictionary with the target 'column' name, the rule 'type' and its
+arguments, plus an optional 'position' (column letter) to write it to:
+
+    {'column': 'Career_Profiling_Flag', 'type': 'tag_flag',
+     'tag': 'Career Profiling Engaged', 'position': 'T'}
+
+Rule types:
+    tag_flag          1 where the tag column holds 'tag', else 0
+    tag_count         number of tags in the tag column
+    industry_count    number of industries in a '|'-delimited column (blank without data)
+    tags_per_session  tags divided by web sessions (blank without sessions)
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from person_tags import PERSON_TAG_COLUMN, TagIndex
+from xlsx_patch import patch_columns
+
+CAREER_PROFILING_RULE = {
+    'column': 'Career_Profiling_Flag',
+    'type': 'tag_flag',
+    'tag': 'Career Profiling Engaged',
+    'position': 'T',
+}
+
+
+def count_delimited(values, sep='|'):
+    """Count non-empty items per cell of a delimited column such as '|14|15|12|'"""
+    series = pd.Series(values).reset_index(drop=True)
+    text = series.where(series.map(lambda v: isinstance(v, str)))
+    items = text.str.split(sep, regex=False).explode().str.strip()
+    # The export prefixes the list with a quote to keep Excel from parsing it
+    valid = items.notna() & (items != '') & (items != "'")
+    return valid.groupby(level=0).sum().reindex(range(len(series)), fill_value=0).to_numpy(dtype=np.int64)
+
+
+class DerivedColumnEngine:
+    def __init__(self, rules):
+        for rule in rules:
+            if rule.get('type') not in _RULE_TYPES:
+                raise ValueError(f"Unknown rule type for column '{rule.get('column')}': {rule.get('type')}")
+        self.rules = rules
+        self._tag_indexes = {}
+
+    def _tag_index(self, df, column):
+        """Tokenize each tag column once, however many rules read it"""
+        if column not in self._tag_indexes:
+            self._tag_indexes[column] = TagIndex(df[column])
+        return self._tag_indexes[column]
+
+    def evaluate(self, df):
+        """Evaluate every rule against the sheet and return the derived columns"""
+        self._tag_indexes = {}
+        derived = {rule['column']: _RULE_TYPES[rule['type']](self, df, rule) for rule in self.rules}
+        return pd.DataFrame(derived, index=df.index)
+
+    def column_positions(self, df):
+        """Column letter each rule writes to: its 'position', the existing column, or the next free one"""
+        positions = {}
+        next_free = len(df.columns) + 1
+        for rule in self.rules:
+            if 'position' in rule:
+                positions[rule['column']] = rule['position']
+            elif rule['column'] in df.columns:
+                positions[rule['column']] = get_column_letter(df.columns.get_loc(rule['column']) + 1)
+            else:
+                positions[rule['column']] = get_column_letter(next_free)
+                next_free += 1
+        return positions
+
+    def apply_to_workbook(self, file_path, sheet_name, output_path=None):
+        """Evaluate the rules on a sheet and patch the derived columns into the workbook"""
+        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        derived = self.evaluate(df)
+        positions = self.column_positions(df)
+        columns = {positions[name]: (name, derived[name].tolist()) for name in derived.columns}
+        patch_columns(file_path, sheet_name, columns, output_path=output_path)
+        return derived
+
+
+def _tag_flag(engine, df, rule):
+    index = engine._tag_index(df, rule.get('source', PERSON_TAG_COLUMN))
+    return index.flag(rule['tag'], rule.get('match', 'exact'))
+
+
+def _tag_count(engine, df, rule):
+    return engine._tag_index(df, rule.get('source', PERSON_TAG_COLUMN)).tags_per_row()
+
+
+def _industry_count(engine, df, rule):
+    source = df[rule.get('source', 'Industries')]
+    counts = count_delimited(source, rule.get('sep', '|')).astype(np.float64)
+    # Students without industry data stay blank rather than counting as zero
+    counts[source.isna().to_numpy()] = np.nan
+    return counts
+
+
+def _tags_per_session(engine, df, rule):
+    index = engine._tag_index(df, rule.get('source', PERSON_TAG_COLUMN))
+    return index.tags_per_session(df[rule.get('sessions', 'Web sessions')])
+
+
+_RULE_TYPES = {
+    'tag_flag': _tag_flag,
+    'tag_count': _tag_count,
+    'industry_count': _industry_count,
+    'tags_per_session': _tags_per_session,
+}
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August Export_SD 2 Sept_modified.xlsx"
+    sheet_name = sys.argv[2] if len(sys.argv) > 2 else 'August'
+
+    engine = DerivedColumnEngine([CAREER_PROFILING_RULE])
+    derived = engine.apply_to_workbook(file_path, sheet_name)
+    for column in derived.columns:
+        print(f"{column}: {int(derived[column].sum())} rows flagged")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 from openpyxl import load_workbook
+from august_metrics import AugustMetrics
+from summary_stats import MetricAccumulator
 
 def calculate_detailed_august_metrics():
     """Calculate detailed August metrics for the specific requirements"""
@@ -15,6 +17,7 @@ def calculate_detailed_august_metrics():
         
         # Clean column names
         august_df.columns = august_df.columns.str.strip()
+        metrics = AugustMetrics(august_df)
         
         print("\n" + "="*80)
         print("📊 DETAILED AUGUST METRICS CALCULATION")
@@ -60,16 +63,9 @@ def calculate_detailed_august_metrics():
             
             if sample_industry and isinstance(sample_industry, str):
                 # Count modules per student
-                module_counts = []
-                for value in industry_data:
-                    if pd.notna(value) and isinstance(value, str):
-                        # Split by pipe and count non-empty modules
-                        modules = [m.strip() for m in str(value).split('|') if m.strip() and m.strip() != "'"]
-                        module_counts.append(len(modules))
-                    else:
-                        module_counts.append(0)
+                module_counts = metrics.industry_counts
                 
-                if module_counts:
+                if len(module_counts):
                     avg_industry_modules = np.mean(module_counts)
                     print(f"Average industry-based modules completed per student: {avg_industry_modules:.2f}")
                     print(f"Module count distribution: {np.unique(module_counts, return_counts=True)}")
@@ -97,26 +93,16 @@ def calculate_detailed_august_metrics():
             print(f"Students with person tag data: {len(person_tags)}")
             
             # Calculate modules engaged per session
-            modules_per_session = []
-            valid_students = 0
+            modules_per_session = MetricAccumulator()
+            modules_per_session.update(metrics.modules_per_session)
+            valid_students = len(metrics.modules_per_session)
             
-            for i in range(len(august_df)):
-                web_session_count = august_df.iloc[i][web_sessions_col]
-                person_tag_value = august_df.iloc[i][person_tag_col]
-                
-                if pd.notna(web_session_count) and pd.notna(person_tag_value) and web_session_count > 0:
-                    if isinstance(person_tag_value, str):
-                        # Count different engagement types in person tag
-                        engagements = [e.strip() for e in str(person_tag_value).split(',') if e.strip()]
-                        modules_per_session.append(len(engagements) / web_session_count)
-                        valid_students += 1
-            
-            if modules_per_session:
-                avg_modules_per_session = np.mean(modules_per_session)
+            if modules_per_session.count:
+                avg_modules_per_session = modules_per_session.mean()
                 print(f"Students with valid session and engagement data: {valid_students}")
                 print(f"Average modules engaged with per session per student: {avg_modules_per_session:.2f}")
-                print(f"Modules per session range: {min(modules_per_session):.2f} to {max(modules_per_session):.2f}")
-                print(f"Modules per session distribution: {np.percentile(modules_per_session, [25, 50, 75])}")
+                print(f"Modules per session range: {modules_per_session.min():.2f} to {modules_per_session.max():.2f}")
+                print(f"Modules per session distribution: {modules_per_session.percentiles([25, 50, 75])}")
             else:
                 print("No valid modules per session data found")
         else:
@@ -130,40 +116,12 @@ def calculate_detailed_august_metrics():
         # Calculate final metrics
         final_metrics = {}
         
-        # VWE metric
-        if vwe_column in august_df.columns:
-            vwe_data = august_df[vwe_column].dropna()
-            if pd.api.types.is_numeric_dtype(vwe_data):
-                final_metrics['VWE'] = vwe_data.mean()
-        
-        # Industry metric
-        if industry_column in august_df.columns:
-            industry_data = august_df[industry_column].dropna()
-            if len(industry_data) > 0:
-                module_counts = []
-                for value in industry_data:
-                    if pd.notna(value) and isinstance(value, str):
-                        modules = [m.strip() for m in str(value).split('|') if m.strip() and m.strip() != "'"]
-                        module_counts.append(len(modules))
-                    else:
-                        module_counts.append(0)
-                if module_counts:
-                    final_metrics['Industry'] = np.mean(module_counts)
-        
-        # Modules per session metric
-        if web_sessions_col in august_df.columns and person_tag_col in august_df.columns:
-            modules_per_session = []
-            for i in range(len(august_df)):
-                web_session_count = august_df.iloc[i][web_sessions_col]
-                person_tag_value = august_df.iloc[i][person_tag_col]
-                
-                if pd.notna(web_session_count) and pd.notna(person_tag_value) and web_session_count > 0:
-                    if isinstance(person_tag_value, str):
-                        engagements = [e.strip() for e in str(person_tag_value).split(',') if e.strip()]
-                        modules_per_session.append(len(engagements) / web_session_count)
-            
-            if modules_per_session:
-                final_metrics['Modules_Per_Session'] = np.mean(modules_per_session)
+        if vwe_column in august_df.columns and len(metrics.vwe_values):
+            final_metrics['VWE'] = metrics.avg_vwe
+        if industry_column in august_df.columns and len(metrics.industry_counts):
+            final_metrics['Industry'] = metrics.avg_industry_modules
+        if len(metrics.modules_per_session):
+            final_metrics['Modules_Per_Session'] = metrics.avg_modules_per_session
         
         # Display final formatted results
         print("\n🎯 FINAL RESULTS FOR AUGUST:")
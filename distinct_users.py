@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Distinct User Counting
+This module counts distinct users and month-to-month overlaps either exactly
+(Python sets, for small inputs) or approximately with bounded memory.
+
+HyperLogLog gives cheap distinct counts for a single column. Theta sketches
+(k minimum values) additionally support unions and multi-way intersections,
+which is what overlap and retention questions across many months need.
+"""
+
+import sys
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+# Inputs up to this many values are counted exactly in 'auto' mode
+DEFAULT_EXACT_THRESHOLD = 100000
+
+_HASH_SPACE = float(2 ** 64)
+_MAX_HASH = np.uint64(2 ** 64 - 1)
+
+
+def hash_values(values, normalize=False):
+    """Hash non-missing values to uint64, optionally lower-casing them first"""
+    series = pd.Series(values).dropna().astype(str)
+    if normalize:
+        series = series.str.strip().str.lower()
+    return pd.util.hash_array(series.to_numpy(dtype=object))
+
+
+def _bit_length(values):
+    """Vectorized int.bit_length for uint64 arrays"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # frexp is exact below 2**53, so split the words to stay in range
+    high_bits = np.frexp(high)[1]
+    low_bits = np.frexp(low)[1]
+    return np.where(high > 0, high_bits + 32, low_bits)
+
+
+class HyperLogLog:
+    """Distinct-count estimator using 2**p one-byte registers"""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = np.zeros(2 ** p, dtype=np.uint8)
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return self
+        shift = np.uint64(64 - self.p)
+        index = (hashes >> shift).astype(np.intp)
+        remainder = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - _bit_length(remainder) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def update(self, values, normalize=False):
+        return self.update_hashes(hash_values(values, normalize))
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = float(self.registers.size)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class ThetaSketch:
+    """
+    K-minimum-values sketch supporting union and intersection estimates
+
+    Retains the k smallest distinct hashes below theta. While fewer than k
+    distinct values have been seen the sketch is exact.
+    """
+
+    def __init__(self, k=4096):
+        self.k = k
+        self.theta = _MAX_HASH
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def _truncate(self, hashes):
+        if hashes.size > self.k:
+            self.theta = min(self.theta, hashes[self.k])
+            hashes = hashes[:self.k]
+        self.hashes = hashes
+        return self
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        hashes = hashes[hashes < self.theta]
+        return self._truncate(np.union1d(self.hashes, hashes))
+
+    def update(self, values, normalize=False):
+        return self.update_hashes(hash_values(values, normalize))
+
+    def merge(self, other):
+        """Union another sketch into this one"""
+        self.theta = min(self.theta, other.theta)
+        merged = np.union1d(self.hashes[self.hashes < self.theta],
+                            other.hashes[other.hashes < self.theta])
+        return self._truncate(merged)
+
+    def fraction(self):
+        """Fraction of the hash space the retained hashes represent"""
+        return 1.0 if self.theta == _MAX_HASH else float(self.theta) / _HASH_SPACE
+
+    def count(self):
+        return int(round(self.hashes.size / self.fraction()))
+
+    @staticmethod
+    def intersection_count(sketches):
+        """Estimate how many values are present in every sketch"""
+        theta = min(sketch.theta for sketch in sketches)
+        common = reduce(np.intersect1d, [sketch.hashes[sketch.hashes < theta] for sketch in sketches])
+        fraction = 1.0 if theta == _MAX_HASH else float(theta) / _HASH_SPACE
+        return int(round(common.size / fraction))
+
+    @staticmethod
+    def union_count(sketches):
+        union = ThetaSketch(k=min(sketch.k for sketch in sketches))
+        for sketch in sketches:
+            union.merge(sketch)
+        return union.count()
+
+
+def count_distinct(values, mode='auto', exact_threshold=DEFAULT_EXACT_THRESHOLD, p=14):
+    """
+    Count distinct non-missing values
+
+    mode is 'exact', 'sketch' or 'auto' (exact for inputs up to
+    exact_threshold values, HyperLogLog above that).
+    """
+    if mode == 'exact' or (mode == 'auto' and len(values) <= exact_threshold):
+        return int(pd.Series(values).nunique())
+    return HyperLogLog(p).update(values).count()
+
+
+class MonthPanel:
+    """Distinct users per month and their overlaps, exactly or via theta sketches"""
+
+    def __init__(self, mode='auto', exact_threshold=DEFAULT_EXACT_THRESHOLD, k=4096, normalize=True):
+        if mode not in ('auto', 'exact', 'sketch'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.mode = mode
+        self.exact_threshold = exact_threshold
+        self.k = k
+        self.normalize = normalize
+        self.months = {}
+        self._exact = mode != 'sketch'
+        self._total_values = 0
+
+    @property
+    def is_exact(self):
+        return self._exact
+
+    def add_month(self, name, emails):
+        """Add (or extend) a month with a column or iterable of emails"""
+        if self._exact:
+            series = pd.Series(emails).dropna().astype(str)
+            if self.normalize:
+                series = series.str.strip().str.lower()
+            values = set(series)
+            self.months[name] = self.months.get(name, set()) | values
+            self._total_values += len(values)
+            if self.mode == 'auto' and self._total_values > self.exact_threshold:
+                self._switch_to_sketches()
+        else:
+            sketch = self.months.setdefault(name, ThetaSketch(self.k))
+            sketch.update(emails, normalize=self.normalize)
+        return self
+
+    def _switch_to_sketches(self):
+        """Replace the exact sets with theta sketches once the panel grows large"""
+        for name, values in self.months.items():
+            sketch = ThetaSketch(self.k)
+            sketch.update_hashes(pd.util.hash_array(np.array(list(values), dtype=object)))
+            self.months[name] = sketch
+        self._exact = False
+
+    def distinct(self, name):
+        months = self.months[name]
+        return len(months) if self._exact else months.count()
+
+    def overlap(self, *names):
+        """Users present in every one of the named months"""
+        members = [self.months[name] for name in names]
+        if self._exact:
+            return len(set.intersection(*members))
+        return ThetaSketch.intersection_count(members)
+
+    def union(self, *names):
+        """Users present in at least one of the named months"""
+        members = [self.months[name] for name in names]
+        if self._exact:
+            return len(set.union(*members))
+        return ThetaSketch.union_count(members)
+
+    def retention(self, from_month, to_month):
+        """Fraction of from_month's users who are also present in to_month"""
+        base = self.distinct(from_month)
+        return self.overlap(from_month, to_month) / base if base else 0.0
+
+    def overlap_matrix(self):
+        """Pairwise overlap counts between all months"""
+        names = list(self.months)
+        return pd.DataFrame([[self.overlap(a, b) if a != b else self.distinct(a) for b in names]
+                             for a in names], index=names, columns=names)
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August Export_SD 2 Sept.xlsx"
+    month_sheets = sys.argv[2:] or ['July ', 'August']
+
+    print("DISTINCT USERS AND MONTH OVERLAPS")
+    print("="*50)
+
+    panel = MonthPanel()
+    for sheet_name in month_sheets:
+        month_data = pd.read_excel(file_path, sheet_name=sheet_name, usecols=['Email'])
+        panel.add_month(sheet_name.strip(), month_data['Email'])
+
+    print(f"Mode: {'exact' if panel.is_exact else 'theta sketch'}")
+    for name in panel.months:
+        print(f"{name}: {panel.distinct(name)} distinct users")
+
+    print("\nPairwise overlaps:")
+    print(panel.overlap_matrix().to_string())
+
+    names = list(panel.months)
+    for from_month, to_month in zip(names, names[1:]):
+        print(f"\nRetention {from_month} -> {to_month}: {panel.retention(from_month, to_month):.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Growth Metrics
+This module computes month-over-month changes of whole metric columns at
+once: deltas, percent changes, log ratios and capped growth, for any pair of
+before / after columns.
+
+Every function takes array-likes (or Series) of equal length and returns a
+NumPy array. A zero baseline is resolved by an explicit policy instead of a
+per-row conditional:
+
+    'zero'   report 0 (what the comparison reports have always shown)
+    'nan'    report NaN, leaving the row out of means and medians
+    'inf'    report +inf / -inf by the direction of the change (NaN when unchanged)
+    number   report that sentinel value
+
+    percent_change([0, 4, 10], [3, 6, 5])                     # [0., 50., -50.]
+    percent_change([0, 4], [3, 6], zero_baseline='inf')       # [inf, 50.]
+    metric_changes(july, august, 'Login Count', 'Login Count')
+"""
+
+import numpy as np
+import pandas as pd
+
+ZERO_BASELINE_POLICIES = ('zero', 'nan', 'inf')
+
+
+def _values(values):
+    return values.to_numpy() if isinstance(values, (pd.Series, pd.Index)) else np.asarray(values)
+
+
+def _floats(values):
+    return np.asarray(_values(values), dtype=np.float64)
+
+
+def check_zero_baseline(zero_baseline):
+    """Raise ValueError for a policy that is neither a known name nor a number"""
+    if isinstance(zero_baseline, str):
+        if zero_baseline not in ZERO_BASELINE_POLICIES:
+            raise ValueError(f"Unknown zero baseline policy '{zero_baseline}'; "
+                             f"use one of {list(ZERO_BASELINE_POLICIES)} or a number")
+    elif not isinstance(zero_baseline, (int, float, np.number)) or isinstance(zero_baseline, bool):
+        raise ValueError(f"Zero baseline policy must be a name or a number, not {zero_baseline!r}")
+
+
+def _zero_baseline_values(zero_baseline, change):
+    """What rows with a zero baseline report under the policy"""
+    check_zero_baseline(zero_baseline)
+    if zero_baseline == 'zero':
+        return np.zeros_like(change)
+    if zero_baseline == 'nan':
+        return np.full_like(change, np.nan)
+    if zero_baseline == 'inf':
+        return np.select([change > 0, change < 0], [np.inf, -np.inf], default=np.nan)
+    return np.full_like(change, float(zero_baseline))
+
+
+def delta(before, after):
+    """after - before, keeping integer columns integer"""
+    return _values(after) - _values(before)
+
+
+def percent_change(before, after, zero_baseline='zero', decimals=None):
+    """
+    (after - before) / |before| * 100
+
+    Rows whose baseline is zero follow the zero_baseline policy; decimals
+    rounds the result (half to even) the way round() did per value.
+    """
+    before, after = _floats(before), _floats(after)
+    change = after - before
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = change / np.abs(before) * 100
+    pct = np.where(before == 0, _zero_baseline_values(zero_baseline, change), pct)
+    return pct if decimals is None else np.round(pct, decimals)
+
+
+def log_ratio(before, after, zero_baseline='nan'):
+    """
+    Natural log of after / before, symmetric for growth and decline
+
+    Rows with a zero baseline follow the policy; a drop to zero gives -inf
+    and negative values give NaN.
+    """
+    before, after = _floats(before), _floats(after)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.log(after) - np.log(before)
+    return np.where(before == 0, _zero_baseline_values(zero_baseline, after - before), ratio)
+
+
+def capped_growth(before, after, cap=100.0, floor=-100.0, zero_baseline='inf', decimals=None):
+    """
+    Percent change clipped to [floor, cap]
+
+    With the default 'inf' policy a rise from zero reports the cap, so a few
+    users starting from nothing do not dominate an average.
+    """
+    pct = np.clip(percent_change(before, after, zero_baseline), floor, cap)
+    return pct if decimals is None else np.round(pct, decimals)
+
+
+def metric_changes(before, after, before_column, after_column=None, fill_value=0, zero_baseline='zero',
+                   decimals=2):
+    """
+    (before values, after values, delta, percent change) of one metric
+
+    before and after are aligned frames (one row per user). A column a frame
+    does not have counts as fill_value throughout, and missing values are
+    filled the same way, matching how the comparison treats blank cells.
+    """
+    after_column = before_column if after_column is None else after_column
+    old = _filled(before, before_column, fill_value)
+    new = _filled(after, after_column, fill_value)
+    return old, new, delta(old, new), percent_change(old, new, zero_baseline, decimals)
+
+
+def _filled(frame, column, fill_value):
+    if column not in frame.columns:
+        return np.full(len(frame), fill_value)
+    return frame[column].fillna(fill_value).to_numpy()
@@ -0,0 +1,209 @@
+"""
+Incremental Month-over-Month Comparison
+This module detects which users changed between two deliveries of the same
+export and maintains comparison summary statistics without recomputing them
+from scratch.
+
+Each export row is reduced to a 64-bit hash keyed by email. Diffing the hashes
+of a re-delivered export against the previous snapshot yields the inserted,
+updated and deleted users, so only those users need to be recompared. Medians
+are kept in a sorted multiset so they can be updated as rows come and go.
+"""
+
+import bisect
+import math
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from analysis_cache import DEFAULT_CACHE_DIR
+
+# (summary section, comparison column, label suffix) for each compared metric
+SUMMARY_METRICS = [
+    ('Login Count Increases', 'Login Count Increase', ''),
+    ('Avg Login Time Increases', 'Avg Time Increase (seconds)', ' (seconds)'),
+    ('VWE Increases', 'VWE Increase', ''),
+]
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(DEFAULT_CACHE_DIR, "july_august_snapshot.pkl")
+
+
+def compute_row_hashes(df, key='Email', every_row=False):
+    """
+    Hash every row of an export, keyed by email
+
+    Rows without an email are ignored and only the first row per email is
+    hashed, matching how the comparison picks a user's row. With every_row
+    the hashes of all of a user's rows are combined (in row order), for
+    duplicate policies that read more than the first row.
+    """
+    data = df[df[key].notna()]
+    keys = data[key].astype(str)
+    if every_row:
+        hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+        occurrence = keys.groupby(keys, sort=False).cumcount().to_numpy().astype(np.uint64)
+        codes, uniques = pd.factorize(keys)
+        combined = np.zeros(len(uniques), dtype=np.uint64)
+        np.add.at(combined, codes, pd.util.hash_array(hashes ^ occurrence))
+        return pd.Series(combined, index=pd.Index(uniques, name=key))
+    first = ~keys.duplicated(keep='first')
+    data = data[first.values]
+    hashes = pd.util.hash_pandas_object(data, index=False)
+    return pd.Series(hashes.values, index=pd.Index(keys[first].values, name=key))
+
+
+class ExportDiff:
+    def __init__(self, inserted, updated, deleted):
+        self.inserted = set(inserted)
+        self.updated = set(updated)
+        self.deleted = set(deleted)
+
+    @property
+    def changed(self):
+        """Every key that was inserted, updated or deleted"""
+        return self.inserted | self.updated | self.deleted
+
+    def is_empty(self):
+        return not (self.inserted or self.updated or self.deleted)
+
+    def __repr__(self):
+        return (f"ExportDiff(inserted={len(self.inserted)}, updated={len(self.updated)}, "
+                f"deleted={len(self.deleted)})")
+
+
+def diff_row_hashes(old_hashes, new_hashes):
+    """Compare two row-hash series and classify the keys that changed"""
+    inserted = new_hashes.index.difference(old_hashes.index)
+    deleted = old_hashes.index.difference(new_hashes.index)
+    common = new_hashes.index.intersection(old_hashes.index)
+    changed = new_hashes.loc[common].values != old_hashes.loc[common].values
+    return ExportDiff(inserted, common[changed], deleted)
+
+
+class SortedMultiset:
+    """Sorted list supporting insertion, removal and order-statistic queries"""
+
+    def __init__(self, values=()):
+        self._values = sorted(values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, value):
+        bisect.insort(self._values, value)
+
+    def remove(self, value):
+        """Remove one occurrence of value, returning False if it is absent"""
+        index = bisect.bisect_left(self._values, value)
+        if index < len(self._values) and self._values[index] == value:
+            del self._values[index]
+            return True
+        return False
+
+    def kth(self, k):
+        """Return the k-th smallest value (0-based)"""
+        return self._values[k]
+
+    def median(self):
+        n = len(self._values)
+        if n == 0:
+            return math.nan
+        middle = n // 2
+        if n % 2:
+            return self._values[middle]
+        return (self._values[middle - 1] + self._values[middle]) / 2
+
+    def min(self):
+        return self._values[0] if self._values else math.nan
+
+    def max(self):
+        return self._values[-1] if self._values else math.nan
+
+
+class IncrementalMetricSummary:
+    """Mean/median/min/max and sign counts for one metric, updatable per row"""
+
+    def __init__(self, values=()):
+        values = [v for v in values if not _is_missing(v)]
+        self.count = len(values)
+        self.total = sum(values)
+        self.positive = sum(1 for v in values if v > 0)
+        self.negative = sum(1 for v in values if v < 0)
+        self.values = SortedMultiset(values)
+
+    def add(self, value):
+        if _is_missing(value):
+            return
+        self.count += 1
+        self.total += value
+        self.positive += value > 0
+        self.negative += value < 0
+        self.values.add(value)
+
+    def remove(self, value):
+        if _is_missing(value) or not self.values.remove(value):
+            return
+        self.count -= 1
+        self.total -= value
+        self.positive -= value > 0
+        self.negative -= value < 0
+
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def to_summary(self, suffix=''):
+        """Return the summary section in generate_summary_statistics format"""
+        return {
+            f'Average Increase{suffix}': round(self.mean(), 2),
+            f'Median Increase{suffix}': round(float(self.values.median()), 2),
+            f'Max Increase{suffix}': self.values.max(),
+            f'Min Increase{suffix}': self.values.min(),
+            'Users with Positive Increase': self.positive,
+            'Users with Negative Increase': self.negative
+        }
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def build_metric_summaries(comparison_results):
+    """Build one incremental summary per compared metric"""
+    summaries = {}
+    for _, column, _ in SUMMARY_METRICS:
+        values = comparison_results[column].tolist() if column in comparison_results else []
+        summaries[column] = IncrementalMetricSummary(values)
+    return summaries
+
+
+def summaries_to_statistics(summaries, total_users):
+    """Assemble the full summary dictionary from the metric summaries"""
+    summary = {'Total Existing Users': total_users}
+    for section, column, suffix in SUMMARY_METRICS:
+        summary[section] = summaries[column].to_summary(suffix)
+    return summary
+
+
+def load_snapshot(snapshot_path=DEFAULT_SNAPSHOT_PATH):
+    """Load the previous comparison snapshot, or None if there is none"""
+    try:
+        with open(snapshot_path, "rb") as handle:
+            return pickle.load(handle)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+        return None
+
+
+def save_snapshot(snapshot, snapshot_path=DEFAULT_SNAPSHOT_PATH):
+    """Persist a comparison snapshot for the next incremental run"""
+    directory = os.path.dirname(snapshot_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        pickle.dump(snapshot, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
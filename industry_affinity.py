@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Industry Affinity Analysis
+This script computes which industries students choose together: the
+industry x industry co-occurrence matrix, lift and Jaccard affinity, and
+the top related industries per faculty and year group.
+
+Each student's industry preferences are packed into a 64-bit set, so the
+student x industry matrix X is held as one integer per student. Students
+with the same set are counted once with a weight, and the co-occurrence
+matrix X^T X is a weighted product over the distinct sets, which keeps it
+fast for millions of students.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from industry_preferences_analysis import IndustryPreferencesAnalysis
+from sheet_writer import CellStyle, scale_style_mask, set_column_widths, write_dataframe
+
+MAX_INDUSTRIES = 64
+
+# Heatmap shades, lightest to darkest
+HEATMAP_COLORS = ['F2F7FC', 'DDEBF7', 'BDD7EE', '9BC2E6', '5B9BD5', '2F75B5']
+
+
+def industry_sets(industry_strings, industry_numbers):
+    """
+    Bitset of each student's industries, bit i standing for industry_numbers[i]
+
+    Parses strings such as "'|14|15|12|" like parse_industry_numbers does;
+    numbers outside industry_numbers are ignored.
+    """
+    industry_numbers = np.asarray(industry_numbers, dtype=np.int64)
+    if len(industry_numbers) > MAX_INDUSTRIES:
+        raise ValueError(f"At most {MAX_INDUSTRIES} industries fit in a set, got {len(industry_numbers)}")
+
+    series = pd.Series(industry_strings).reset_index(drop=True)
+    numbers = series.astype('string').str.findall(r'\d+').explode().dropna()
+    rows = numbers.index.to_numpy(dtype=np.int64)
+    values = numbers.astype(np.int64).to_numpy()
+
+    order = np.argsort(industry_numbers)
+    positions = np.searchsorted(industry_numbers, values, sorter=order).clip(0, len(industry_numbers) - 1)
+    codes = order[positions]
+    known = industry_numbers[codes] == values
+
+    sets = np.zeros(len(series), dtype=np.uint64)
+    np.bitwise_or.at(sets, rows[known], np.left_shift(np.uint64(1), codes[known].astype(np.uint64)))
+    return sets
+
+
+def _unpack(sets, n_industries):
+    """Dense 0/1 matrix of a set array"""
+    bits = np.arange(n_industries, dtype=np.uint64)
+    return ((sets[:, None] >> bits) & np.uint64(1)).astype(np.float64)
+
+
+def co_occurrence_by_group(sets, group_codes, n_groups, n_industries):
+    """
+    Industry x industry co-occurrence per group, shape (groups, industries, industries)
+
+    Entry [g, i, j] counts students of group g holding both industries; the
+    diagonal counts students holding industry i.
+    """
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    valid = (group_codes >= 0) & (sets != 0)
+    # Distinct (group, set) pairs weighted by how many students share them
+    pairs = pd.DataFrame({'group': group_codes[valid], 'set': sets[valid]})
+    counts = pairs.groupby(['group', 'set'], sort=True).size()
+    groups = counts.index.get_level_values('group').to_numpy()
+    unique_sets = counts.index.get_level_values('set').to_numpy(dtype=np.uint64)
+    weights = counts.to_numpy(dtype=np.float64)
+
+    matrix = _unpack(unique_sets, n_industries)
+    result = np.zeros((n_groups, n_industries, n_industries), dtype=np.int64)
+    bounds = np.searchsorted(groups, np.arange(n_groups + 1))
+    for group in range(n_groups):
+        start, end = bounds[group], bounds[group + 1]
+        if start < end:
+            block = matrix[start:end]
+            result[group] = np.rint((block * weights[start:end, None]).T @ block).astype(np.int64)
+    return result
+
+
+def affinity(co_occurrence, n_students):
+    """Lift and Jaccard affinity from a co-occurrence matrix and the number of students with any industry"""
+    counts = np.diagonal(co_occurrence).astype(np.float64)
+    co = co_occurrence.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = co * n_students / np.outer(counts, counts)
+        jaccard = co / (counts[:, None] + counts[None, :] - co)
+    lift[~np.isfinite(lift)] = np.nan
+    jaccard[~np.isfinite(jaccard)] = np.nan
+    return lift, jaccard
+
+
+def top_related(co_occurrence, lift, jaccard, k=3, by='lift', min_count=1):
+    """
+    Top k related industries for each industry as (industry, rank, related) index arrays
+
+    Ranks by lift or Jaccard; ties go to the pair chosen together more often,
+    then to the earlier industry. Pairs chosen together fewer than min_count
+    times are left out.
+    """
+    score = lift if by == 'lift' else jaccard
+    n = co_occurrence.shape[0]
+    rows = []
+    for industry in range(n):
+        candidates = np.flatnonzero((co_occurrence[industry] >= min_count) & (np.arange(n) != industry))
+        if not len(candidates):
+            continue
+        # lexsort sorts by the last key first
+        order = np.lexsort((candidates, -co_occurrence[industry, candidates],
+                            -np.nan_to_num(score[industry, candidates], nan=-np.inf)))
+        for rank, related in enumerate(candidates[order[:k]], 1):
+            rows.append((industry, rank, related))
+    return np.asarray(rows, dtype=np.int64).reshape(-1, 3)
+
+
+class IndustryAffinityAnalysis:
+    def __init__(self, file_path, cache=None):
+        self.file_path = file_path
+        self.preferences = IndustryPreferencesAnalysis(file_path, cache=cache)
+        self.industry_numbers = None
+        self.industry_names = None
+        self.sets = None
+        self.analysis_results = {}
+
+    def load_data(self):
+        """Load the industry mapping and August data and build each student's industry set"""
+        if not self.preferences.load_industry_mapping() or not self.preferences.load_august_data():
+            return False
+        try:
+            mapping = self.preferences.industry_mapping
+            self.industry_numbers = mapping.numbers
+            self.industry_names = mapping.names
+            industries = self.preferences.query().select('Industries').collect()['Industries']
+            self.sets = industry_sets(industries, self.industry_numbers)
+            print(f"Students with industry preferences: {int((self.sets != 0).sum())}")
+            return True
+        except Exception as e:
+            print(f"Error building industry sets: {e}")
+            return False
+
+    def _matrix_frame(self, matrix):
+        return pd.DataFrame(matrix, index=pd.Index(self.industry_names, name='Industry'),
+                            columns=self.industry_names)
+
+    def compute_affinity(self, cohort=None):
+        """Co-occurrence, lift and Jaccard matrices for all students or one cohort"""
+        if self.sets is None:
+            print("No industry data loaded.")
+            return None
+
+        try:
+            rows = self.preferences.cohorts().rows(cohort)
+            sets = self.sets[rows]
+            co = co_occurrence_by_group(sets, np.zeros(len(sets), dtype=np.int64), 1, len(self.industry_names))[0]
+            n_students = int((sets != 0).sum())
+            lift, jaccard = affinity(co, n_students)
+
+            results = {
+                'students': n_students,
+                'co_occurrence': self._matrix_frame(co),
+                'lift': self._matrix_frame(lift),
+                'jaccard': self._matrix_frame(jaccard),
+            }
+            self.analysis_results.update(results)
+            return results
+
+        except Exception as e:
+            print(f"Error computing industry affinity: {e}")
+            return None
+
+    def top_related_by_cohort(self, k=3, by='lift', min_count=1):
+        """Top k related industries per industry for every faculty x year group"""
+        if self.sets is None:
+            print("No industry data loaded.")
+            return None
+
+        try:
+            cohorts = self.preferences.cohorts()
+            faculties = cohorts.categories['faculty']
+            years = cohorts.categories['year']
+            group_codes = (pd.Index(faculties).get_indexer(cohorts.labels('faculty')) * len(years)
+                           + pd.Index(years).get_indexer(cohorts.labels('year')))
+            n_industries = len(self.industry_names)
+            co = co_occurrence_by_group(self.sets, group_codes, len(faculties) * len(years), n_industries)
+            students = np.bincount(group_codes[self.sets != 0], minlength=len(faculties) * len(years))
+
+            names = np.asarray(self.industry_names, dtype=object)
+            tables = []
+            for group in np.flatnonzero(students):
+                lift, jaccard = affinity(co[group], students[group])
+                ranked = top_related(co[group], lift, jaccard, k=k, by=by, min_count=min_count)
+                if not len(ranked):
+                    continue
+                industry, rank, related = ranked.T
+                tables.append(pd.DataFrame({
+                    'Faculty': faculties[group // len(years)],
+                    'Year': years[group % len(years)],
+                    'Industry': names[industry],
+                    'Rank': rank,
+                    'Related Industry': names[related],
+                    'Students Choosing Both': co[group][industry, related],
+                    'Lift': np.round(lift[industry, related], 2),
+                    'Jaccard': np.round(jaccard[industry, related], 3),
+                }))
+
+            columns = ['Faculty', 'Year', 'Industry', 'Rank', 'Related Industry',
+                       'Students Choosing Both', 'Lift', 'Jaccard']
+            table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=columns)
+            self.analysis_results['top_related'] = table
+            return table
+
+        except Exception as e:
+            print(f"Error ranking related industries: {e}")
+            return None
+
+    def create_excel_report(self, output_filename="Industry_Affinity_Analysis.xlsx"):
+        """Create Excel report with heatmap-styled affinity sheets"""
+        try:
+            wb = Workbook()
+            wb.remove(wb.active)
+
+            if 'co_occurrence' in self.analysis_results:
+                co = self.analysis_results['co_occurrence']
+                off_diagonal = co.to_numpy()[~np.eye(len(co), dtype=bool)]
+                top = max(int(off_diagonal.max()), 1) if off_diagonal.size else 1
+                self.create_heatmap_sheet(wb, "Co-occurrence", "STUDENTS CHOOSING BOTH INDUSTRIES", co,
+                                          edges=np.linspace(0, top, len(HEATMAP_COLORS))[1:], number_format='0')
+            if 'lift' in self.analysis_results:
+                self.create_heatmap_sheet(wb, "Lift", "INDUSTRY LIFT (1 = CHOSEN TOGETHER AS OFTEN AS BY CHANCE)",
+                                          self.analysis_results['lift'], edges=[0.5, 1, 1.5, 2, 3], number_format='0.00')
+            if 'jaccard' in self.analysis_results:
+                self.create_heatmap_sheet(wb, "Jaccard", "INDUSTRY JACCARD AFFINITY",
+                                          self.analysis_results['jaccard'], edges=[0.05, 0.1, 0.2, 0.3, 0.5],
+                                          number_format='0.000')
+            if 'top_related' in self.analysis_results:
+                self.create_top_related_sheet(wb, self.analysis_results['top_related'])
+
+            wb.save(output_filename)
+            print(f"Excel report saved as: {output_filename}")
+            return True
+
+        except Exception as e:
+            print(f"Error creating Excel report: {e}")
+            return False
+
+    def create_heatmap_sheet(self, wb, title, heading, matrix, edges, number_format):
+        """Write an industry x industry matrix with graded fills"""
+        ws = wb.create_sheet(title)
+        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=min(len(matrix.columns) + 1, 12))
+        ws['A1'] = heading
+        ws['A1'].font = Font(size=16, bold=True)
+        ws['A1'].alignment = Alignment(horizontal='center')
+
+        df = matrix.reset_index()
+        header_style = CellStyle(font=Font(bold=True), alignment=Alignment(text_rotation=90, horizontal='center'),
+                                 fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"))
+        label_style = CellStyle(font=Font(bold=True))
+        diagonal_style = CellStyle(fill=PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid"),
+                                   number_format=number_format)
+        shade_styles = [CellStyle(fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+                                  font=Font(color="FFFFFF" if i >= len(HEATMAP_COLORS) - 2 else "000000"),
+                                  number_format=number_format)
+                        for i, color in enumerate(HEATMAP_COLORS)]
+
+        # Style 0: labels, 1: diagonal, 2...: shades by value
+        values = matrix.to_numpy(dtype=np.float64)
+        mask = np.zeros(df.shape, dtype=np.intp)
+        mask[:, 1:] = scale_style_mask(values, edges, first_style=2, default=2)
+        mask[:, 1:][np.eye(len(values), dtype=bool)] = 1
+        write_dataframe(ws, df, start_row=3, header_style=header_style,
+                        styles=[label_style, diagonal_style] + shade_styles, style_mask=mask)
+
+        ws.column_dimensions['A'].width = min(int(df['Industry'].astype(str).str.len().max()) + 2, 50)
+        for col_idx in range(2, len(df.columns) + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 7
+        ws.row_dimensions[3].height = 160
+        ws.freeze_panes = 'B4'
+
+    def create_top_related_sheet(self, wb, table):
+        """Write the top related industries per faculty and year group"""
+        ws = wb.create_sheet("Top Related Industries")
+        header_style = CellStyle(font=Font(bold=True), alignment=Alignment(horizontal='center'),
+                                 fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"))
+        write_dataframe(ws, table, header_style=header_style)
+        set_column_widths(ws, table)
+        ws.freeze_panes = 'A2'
+
+    def print_analysis_results(self, top_n=10):
+        """Print the strongest industry pairs"""
+        print("\n" + "="*80)
+        print("INDUSTRY AFFINITY ANALYSIS RESULTS")
+        print("="*80)
+
+        if 'co_occurrence' in self.analysis_results:
+            co = self.analysis_results['co_occurrence']
+            lift = self.analysis_results['lift']
+            jaccard = self.analysis_results['jaccard']
+            print(f"\nStudents with industry preferences: {self.analysis_results['students']}")
+            upper = np.triu(np.ones(co.shape, dtype=bool), k=1)
+            pairs = pd.DataFrame({
+                'Industry': np.repeat(co.index.to_numpy(), len(co))[upper.ravel()],
+                'Related Industry': np.tile(co.columns.to_numpy(), len(co))[upper.ravel()],
+                'Students': co.to_numpy()[upper],
+                'Lift': lift.to_numpy()[upper].round(2),
+                'Jaccard': jaccard.to_numpy()[upper].round(3),
+            })
+            print(f"\nTop {top_n} industry pairs by students choosing both:")
+            print(pairs.sort_values(['Students', 'Lift'], ascending=False, kind='stable').head(top_n).to_string(index=False))
+
+
+def main():
+    print("INDUSTRY AFFINITY ANALYSIS")
+    print("="*50)
+
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August Export_SD 2 Sept.xlsx"
+    analysis = IndustryAffinityAnalysis(file_path)
+    if not analysis.load_data():
+        return
+    if analysis.compute_affinity() is None:
+        return
+    if analysis.top_related_by_cohort() is None:
+        return
+
+    analysis.print_analysis_results()
+
+    if analysis.create_excel_report():
+        print("\n" + "="*60)
+        print("ANALYSIS COMPLETE")
+        print("="*60)
+        print("Excel report saved as: Industry_Affinity_Analysis.xlsx")
+        print("This file contains:")
+        print("1. Co-occurrence sheet - Students choosing each pair of industries")
+        print("2. Lift and Jaccard sheets - Industry affinity heatmaps")
+        print("3. Top Related Industries sheet - Top 3 related industries per faculty and year group")
+
+if __name__ == "__main__":
+    main()
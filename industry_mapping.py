@@ -0,0 +1,197 @@
+"""
+Industry Mapping
+This module loads the industry number to name mapping from Sheet7 once and
+turns it into dense lookup tables shared by every industry report.
+
+Industry numbers are small integers, so the tables are arrays indexed by
+number: number -> name, number -> position in INDUSTRY_ORDER and position ->
+number, plus a name -> number dictionary. The mapping is validated when it is
+built and cached against the Sheet7 content hash, so it is parsed once per
+workbook snapshot.
+
+    mapping = load_industry_mapping("August Export_SD 2 Sept.xlsx")
+    mapping[14]                   # 'Engineering'
+    mapping.code('Engineering')   # 14
+    mapping.ordinals([14, 1, 99]) # array([13, 0, -1])
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from analysis_cache import function_identity, get_default_cache, read_sheet_cached, sheet_content_hash
+
+# Display order of the industry tables
+INDUSTRY_ORDER = [
+    'Accounting', 'Advertising, Media, Journalism, and Communications',
+    'Agriculture and Environment', 'Animals and Vet', 'Architecture',
+    'Arts, Humanities, and Politics', 'Building and Construction',
+    'Business and Commerce', 'Community and Social Work',
+    'Creative Arts and Music', 'Design', 'Economics and Finance',
+    'Education, Childcare and Teaching', 'Engineering', 'Entrepreneur',
+    'Food and Beverage', 'Government, Defence and Policing',
+    'Hair and Beauty', 'Health and Sport Sciences', 'Law',
+    'Marketing and Public Relations', 'Mathematics',
+    'Medical Sciences and Medicine', 'Nursing and Midwifery',
+    'Property and Real Estate', 'Psychology', 'Science', 'Technology',
+    'Trades and Mining', 'Sports', 'Transport, Tourism and Hospitality',
+    'Fashion', 'Australian Defence Force', 'Energy'
+]
+
+# The Engineering vs Arts table lists the first 28 industries of the display order
+FOCUSED_INDUSTRY_ORDER = INDUSTRY_ORDER[:28]
+
+# Sheet7 layout: two lines of notes, then the number in column B and the name in column C
+SHEET7_FIRST_ROW = 2
+SHEET7_NUMBER_COLUMN = 1
+SHEET7_NAME_COLUMN = 2
+
+
+class IndustryMapping(Mapping):
+    """Read-only industry number -> name mapping backed by dense arrays"""
+
+    def __init__(self, numbers, names, order=INDUSTRY_ORDER):
+        numbers = np.asarray(numbers, dtype=np.int64)
+        names = [str(name) for name in names]
+        _validate(numbers, names)
+
+        sort = np.argsort(numbers, kind='stable')
+        self.numbers = numbers[sort]
+        self.names = [names[i] for i in sort]
+        self.order = list(order)
+        size = int(self.numbers.max()) + 1 if len(self.numbers) else 0
+
+        # number -> name; None where no industry has the number
+        self.name_by_code = np.full(size, None, dtype=object)
+        self.name_by_code[self.numbers] = self.names
+        self.code_by_name = dict(zip(self.names, self.numbers.tolist()))
+
+        # number -> position in the display order (-1 when not listed) and back
+        positions = {name: position for position, name in enumerate(self.order)}
+        self.ordinal_by_code = np.full(size, -1, dtype=np.int64)
+        self.ordinal_by_code[self.numbers] = [positions.get(name, -1) for name in self.names]
+        self.code_by_ordinal = np.asarray([self.code_by_name.get(name, -1) for name in self.order],
+                                          dtype=np.int64)
+
+        # Table axis: the display order, then any Sheet7 industries it leaves out
+        self.axis = self.order + self.missing_from_order()
+        axis_positions = {name: position for position, name in enumerate(self.axis)}
+        self.axis_by_code = np.full(size, -1, dtype=np.int64)
+        self.axis_by_code[self.numbers] = [axis_positions[name] for name in self.names]
+
+    def __getitem__(self, number):
+        name = self.name(number)
+        if name is None:
+            raise KeyError(number)
+        return name
+
+    def __iter__(self):
+        return iter(self.numbers.tolist())
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __contains__(self, number):
+        return self.name(number) is not None
+
+    def name(self, number):
+        """Industry name for a number, or None"""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return None
+        if 0 <= number < len(self.name_by_code):
+            return self.name_by_code[number]
+        return None
+
+    def code(self, name):
+        """Industry number for a name, or None"""
+        return self.code_by_name.get(name)
+
+    def ordinals(self, numbers):
+        """Display order position of every number; -1 for unknown or unlisted numbers"""
+        numbers = np.asarray(numbers, dtype=np.int64)
+        known = (numbers >= 0) & (numbers < len(self.ordinal_by_code))
+        ordinals = np.full(numbers.shape, -1, dtype=np.int64)
+        ordinals[known] = self.ordinal_by_code[numbers[known]]
+        return ordinals
+
+    def axis_positions(self, numbers):
+        """Position of every number on the table axis; -1 for unknown numbers"""
+        numbers = np.asarray(numbers, dtype=np.int64)
+        known = (numbers >= 0) & (numbers < len(self.axis_by_code))
+        positions = np.full(numbers.shape, -1, dtype=np.int64)
+        positions[known] = self.axis_by_code[numbers[known]]
+        return positions
+
+    def explode(self, industry_strings):
+        """
+        (row position, industry number) of every known preference
+
+        Parses strings such as "'|14|15|12|" the way parse_industry_numbers
+        does, keeping repeats; numbers Sheet7 does not define are dropped.
+        """
+        numbers = pd.Series(industry_strings).reset_index(drop=True)
+        numbers = numbers.astype('string').str.findall(r'\d+').explode().dropna()
+        rows = numbers.index.to_numpy(dtype=np.int64)
+        values = numbers.astype(np.int64).to_numpy()
+        known = self.axis_positions(values) >= 0
+        return rows[known], values[known]
+
+    def missing_from_order(self):
+        """Names in Sheet7 that the display order leaves out"""
+        return [name for name in self.names if name not in self.order]
+
+    def missing_from_sheet(self):
+        """Names in the display order that Sheet7 does not define"""
+        return [name for name, code in zip(self.order, self.code_by_ordinal) if code < 0]
+
+
+def _validate(numbers, names):
+    if len(numbers) != len(names):
+        raise ValueError("Industry numbers and names differ in length")
+    if (numbers < 0).any():
+        raise ValueError(f"Negative industry numbers: {sorted(set(numbers[numbers < 0].tolist()))}")
+    duplicates = pd.Index(numbers).duplicated()
+    if duplicates.any():
+        raise ValueError(f"Industry numbers listed more than once: {sorted(set(numbers[duplicates].tolist()))}")
+    duplicates = pd.Index(names).duplicated()
+    if duplicates.any():
+        raise ValueError(f"Industry names listed more than once: {sorted({names[i] for i in np.flatnonzero(duplicates)})}")
+
+
+def parse_sheet7(df, order=INDUSTRY_ORDER):
+    """Build the mapping from Sheet7 read with header=None"""
+    rows = df.iloc[SHEET7_FIRST_ROW:, [SHEET7_NUMBER_COLUMN, SHEET7_NAME_COLUMN]]
+    rows = rows[rows.notna().all(axis=1)]
+    numbers = pd.to_numeric(rows.iloc[:, 0], errors='coerce')
+    bad = numbers.isna() | (numbers != numbers.round())
+    if bad.any():
+        raise ValueError(f"Sheet7 has non-integer industry numbers: {rows.iloc[:, 0][bad].tolist()}")
+    names = rows.iloc[:, 1].astype(str).str.strip()
+    return IndustryMapping(numbers.astype(np.int64).to_numpy(), names.tolist(), order)
+
+
+def _build_mapping(file_path, cache):
+    return parse_sheet7(read_sheet_cached(file_path, 'Sheet7', cache=cache, header=None))
+
+
+_loaded = {}
+
+
+def load_industry_mapping(file_path, cache=None):
+    """
+    Industry mapping of a workbook, parsed once per Sheet7 snapshot
+
+    Repeated loads in a process share one mapping object; across runs the
+    built mapping comes from the analysis cache, keyed on the class layout
+    as well so pickles of an older IndustryMapping are not reused.
+    """
+    cache = cache or get_default_cache()
+    content_hash = sheet_content_hash(file_path, 'Sheet7')
+    if content_hash not in _loaded:
+        _loaded[content_hash] = cache.cached_call(_build_mapping, content_hash,
+                                                  params={'file_path': file_path, 'cache': cache},
+                                                  key_params={'layout': function_identity(IndustryMapping.__init__)})
+    return _loaded[content_hash]
@@ -14,27 +14,33 @@ from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.utils import get_column_letter
 import numpy as np
 import re
+from analysis_cache import get_default_cache, read_sheet_cached, sheet_content_hash
+from chunked import DEFAULT_BATCH_SIZE, IndustryCubePartial, fold_sheet
+from cohorts import CohortIndex, clean_faculty_name, clean_year_name, cohort_columns, merge_selectors
+from count_cube import ENGINEERING_VS_ARTS, engineering_vs_arts, industry_cube
+from industry_mapping import FOCUSED_INDUSTRY_ORDER, load_industry_mapping
+from lazy_query import LazyFrame
+from parallel import parallel_fold
+from ranking import top_k_frame
+from sheet_writer import CellStyle, set_column_widths, write_dataframe
 
 class IndustryPreferencesAnalysis:
-    def __init__(self, file_path):
+    def __init__(self, file_path, cache=None):
         self.file_path = file_path
         self.industry_mapping = {}
         self.august_data = None
         self.analysis_results = {}
+        self.cache = cache or get_default_cache()
+        self._cohorts = None
         
+    def content_hash(self):
+        """Hash of the August and Sheet7 sheets, used to key cached results"""
+        return sheet_content_hash(self.file_path, ['August', 'Sheet7'])
+    
     def load_industry_mapping(self):
         """Load industry number to name mapping from Sheet 7"""
         try:
-            # Read Sheet 7
-            df = pd.read_excel(self.file_path, sheet_name='Sheet7', header=None)
-            
-            # Extract industry mappings (rows 2 onwards)
-            for i in range(2, len(df)):
-                row = df.iloc[i]
-                if pd.notna(row[1]) and pd.notna(row[2]):  # Check if both number and name exist
-                    industry_number = int(row[1])
-                    industry_name = str(row[2]).strip()
-                    self.industry_mapping[industry_number] = industry_name
+            self.industry_mapping = load_industry_mapping(self.file_path, cache=self.cache)
             
             print(f"Loaded {len(self.industry_mapping)} industry mappings:")
             for num, name in sorted(self.industry_mapping.items()):
@@ -49,13 +55,26 @@ class IndustryPreferencesAnalysis:
     def load_august_data(self):
         """Load August data"""
         try:
-            self.august_data = pd.read_excel(self.file_path, sheet_name='August')
+            self.august_data = read_sheet_cached(self.file_path, 'August', cache=self.cache)
+            self._cohorts = None
             print(f"August data loaded: {len(self.august_data)} rows")
             return True
         except Exception as e:
             print(f"Error loading August data: {e}")
             return False
     
+    def query(self, rows=None):
+        """Lazy query over the August sheet (or some row positions), reusing the loaded frame when there is one"""
+        if self.august_data is not None:
+            return LazyFrame.from_frame(self.august_data, rows=rows)
+        return LazyFrame.scan_sheet(self.file_path, 'August', cache=self.cache, rows=rows)
+    
+    def cohorts(self):
+        """Faculty / year / international status row index, built once per load"""
+        if self._cohorts is None:
+            self._cohorts = CohortIndex(self.query().select(*cohort_columns()).collect())
+        return self._cohorts
+    
     def parse_industry_numbers(self, industry_string):
         """Parse industry numbers from string like '|14|15|12|27|28|'"""
         if pd.isna(industry_string):
@@ -68,97 +87,21 @@ class IndustryPreferencesAnalysis:
     
     def clean_faculty_name(self, faculty_string):
         """Clean faculty name by removing pipes and standardizing"""
-        if pd.isna(faculty_string):
-            return "Unknown"
-        
-        faculty = str(faculty_string).replace("'", "").replace("|", "").strip()
-        
-        # Standardize faculty names
-        if "Faculty of Engineering" in faculty:
-            return "Faculty of Engineering"
-        elif "Faculty of Arts and Social Sciences" in faculty:
-            return "Faculty of Arts and Social Sciences"
-        elif "University of Sydney Business School" in faculty:
-            return "University of Sydney Business School"
-        elif "Faculty of Medicine and Health" in faculty:
-            return "Faculty of Medicine and Health"
-        elif "Sydney School of Architecture, Design and Planning" in faculty:
-            return "Sydney School of Architecture, Design and Planning"
-        elif "Sydney Law School" in faculty:
-            return "Sydney Law School"
-        elif "Sydney Conservatorium of Music" in faculty:
-            return "Sydney Conservatorium of Music"
-        else:
-            return "Other"
+        return clean_faculty_name(faculty_string)
     
     def clean_year_name(self, year_string):
         """Clean year name by removing pipes and standardizing"""
-        if pd.isna(year_string):
-            return "Unknown"
-        
-        year = str(year_string).replace("'", "").replace("|", "").strip()
-        
-        # Standardize year names
-        if "1st Year" in year or year == "1":
-            return "1st Year"
-        elif "2nd Year" in year or year == "2":
-            return "2nd Year"
-        elif "3rd Year" in year or year == "3":
-            return "3rd Year"
-        elif "4th Year" in year or year == "4":
-            return "4th Year"
-        elif "5th Year" in year or year == "5":
-            return "5th Year"
-        else:
-            return "Unknown"
-    
-    def create_industry_preferences_table(self):
-        """Create the main industry preferences table"""
+        return clean_year_name(year_string)
+    
+    def create_industry_preferences_table(self, cohort=None):
+        """Create the main industry preferences table, optionally for one cohort"""
         if self.august_data is None:
             print("No August data loaded.")
             return None
             
         try:
-            # Prepare data
-            data = self.august_data.copy()
-            
-            # Clean faculty and year data
-            data['Clean_Faculty'] = data['Faculty'].apply(self.clean_faculty_name)
-            data['Clean_Year'] = data['Course Year'].apply(self.clean_year_name)
-            
-            # Parse industry preferences
-            data['Industry_Numbers'] = data['Industries'].apply(self.parse_industry_numbers)
-            
-            # Create expanded dataset (one row per industry preference)
-            expanded_data = []
-            for _, row in data.iterrows():
-                if row['Industry_Numbers']:  # If student has industry preferences
-                    for industry_num in row['Industry_Numbers']:
-                        expanded_data.append({
-                            'Faculty': row['Clean_Faculty'],
-                            'Year': row['Clean_Year'],
-                            'Industry_Number': industry_num,
-                            'Industry_Name': self.industry_mapping.get(industry_num, f"Unknown_{industry_num}"),
-                            'Student_Count': 1
-                        })
-            
-            expanded_df = pd.DataFrame(expanded_data)
-            
-            # Create pivot table
-            pivot_table = pd.pivot_table(
-                expanded_df,
-                values='Student_Count',
-                index='Industry_Name',
-                columns=['Faculty', 'Year'],
-                aggfunc='sum',
-                fill_value=0,
-                margins=True,
-                margins_name='Total'
-            )
-            
-            # Flatten column names for easier handling
-            pivot_table.columns = [f"{faculty}_{year}" if year != 'Total' else 'Total' 
-                                 for faculty, year in pivot_table.columns]
+            pivot_table, expanded_df = self.cache.cached_call(
+                self._compute_industry_preferences, self.content_hash(), params={'cohort': cohort})
             
             self.analysis_results['pivot_table'] = pivot_table
             self.analysis_results['expanded_data'] = expanded_df
@@ -170,61 +113,59 @@ class IndustryPreferencesAnalysis:
             print(f"Error creating industry preferences table: {e}")
             return None
     
-    def create_focused_table(self):
+    def expand_preferences(self, rows=None):
+        """One row per (student, industry preference) for the given row positions"""
+        cohorts = self.cohorts()
+        if rows is None:
+            rows = np.arange(cohorts.n_rows)
+        industries = self.query(rows).select('Industries').collect()['Industries']
+        faculties = cohorts.labels('faculty')[rows]
+        years = cohorts.labels('year')[rows]
+        
+        # Create expanded dataset (one row per industry preference)
+        positions, numbers = self.industry_mapping.explode(industries)
+        return pd.DataFrame({
+            'Faculty': faculties[positions],
+            'Year': years[positions],
+            'Industry_Number': numbers,
+            'Industry_Name': self.industry_mapping.name_by_code[numbers],
+            'Student_Count': 1
+        })
+    
+    def preference_cube(self, rows=None):
+        """Industry x faculty x year preference counts of the given row positions"""
+        cohorts = self.cohorts()
+        if rows is None:
+            rows = np.arange(cohorts.n_rows)
+        industries = self.query(rows).select('Industries').collect()['Industries']
+        return industry_cube(self.industry_mapping, industries, cohorts, rows)
+    
+    def _compute_industry_preferences(self, cohort=None):
+        """Build the full industry pivot and the expanded preference table"""
+        # Only the cohort's students are cleaned and expanded
+        rows = self.cohorts().rows(cohort)
+        expanded_df = self.expand_preferences(rows)
+        return self.pivot_from_cube(self.preference_cube(rows)), expanded_df
+    
+    def pivot_from_cube(self, cube):
+        """Full industry x (faculty, year) pivot with totals"""
+        pivot_table = cube.pivot(margins_name='Total')
+        
+        # Flatten column names for easier handling
+        pivot_table.columns = [f"{faculty}_{year}" if year != 'Total' else 'Total' 
+                             for faculty, year in pivot_table.columns]
+        
+        return pivot_table
+    
+    def create_focused_table(self, cohort=None):
         """Create the focused table for Engineering and Arts faculties as requested"""
-        if 'expanded_data' not in self.analysis_results:
-            print("No expanded data available.")
+        if self.august_data is None:
+            print("No August data loaded.")
             return None
             
         try:
-            expanded_df = self.analysis_results['expanded_data']
-            
-            # Filter for Engineering and Arts faculties
-            focused_faculties = ['Faculty of Engineering', 'Faculty of Arts and Social Sciences']
-            focused_data = expanded_df[expanded_df['Faculty'].isin(focused_faculties)]
-            
-            # Create pivot table
-            pivot_table = pd.pivot_table(
-                focused_data,
-                values='Student_Count',
-                index='Industry_Name',
-                columns=['Faculty', 'Year'],
-                aggfunc='sum',
-                fill_value=0
-            )
-            
-            # Reorder columns to match requested format
-            year_order = ['1st Year', '2nd Year', '3rd Year', '4th Year', '5th Year']
-            faculty_order = ['Faculty of Engineering', 'Faculty of Arts and Social Sciences']
-            
-            # Create new column structure
-            new_columns = []
-            for faculty in faculty_order:
-                for year in year_order:
-                    if (faculty, year) in pivot_table.columns:
-                        new_columns.append((faculty, year))
-            
-            if new_columns:
-                pivot_table = pivot_table[new_columns]
-            
-            # Reorder rows to match the requested industry list
-            industry_order = [
-                'Accounting', 'Advertising, Media, Journalism, and Communications',
-                'Agriculture and Environment', 'Animals and Vet', 'Architecture',
-                'Arts, Humanities, and Politics', 'Building and Construction',
-                'Business and Commerce', 'Community and Social Work',
-                'Creative Arts and Music', 'Design', 'Economics and Finance',
-                'Education, Childcare and Teaching', 'Engineering', 'Entrepreneur',
-                'Food and Beverage', 'Government, Defence and Policing',
-                'Hair and Beauty', 'Health and Sport Sciences', 'Law',
-                'Marketing and Public Relations', 'Mathematics',
-                'Medical Sciences and Medicine', 'Nursing and Midwifery',
-                'Property and Real Estate', 'Psychology', 'Science', 'Technology'
-            ]
-            
-            # Filter to only include industries that exist in the data
-            existing_industries = [ind for ind in industry_order if ind in pivot_table.index]
-            pivot_table = pivot_table.reindex(existing_industries)
+            pivot_table = self.cache.cached_call(self._compute_focused_table, self.content_hash(),
+                                                 params={'cohort': cohort})
             
             self.analysis_results['focused_table'] = pivot_table
             
@@ -235,6 +176,104 @@ class IndustryPreferencesAnalysis:
             print(f"Error creating focused table: {e}")
             return None
     
+    def _compute_focused_table(self, cohort=None):
+        """Build the Engineering vs Arts table from those faculties' students only"""
+        # Count only Engineering and Arts students
+        selector = merge_selectors(cohort, {'faculty': ENGINEERING_VS_ARTS})
+        return self.focused_table_from_cube(self.preference_cube(self.cohorts().rows(selector)))
+    
+    def focused_table_from_cube(self, cube):
+        """Engineering vs Arts table of a preference cube"""
+        cube = cube.sel(faculty=ENGINEERING_VS_ARTS)
+        
+        # Engineering then Arts years, keeping the year groups that have preferences
+        columns = engineering_vs_arts(cube).table().sum(axis=0) > 0
+        
+        # Rows in the requested industry order, keeping the industries that exist in the data
+        present = cube.marginal('industry')
+        existing_industries = [ind for ind in FOCUSED_INDUSTRY_ORDER if present.get(ind, 0) > 0]
+        pivot_table = engineering_vs_arts(cube, existing_industries).table().loc[:, columns]
+        
+        return pivot_table.rename_axis('Industry_Name')
+    
+    def count_preferences_chunked(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Create the full and focused tables by streaming the sheet in row batches
+        
+        For exports too large to load: the August data is never held in
+        memory, so no expanded table is kept.
+        """
+        if not self.industry_mapping:
+            print("No industry mapping loaded.")
+            return None
+            
+        try:
+            partial, = fold_sheet(self.file_path, 'August', [IndustryCubePartial(self.industry_mapping)], batch_size)
+            print(f"Industry preferences counted in batches of {batch_size} rows")
+            return self._store_cube(partial.result())
+            
+        except Exception as e:
+            print(f"Error counting industry preferences: {e}")
+            return None
+    
+    def count_preferences_parallel(self, workers=None):
+        """Create the full and focused tables, parsing the loaded data's row partitions in a process pool"""
+        if self.august_data is None or not self.industry_mapping:
+            print("No August data or industry mapping loaded.")
+            return None
+            
+        try:
+            partial, = parallel_fold(self.august_data, [IndustryCubePartial(self.industry_mapping)], workers=workers)
+            print("Industry preferences counted in parallel")
+            return self._store_cube(partial.result())
+            
+        except Exception as e:
+            print(f"Error counting industry preferences: {e}")
+            return None
+    
+    def _store_cube(self, cube):
+        self.analysis_results['cube'] = cube
+        self.analysis_results['pivot_table'] = self.pivot_from_cube(cube)
+        self.analysis_results['focused_table'] = self.focused_table_from_cube(cube)
+        print(f"Total industry preferences recorded: {cube.total()}")
+        return self.analysis_results['pivot_table']
+    
+    def create_top_industries_table(self, k=5, cohort=None):
+        """Create the top k industries for every faculty x year group cell, optionally for one cohort"""
+        cube = self.analysis_results.get('cube') if cohort is None else None
+        if cube is None and (self.august_data is None or not self.industry_mapping):
+            print("No preference counts available.")
+            return None
+            
+        try:
+            if cube is None:
+                cube = self.preference_cube(self.cohorts().rows(cohort))
+            
+            # Industries in number order, so ties rank the lower industry number first; groups
+            # sorted by faculty and year whichever path (whole sheet, batches, workers) built the cube
+            industry_names = [self.industry_mapping[number] for number in sorted(self.industry_mapping)]
+            cube = cube.sel(industry=industry_names, faculty=sorted(cube.axes['faculty']),
+                            year=sorted(cube.axes['year']))
+            faculties, years = cube.axes['faculty'], cube.axes['year']
+            
+            # The cube's counts as a (faculty x year, industry) grid
+            grid = cube.counts.transpose(1, 2, 0).reshape(len(faculties) * len(years), len(industry_names))
+            
+            # Only faculty x year cells with any preferences
+            present = grid.sum(axis=1) > 0
+            groups = pd.MultiIndex.from_product([faculties, years], names=['Faculty', 'Year'])[present]
+            top_table = top_k_frame(grid[present], industry_names, groups, k, item_name='Industry',
+                                    value_name='Preferences')
+            
+            self.analysis_results['top_industries'] = top_table
+            
+            print(f"Top {k} industries ranked for {int(present.sum())} faculty x year groups")
+            return top_table
+            
+        except Exception as e:
+            print(f"Error ranking top industries: {e}")
+            return None
+    
     def create_excel_report(self, output_filename="Industry_Preferences_Analysis.xlsx"):
         """Create Excel report with analysis results"""
         try:
@@ -252,6 +291,10 @@ class IndustryPreferencesAnalysis:
             # Create Full Analysis sheet
             self.create_full_analysis_sheet(wb)
             
+            # Create Top Industries sheet
+            if 'top_industries' in self.analysis_results:
+                self.create_top_industries_sheet(wb)
+            
             # Create Raw Data sheet
             self.create_raw_data_sheet(wb)
             
@@ -378,6 +421,15 @@ class IndustryPreferencesAnalysis:
         # Auto-adjust columns
         self.auto_adjust_columns(ws)
     
+    def create_top_industries_sheet(self, wb):
+        """Create top industries per faculty and year group sheet"""
+        ws = wb.create_sheet("Top Industries")
+        top_table = self.analysis_results['top_industries']
+        header_style = CellStyle(font=Font(bold=True), alignment=Alignment(horizontal='center'),
+                                 fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"))
+        write_dataframe(ws, top_table, header_style=header_style)
+        set_column_widths(ws, top_table)
+    
     def create_raw_data_sheet(self, wb):
         """Create raw data sheet"""
         ws = wb.create_sheet("Raw Data")
@@ -458,6 +510,10 @@ def main():
     if focused_table is None:
         return
     
+    # Rank the top industries for every faculty and year group
+    if analysis.create_top_industries_table() is None:
+        return
+    
     # Print results
     analysis.print_analysis_results()
     
@@ -471,7 +527,8 @@ def main():
         print("1. Industry Mapping sheet - Number to name reference")
         print("2. Industry Preferences - Engineering vs Arts sheet - Main analysis table")
         print("3. Full Industry Analysis sheet - Complete analysis")
-        print("4. Raw Data sheet - Expanded dataset")
+        print("4. Top Industries sheet - Top 5 industries per faculty and year group")
+        print("5. Raw Data sheet - Expanded dataset")
 
 if __name__ == "__main__":
     main()
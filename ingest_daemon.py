@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Export Ingestion Daemon
+This script watches a drop directory for exported workbooks and keeps their
+reports up to date, replacing the hand-run sequence of report scripts.
+
+The directory is polled. A file is only picked up once its size and
+modification time have stayed the same for the settle period and its zip
+directory can be read, so an export that is still being copied is not read
+half-written. A settled file whose bytes are unchanged is skipped; otherwise
+the content hash of every sheet the reports read is compared with the last
+run. Changed sheets are converted to the memory-mapped column store and only
+the reports that read them are rebuilt, in dependency order of the task
+graph. Reports for an export are written to their own folder under the
+output directory.
+
+    python ingest_daemon.py drop/ --output reports/ --interval 1 --settle 2
+    python ingest_daemon.py drop/ --once
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from graphlib import TopologicalSorter
+
+from analysis_cache import file_content_hash, get_default_cache, read_sheet_cached, sheet_content_hash
+from august_analysis import AugustAnalysis
+from industry_affinity import IndustryAffinityAnalysis
+from industry_mapping import load_industry_mapping
+from industry_preferences_analysis import IndustryPreferencesAnalysis
+from july_august_comparison import JulyAugustComparison
+from xlsx_patch import sheet_part_names
+
+POLL_INTERVAL = 1.0
+SETTLE_SECONDS = 2.0
+STATE_FILE = ".ingest_state.json"
+
+# Sheets the reports read as frames; these are converted to the column store
+STORED_SHEETS = ['July ', 'August']
+
+
+class ReportTask:
+    """One rebuildable report: the sheets it reads, the tasks it needs first and how to build it"""
+
+    def __init__(self, name, sheets, build, depends=()):
+        self.name = name
+        self.sheets = list(sheets)
+        self.build = build
+        self.depends = list(depends)
+
+
+class TaskGraph:
+    def __init__(self, tasks):
+        self.tasks = {task.name: task for task in tasks}
+        for task in tasks:
+            unknown = [name for name in task.depends if name not in self.tasks]
+            if unknown:
+                raise ValueError(f"Task {task.name} depends on unknown tasks: {unknown}")
+        # Raises graphlib.CycleError for circular dependencies
+        self.order = list(TopologicalSorter({task.name: task.depends for task in tasks}).static_order())
+
+    def sheets(self):
+        """Every sheet some task reads"""
+        return sorted({sheet for task in self.tasks.values() for sheet in task.sheets})
+
+    def affected(self, changed_sheets, available_sheets, stale=()):
+        """
+        Tasks to rebuild, in dependency order
+
+        A task is rebuilt when it reads a changed sheet, is listed in stale
+        or depends on a task being rebuilt. Tasks reading a sheet the
+        workbook does not have are left out, together with their dependents.
+        """
+        changed_sheets, available_sheets = set(changed_sheets), set(available_sheets)
+        runnable, selected = set(), []
+        for name in self.order:
+            task = self.tasks[name]
+            if not set(task.sheets) <= available_sheets or not set(task.depends) <= runnable:
+                continue
+            runnable.add(name)
+            if (set(task.sheets) & changed_sheets or name in stale
+                    or any(dependency in selected for dependency in task.depends)):
+                selected.append(name)
+        return selected
+
+
+def build_industry_mapping(file_path, output_dir, cache):
+    return load_industry_mapping(file_path, cache=cache) is not None
+
+
+def build_august_report(file_path, output_dir, cache):
+    analysis = AugustAnalysis(file_path, cache=cache)
+    return (analysis.load_august_data() and analysis.analyze_basic_stats()
+            and analysis.create_pivot_table() is not None
+            and analysis.create_excel_report(os.path.join(output_dir, "August_Analysis_Report.xlsx")))
+
+
+def build_industry_preferences(file_path, output_dir, cache):
+    analysis = IndustryPreferencesAnalysis(file_path, cache=cache)
+    return (analysis.load_industry_mapping() and analysis.load_august_data()
+            and analysis.create_industry_preferences_table() is not None
+            and analysis.create_focused_table() is not None
+            and analysis.create_top_industries_table() is not None
+            and analysis.create_excel_report(os.path.join(output_dir, "Industry_Preferences_Analysis.xlsx")))
+
+
+def build_industry_affinity(file_path, output_dir, cache):
+    analysis = IndustryAffinityAnalysis(file_path, cache=cache)
+    return (analysis.load_data() and analysis.compute_affinity() is not None
+            and analysis.top_related_by_cohort() is not None
+            and analysis.create_excel_report(os.path.join(output_dir, "Industry_Affinity_Analysis.xlsx")))
+
+
+def build_july_august_comparison(file_path, output_dir, cache):
+    # Re-delivered exports only recompare the users whose rows changed
+    comparison = JulyAugustComparison(file_path, cache=cache)
+    if not comparison.load_data():
+        return False
+    snapshot_path = os.path.join(output_dir, "july_august_snapshot.pkl")
+    if comparison.update_incrementally(snapshot_path) is None:
+        return False
+    return comparison.patch_results_in_excel(os.path.join(output_dir, "July_August_Comparison_Results.xlsx"))
+
+
+REPORT_TASKS = [
+    ReportTask('industry_mapping', ['Sheet7'], build_industry_mapping),
+    ReportTask('august_report', ['August'], build_august_report),
+    ReportTask('industry_preferences', ['August', 'Sheet7'], build_industry_preferences,
+               depends=['industry_mapping']),
+    ReportTask('industry_affinity', ['August', 'Sheet7'], build_industry_affinity,
+               depends=['industry_mapping']),
+    ReportTask('july_august_comparison', ['July ', 'August'], build_july_august_comparison),
+]
+
+
+def is_complete_workbook(path):
+    """Whether the file is a readable .xlsx package; a partly copied file is not"""
+    try:
+        with zipfile.ZipFile(path) as package:
+            sheet_part_names(package)
+        return True
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return False
+
+
+class DropFolderWatcher:
+    """Polls a directory and reports .xlsx files that have settled since they last changed"""
+
+    def __init__(self, drop_dir, settle_seconds=SETTLE_SECONDS):
+        self.drop_dir = drop_dir
+        self.settle_seconds = settle_seconds
+        self.pending = {}
+        self.delivered = {}
+
+    def poll(self, now=None):
+        now = time.monotonic() if now is None else now
+        signatures = {}
+        for name in sorted(os.listdir(self.drop_dir)):
+            # Skip Excel lock files, hidden files and anything that is not a workbook
+            if not name.endswith('.xlsx') or name.startswith(('~$', '.')):
+                continue
+            path = os.path.join(self.drop_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if os.path.isfile(path):
+                signatures[path] = (stat.st_size, stat.st_mtime_ns)
+
+        for path in set(self.pending) - set(signatures):
+            del self.pending[path]
+        for path in set(self.delivered) - set(signatures):
+            del self.delivered[path]
+
+        settled = []
+        for path, signature in signatures.items():
+            if self.delivered.get(path) == signature:
+                continue
+            seen, since = self.pending.get(path, (None, now))
+            if seen != signature:
+                # Still being written (or just arrived): restart the settle period
+                self.pending[path] = (signature, now)
+                since = now
+            if now - since >= self.settle_seconds and is_complete_workbook(path):
+                del self.pending[path]
+                self.delivered[path] = signature
+                settled.append(path)
+        return settled
+
+
+class IngestionService:
+    def __init__(self, drop_dir, output_dir=None, graph=None, cache=None,
+                 interval=POLL_INTERVAL, settle_seconds=SETTLE_SECONDS):
+        self.drop_dir = drop_dir
+        self.output_dir = output_dir or os.path.join(drop_dir, "reports")
+        self.graph = graph or TaskGraph(REPORT_TASKS)
+        self.cache = cache or get_default_cache()
+        self.interval = interval
+        self.watcher = DropFolderWatcher(drop_dir, settle_seconds)
+        self.state_path = os.path.join(self.output_dir, STATE_FILE)
+        self.state = self.load_state()
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable ingest state {self.state_path}: {e}")
+            return {}
+
+    def save_state(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as handle:
+            json.dump(self.state, handle, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def report_dir(self, file_path):
+        return os.path.join(self.output_dir, os.path.splitext(os.path.basename(file_path))[0])
+
+    def ingest(self, file_path):
+        """Bring the reports of one export up to date; returns the names of the tasks rebuilt"""
+        file_path = os.path.abspath(file_path)
+        name = os.path.basename(file_path)
+        record = self.state.get(file_path, {})
+        file_hash = file_content_hash(file_path)
+        stale = [task for task, status in record.get('tasks', {}).items() if status != 'ok']
+        if record.get('file_hash') == file_hash and not stale:
+            print(f"{name}: unchanged")
+            return []
+
+        with zipfile.ZipFile(file_path) as package:
+            available = [sheet for sheet in self.graph.sheets() if sheet in sheet_part_names(package)]
+        sheet_hashes = {sheet: sheet_content_hash(file_path, sheet) for sheet in available}
+        previous = record.get('sheets', {})
+        changed = [sheet for sheet in available if previous.get(sheet) != sheet_hashes[sheet]]
+        tasks = self.graph.affected(changed, available, stale)
+        print(f"{name}: changed sheets {[sheet.strip() for sheet in changed]}, rebuilding {tasks}")
+
+        for sheet in changed:
+            if sheet in STORED_SHEETS:
+                read_sheet_cached(file_path, sheet, cache=self.cache)
+
+        output_dir = self.report_dir(file_path)
+        os.makedirs(output_dir, exist_ok=True)
+        statuses = dict(record.get('tasks', {}))
+        for task_name in tasks:
+            task = self.graph.tasks[task_name]
+            if any(statuses.get(dependency) != 'ok' for dependency in task.depends):
+                statuses[task_name] = 'skipped'
+                print(f"  {task_name}: skipped, a dependency failed")
+                continue
+            started = time.perf_counter()
+            try:
+                ok = bool(task.build(file_path, output_dir, self.cache))
+            except Exception as e:
+                print(f"  Error building {task_name}: {e}")
+                ok = False
+            statuses[task_name] = 'ok' if ok else 'failed'
+            print(f"  {task_name}: {statuses[task_name]} in {time.perf_counter() - started:.2f} seconds")
+
+        self.state[file_path] = {'file_hash': file_hash, 'sheets': sheet_hashes, 'tasks': statuses}
+        self.save_state()
+        return tasks
+
+    def poll_once(self):
+        rebuilt = {}
+        for file_path in self.watcher.poll():
+            try:
+                rebuilt[file_path] = self.ingest(file_path)
+            except Exception as e:
+                print(f"Error ingesting {file_path}: {e}")
+        return rebuilt
+
+    def run(self, once=False):
+        print(f"Watching {self.drop_dir} (reports in {self.output_dir})")
+        while True:
+            self.poll_once()
+            if once:
+                return
+            time.sleep(self.interval)
+
+
+def main():
+    args = sys.argv[1:]
+    drop_dir = args[0] if args and not args[0].startswith('--') else "."
+
+    def option(flag, default):
+        return args[args.index(flag) + 1] if flag in args[:-1] else default
+
+    once = '--once' in args
+    service = IngestionService(drop_dir, output_dir=option('--output', None),
+                               interval=float(option('--interval', POLL_INTERVAL)),
+                               settle_seconds=0 if once else float(option('--settle', SETTLE_SECONDS)))
+
+    print("EXPORT INGESTION DAEMON")
+    print("="*50)
+    try:
+        service.run(once=once)
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,12 @@ July-August User Activity Comparison
 This script compares user activity between July and August tabs,
 focusing on existing users (matching emails) and calculating increases
 in Login Count, Avg Login Time, and VWE.
+
+A user with several rows in a month is resolved by the duplicate policy:
+the first row (default), the last row, or the rows combined (sessions
+summed, Avg Login Time weighted by sessions, highest VWE):
+
+    python july_august_comparison.py --duplicates=combine
 """
 
 import pandas as pd
@@ -11,24 +17,56 @@ import openpyxl
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 import numpy as np
+import sys
+from analysis_cache import get_default_cache, read_sheet_cached, sheet_content_hash, values_digest
+from incremental_comparison import (DEFAULT_SNAPSHOT_PATH, SUMMARY_METRICS, build_metric_summaries,
+                                    compute_row_hashes, diff_row_hashes, load_snapshot,
+                                    save_snapshot, summaries_to_statistics)
+from growth_metrics import metric_changes
+from month_alignment import align_months, check_duplicate_policy
+from lazy_query import LazyFrame, col
+from summary_stats import DEFAULT_SKETCH_K, MetricAccumulator, fold_batches, iter_row_batches
+from sheet_writer import CellStyle, set_column_widths, write_dataframe
+from xlsx_patch import patch_rows, read_cells
+
+# Columns the per-user comparison reads from each month
+# (Web sessions weights August's Avg Login Time when duplicates are combined)
+COMPARISON_COLUMNS = ['Email', 'First name', 'Login Count', 'Web sessions', 'Avg Login Time',
+                      'Virtual Work Experience']
+
+# Sheet column, result label, increase column, percent increase column
+COMPARED_METRICS = [
+    ('Login Count', 'Login Count', 'Login Count Increase', 'Login Count % Increase'),
+    ('Avg Login Time', 'Avg Login Time', 'Avg Time Increase (seconds)', 'Avg Time % Increase'),
+    ('Virtual Work Experience', 'VWE', 'VWE Increase', 'VWE % Increase'),
+]
 
 class JulyAugustComparison:
-    def __init__(self, file_path):
+    def __init__(self, file_path, cache=None, duplicate_policy='first'):
+        check_duplicate_policy(duplicate_policy)
         self.file_path = file_path
+        self.duplicate_policy = duplicate_policy
         self.july_data = None
         self.august_data = None
         self.comparison_results = None
+        self.cache = cache or get_default_cache()
+        self.metric_summaries = None
+        self.last_patch = None
         
+    def content_hash(self):
+        """Hash of the July and August sheets, used to key cached results"""
+        return sheet_content_hash(self.file_path, ['July ', 'August'])
+    
     def load_data(self):
         """Load data from both July and August sheets"""
         try:
             # Load July data
-            self.july_data = pd.read_excel(self.file_path, sheet_name='July ')
+            self.july_data = read_sheet_cached(self.file_path, 'July ', cache=self.cache)
             print(f"July data loaded: {len(self.july_data)} rows")
             print(f"July columns: {list(self.july_data.columns)}")
             
             # Load August data
-            self.august_data = pd.read_excel(self.file_path, sheet_name='August')
+            self.august_data = read_sheet_cached(self.file_path, 'August', cache=self.cache)
             print(f"August data loaded: {len(self.august_data)} rows")
             print(f"August columns: {list(self.august_data.columns)}")
             
@@ -38,6 +76,19 @@ class JulyAugustComparison:
             print(f"Error loading data: {e}")
             return False
     
+    def query(self, month):
+        """Lazy query over the 'July' or 'August' sheet, reusing the loaded frame when there is one"""
+        data, sheet_name = (self.july_data, 'July ') if month == 'July' else (self.august_data, 'August')
+        if data is not None:
+            return LazyFrame.from_frame(data)
+        return LazyFrame.scan_sheet(self.file_path, sheet_name, cache=self.cache)
+    
+    def existing_user_rows(self, month, existing_emails):
+        """The comparison columns of a month's rows that belong to existing users"""
+        query = self.query(month)
+        columns = [column for column in COMPARISON_COLUMNS if column in query.columns]
+        return query.filter(col('Email').astype(str).isin(existing_emails)).select(*columns).collect()
+    
     def find_existing_users(self):
         """Find users that exist in both July and August (based on email)"""
         if self.july_data is None or self.august_data is None:
@@ -69,60 +120,134 @@ class JulyAugustComparison:
             return None
             
         try:
-            results = []
+            # Key on a digest of the email set rather than the set itself
+            emails_key = values_digest(existing_emails)
+            self.comparison_results = self.cache.cached_call(
+                self._compute_increases, self.content_hash(),
+                params={'existing_emails': existing_emails, 'duplicate_policy': self.duplicate_policy},
+                key_params={'existing_emails': emails_key, 'duplicate_policy': self.duplicate_policy})
+            self.metric_summaries = None
+            self.report_duplicates()
+            return self.comparison_results
             
-            for email in existing_emails:
-                # Get July data for this user
-                july_user = self.july_data[self.july_data['Email'].astype(str) == email]
-                august_user = self.august_data[self.august_data['Email'].astype(str) == email]
+        except Exception as e:
+            print(f"Error calculating increases: {e}")
+            return None
+    
+    def _compute_increases(self, existing_emails, duplicate_policy='first'):
+        """Build the per-user comparison frame for the given emails"""
+        # Only existing users' rows and the compared columns are read
+        july_data = self.existing_user_rows('July', existing_emails)
+        august_data = self.existing_user_rows('August', existing_emails)
+        
+        # One row per user in either month, duplicates resolved by the policy
+        july_rows, august_rows, reports = align_months(july_data, august_data, existing_emails,
+                                                       policy=duplicate_policy)
+        emails = list(july_rows.index)
+        if not emails:
+            return pd.DataFrame()
+        
+        results = {
+            'Email': emails,
+            'First Name': august_rows['First name'].to_numpy() if 'First name' in august_rows.columns else '',
+        }
+        # Whole-column increases; blank cells count as 0 and a zero July value reports 0%
+        for column, label, increase_label, pct_label in COMPARED_METRICS:
+            july, august, increase, pct = metric_changes(july_rows, august_rows, column, zero_baseline='zero',
+                                                         decimals=2)
+            results.update({f'July {label}': july, f'August {label}': august,
+                            increase_label: increase, pct_label: pct})
+        
+        results = pd.DataFrame(results)
+        results.attrs['duplicates'] = {'July': reports['before'], 'August': reports['after']}
+        return results
+    
+    def report_duplicates(self):
+        """Print how many duplicate email groups each month collapsed"""
+        reports = self.comparison_results.attrs.get('duplicates', {})
+        for month, report in reports.items():
+            if report:
+                print(f"{month}: collapsed {report.rows} duplicate rows of {report.groups} users "
+                      f"(policy '{report.policy}')")
+    
+    def update_incrementally(self, snapshot_path=DEFAULT_SNAPSHOT_PATH):
+        """
+        Patch the comparison for users whose July or August rows changed
+
+        Row hashes of both months are diffed against the snapshot left by the
+        previous run; only inserted, updated or deleted users are recompared
+        and the summary statistics are adjusted row by row. Without a usable
+        snapshot the full comparison is computed and becomes the new snapshot.
+        """
+        if self.july_data is None or self.august_data is None:
+            print("Data not loaded. Please load data first.")
+            return None
+            
+        try:
+            # Policies other than 'first' read every row of a user, so every row is hashed
+            every_row = self.duplicate_policy != 'first'
+            july_hashes = compute_row_hashes(self.july_data, every_row=every_row)
+            august_hashes = compute_row_hashes(self.august_data, every_row=every_row)
+            snapshot = load_snapshot(snapshot_path)
+            
+            if (snapshot is None or snapshot.get('file_path') != self.file_path
+                    or snapshot.get('duplicate_policy', 'first') != self.duplicate_policy):
+                print("No previous snapshot found, running full comparison")
+                existing_emails = self.find_existing_users()
+                if self.calculate_increases(existing_emails) is None:
+                    return None
+                self.metric_summaries = build_metric_summaries(self.comparison_results)
+                self.last_patch = None
+            else:
+                july_diff = diff_row_hashes(snapshot['july_hashes'], july_hashes)
+                august_diff = diff_row_hashes(snapshot['august_hashes'], august_hashes)
+                affected = july_diff.changed | august_diff.changed
+                print(f"July changes: {july_diff}")
+                print(f"August changes: {august_diff}")
+                
+                previous = snapshot['comparison_results']
+                summaries = snapshot['metric_summaries']
+                if 'Email' in previous.columns:
+                    stale_rows = previous[previous['Email'].isin(affected)]
+                    kept_rows = previous[~previous['Email'].isin(affected)]
+                else:
+                    stale_rows = kept_rows = previous
                 
-                if len(july_user) > 0 and len(august_user) > 0:
-                    # Get the first row for each user (in case of duplicates)
-                    july_row = july_user.iloc[0]
-                    august_row = august_user.iloc[0]
-                    
-                    # Extract values (handle NaN values)
-                    july_login_count = july_row.get('Login Count', 0) if pd.notna(july_row.get('Login Count')) else 0
-                    august_login_count = august_row.get('Login Count', 0) if pd.notna(august_row.get('Login Count')) else 0
-                    
-                    july_avg_time = july_row.get('Avg Login Time', 0) if pd.notna(july_row.get('Avg Login Time')) else 0
-                    august_avg_time = august_row.get('Avg Login Time', 0) if pd.notna(august_row.get('Avg Login Time')) else 0
-                    
-                    july_vwe = july_row.get('Virtual Work Experience', 0) if pd.notna(july_row.get('Virtual Work Experience')) else 0
-                    august_vwe = august_row.get('Virtual Work Experience', 0) if pd.notna(august_row.get('Virtual Work Experience')) else 0
-                    
-                    # Calculate increases
-                    login_count_increase = august_login_count - july_login_count
-                    avg_time_increase = august_avg_time - july_avg_time
-                    vwe_increase = august_vwe - july_vwe
-                    
-                    # Calculate percentage increases (avoid division by zero)
-                    login_count_pct = (login_count_increase / july_login_count * 100) if july_login_count > 0 else 0
-                    avg_time_pct = (avg_time_increase / july_avg_time * 100) if july_avg_time > 0 else 0
-                    vwe_pct = (vwe_increase / july_vwe * 100) if july_vwe > 0 else 0
-                    
-                    results.append({
-                        'Email': email,
-                        'First Name': august_row.get('First name', ''),
-                        'July Login Count': july_login_count,
-                        'August Login Count': august_login_count,
-                        'Login Count Increase': login_count_increase,
-                        'Login Count % Increase': round(login_count_pct, 2),
-                        'July Avg Login Time': july_avg_time,
-                        'August Avg Login Time': august_avg_time,
-                        'Avg Time Increase (seconds)': avg_time_increase,
-                        'Avg Time % Increase': round(avg_time_pct, 2),
-                        'July VWE': july_vwe,
-                        'August VWE': august_vwe,
-                        'VWE Increase': vwe_increase,
-                        'VWE % Increase': round(vwe_pct, 2)
-                    })
+                # Recompare only affected users that still exist in both months
+                recompare = {email for email in affected
+                             if email in july_hashes.index and email in august_hashes.index}
+                new_rows = self._compute_increases(recompare, self.duplicate_policy)
+                
+                # Retract the stale rows from the running summaries and add the new ones
+                for _, column, _ in SUMMARY_METRICS:
+                    if column in stale_rows.columns:
+                        for value in stale_rows[column]:
+                            summaries[column].remove(value)
+                    if column in new_rows.columns:
+                        for value in new_rows[column]:
+                            summaries[column].add(value)
+                
+                parts = [frame for frame in (kept_rows, new_rows) if len(frame)]
+                self.comparison_results = pd.concat(parts, ignore_index=True) if parts else new_rows
+                self.metric_summaries = summaries
+                
+                removed = set(stale_rows['Email']) - recompare if len(stale_rows) else set()
+                self.last_patch = {'upserted': new_rows, 'deleted_emails': removed}
+                print(f"Recompared {len(new_rows)} users, removed {len(removed)} users")
+            
+            save_snapshot({
+                'file_path': self.file_path,
+                'duplicate_policy': self.duplicate_policy,
+                'july_hashes': july_hashes,
+                'august_hashes': august_hashes,
+                'comparison_results': self.comparison_results,
+                'metric_summaries': self.metric_summaries
+            }, snapshot_path)
             
-            self.comparison_results = pd.DataFrame(results)
             return self.comparison_results
             
         except Exception as e:
-            print(f"Error calculating increases: {e}")
+            print(f"Error updating comparison incrementally: {e}")
             return None
     
     def generate_summary_statistics(self):
@@ -132,33 +257,20 @@ class JulyAugustComparison:
             return None
             
         try:
-            summary = {
-                'Total Existing Users': len(self.comparison_results),
-                'Login Count Increases': {
-                    'Average Increase': round(self.comparison_results['Login Count Increase'].mean(), 2),
-                    'Median Increase': round(self.comparison_results['Login Count Increase'].median(), 2),
-                    'Max Increase': self.comparison_results['Login Count Increase'].max(),
-                    'Min Increase': self.comparison_results['Login Count Increase'].min(),
-                    'Users with Positive Increase': len(self.comparison_results[self.comparison_results['Login Count Increase'] > 0]),
-                    'Users with Negative Increase': len(self.comparison_results[self.comparison_results['Login Count Increase'] < 0])
-                },
-                'Avg Login Time Increases': {
-                    'Average Increase (seconds)': round(self.comparison_results['Avg Time Increase (seconds)'].mean(), 2),
-                    'Median Increase (seconds)': round(self.comparison_results['Avg Time Increase (seconds)'].median(), 2),
-                    'Max Increase (seconds)': self.comparison_results['Avg Time Increase (seconds)'].max(),
-                    'Min Increase (seconds)': self.comparison_results['Avg Time Increase (seconds)'].min(),
-                    'Users with Positive Increase': len(self.comparison_results[self.comparison_results['Avg Time Increase (seconds)'] > 0]),
-                    'Users with Negative Increase': len(self.comparison_results[self.comparison_results['Avg Time Increase (seconds)'] < 0])
-                },
-                'VWE Increases': {
-                    'Average Increase': round(self.comparison_results['VWE Increase'].mean(), 2),
-                    'Median Increase': round(self.comparison_results['VWE Increase'].median(), 2),
-                    'Max Increase': self.comparison_results['VWE Increase'].max(),
-                    'Min Increase': self.comparison_results['VWE Increase'].min(),
-                    'Users with Positive Increase': len(self.comparison_results[self.comparison_results['VWE Increase'] > 0]),
-                    'Users with Negative Increase': len(self.comparison_results[self.comparison_results['VWE Increase'] < 0])
-                }
-            }
+            # Summaries maintained by update_incrementally avoid a full recompute
+            if self.metric_summaries is not None:
+                return summaries_to_statistics(self.metric_summaries, len(self.comparison_results))
+            
+            # One pass over the rows folds every metric's statistics together. The
+            # sketches hold every row, so the median is exact like the incremental path's
+            columns = [column for _, column, _ in SUMMARY_METRICS]
+            k = max(DEFAULT_SKETCH_K, len(self.comparison_results))
+            accumulators = fold_batches(iter_row_batches(self.comparison_results), columns,
+                                        {column: MetricAccumulator(k=k) for column in columns})
+            
+            summary = {'Total Existing Users': len(self.comparison_results)}
+            for section, column, suffix in SUMMARY_METRICS:
+                summary[section] = accumulators[column].to_summary(suffix)
             
             return summary
             
@@ -178,30 +290,13 @@ class JulyAugustComparison:
             ws = wb.active
             ws.title = "Comparison Results"
             
-            # Write the comparison results
-            for r, row in enumerate(self.comparison_results.itertuples(), 1):
-                for c, value in enumerate(row[1:], 1):  # Skip index
-                    ws.cell(row=r, column=c, value=value)
-            
-            # Add headers
-            headers = list(self.comparison_results.columns)
-            for c, header in enumerate(headers, 1):
-                ws.cell(row=1, column=c, value=header)
-                ws.cell(row=1, column=c).font = Font(bold=True)
-                ws.cell(row=1, column=c).fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            # Write the header row followed by the comparison results
+            header_style = CellStyle(font=Font(bold=True),
+                                     fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"))
+            write_dataframe(ws, self.comparison_results, header_style=header_style)
             
             # Auto-adjust column widths
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+            set_column_widths(ws, self.comparison_results)
             
             # Save the file
             wb.save(output_filename)
@@ -212,6 +307,40 @@ class JulyAugustComparison:
             print(f"Error saving results: {e}")
             return False
     
+    def patch_results_in_excel(self, output_filename="July_August_Comparison_Results.xlsx"):
+        """Rewrite only the rows changed by the last incremental update"""
+        if self.last_patch is None:
+            return self.save_results_to_excel(output_filename)
+            
+        try:
+            # Only the header row and the Email column are read; rows that did not
+            # change are copied through without being parsed
+            cells = read_cells(output_filename, "Comparison Results", rows=[1], columns=[1])
+            header_cells = cells.get(1, {})
+            headers = [header_cells.get(c) for c in range(1, max(header_cells, default=0) + 1)]
+            email_rows = {row[1]: r for r, row in cells.items() if r >= 2 and 1 in row}
+            
+            upserted = self.last_patch['upserted']
+            updates = {}
+            appended = []
+            for values in upserted.reindex(columns=headers).itertuples(index=False):
+                row_idx = email_rows.get(values[0])
+                if row_idx is None:
+                    appended.append(values)
+                else:
+                    updates[row_idx] = dict(enumerate(values, 1))
+            
+            deleted_rows = [email_rows[e] for e in self.last_patch['deleted_emails'] if e in email_rows]
+            patch_rows(output_filename, "Comparison Results", updates, appended, deleted_rows)
+            print(f"Patched {len(upserted)} rows and removed {len(deleted_rows)} rows in: {output_filename}")
+            return True
+            
+        except FileNotFoundError:
+            return self.save_results_to_excel(output_filename)
+        except Exception as e:
+            print(f"Error patching results: {e}")
+            return False
+    
     def print_detailed_results(self, top_n=10):
         """Print detailed results for top performers"""
         if self.comparison_results is None:
@@ -251,7 +380,13 @@ class JulyAugustComparison:
 
 def main():
     # Initialize the comparison
-    comparison = JulyAugustComparison("August Export_SD 2 Sept.xlsx")
+    duplicate_policy = next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--duplicates=')),
+                            'first')
+    try:
+        comparison = JulyAugustComparison("August Export_SD 2 Sept.xlsx", duplicate_policy=duplicate_policy)
+    except ValueError as e:
+        print(e)
+        return
     
     print("JULY-AUGUST USER ACTIVITY COMPARISON")
     print("="*50)
@@ -260,15 +395,22 @@ def main():
     if not comparison.load_data():
         return
     
-    # Find existing users
-    existing_users = comparison.find_existing_users()
-    if existing_users is None:
-        return
-    
-    # Calculate increases
-    results = comparison.calculate_increases(existing_users)
-    if results is None:
-        return
+    # Re-deliveries only recompare the users whose rows changed
+    incremental = '--incremental' in sys.argv[1:]
+    if incremental:
+        results = comparison.update_incrementally()
+        if results is None:
+            return
+    else:
+        # Find existing users
+        existing_users = comparison.find_existing_users()
+        if existing_users is None:
+            return
+        
+        # Calculate increases
+        results = comparison.calculate_increases(existing_users)
+        if results is None:
+            return
     
     # Generate and display summary statistics
     summary = comparison.generate_summary_statistics()
@@ -306,7 +448,10 @@ def main():
     comparison.print_detailed_results(top_n=10)
     
     # Save results to Excel
-    comparison.save_results_to_excel()
+    if incremental:
+        comparison.patch_results_in_excel()
+    else:
+        comparison.save_results_to_excel()
     
     print("\n" + "="*60)
     print("ANALYSIS COMPLETE")
@@ -0,0 +1,377 @@
+"""
+Lazy Sheet Queries
+This module provides a small lazy query layer over worksheet data. Analyses
+declare the columns, filters, derived columns and aggregations they need as
+a plan; nothing is read or computed until collect().
+
+Before running, the plan is optimized: filters are pushed below derived
+columns and projections into the loader, so only the referenced columns are
+read (or sliced from an already loaded frame) and rows are filtered as soon
+as they are loaded, instead of copying whole sheets up front.
+
+    query = (LazyFrame.scan_sheet(file_path, 'August')
+             .filter(col('Industries').notna())
+             .with_columns(Clean_Year=col('Course Year').map(clean_year_name))
+             .select('Clean_Year', 'Industries'))
+    data = query.collect()
+"""
+
+import operator
+
+import pandas as pd
+
+from analysis_cache import read_sheet_cached
+
+
+class Expr:
+    """Column expression evaluated against a DataFrame"""
+
+    def __init__(self, func, columns, description):
+        self._func = func
+        self.columns = frozenset(columns)
+        self.description = description
+
+    def evaluate(self, df):
+        return self._func(df)
+
+    def __repr__(self):
+        return self.description
+
+    def _binary(self, other, op, symbol):
+        if isinstance(other, Expr):
+            return Expr(lambda df: op(self.evaluate(df), other.evaluate(df)),
+                        self.columns | other.columns, f"({self} {symbol} {other})")
+        return Expr(lambda df: op(self.evaluate(df), other), self.columns, f"({self} {symbol} {other!r})")
+
+    def __eq__(self, other):
+        return self._binary(other, operator.eq, '==')
+
+    def __ne__(self, other):
+        return self._binary(other, operator.ne, '!=')
+
+    def __lt__(self, other):
+        return self._binary(other, operator.lt, '<')
+
+    def __le__(self, other):
+        return self._binary(other, operator.le, '<=')
+
+    def __gt__(self, other):
+        return self._binary(other, operator.gt, '>')
+
+    def __ge__(self, other):
+        return self._binary(other, operator.ge, '>=')
+
+    def __and__(self, other):
+        return self._binary(other, operator.and_, '&')
+
+    def __or__(self, other):
+        return self._binary(other, operator.or_, '|')
+
+    def __add__(self, other):
+        return self._binary(other, operator.add, '+')
+
+    def __sub__(self, other):
+        return self._binary(other, operator.sub, '-')
+
+    def __mul__(self, other):
+        return self._binary(other, operator.mul, '*')
+
+    def __truediv__(self, other):
+        return self._binary(other, operator.truediv, '/')
+
+    def __invert__(self):
+        return Expr(lambda df: ~self.evaluate(df), self.columns, f"~{self}")
+
+    __hash__ = object.__hash__
+
+    def _unary(self, method, func):
+        return Expr(lambda df: func(self.evaluate(df)), self.columns, f"{self}.{method}")
+
+    def isin(self, values):
+        values = list(values)
+        return self._unary(f"isin({len(values)} values)", lambda s: s.isin(values))
+
+    def notna(self):
+        return self._unary("notna()", lambda s: s.notna())
+
+    def isna(self):
+        return self._unary("isna()", lambda s: s.isna())
+
+    def fillna(self, value):
+        return self._unary(f"fillna({value!r})", lambda s: s.fillna(value))
+
+    def astype(self, dtype):
+        return self._unary(f"astype({getattr(dtype, '__name__', dtype)})", lambda s: s.astype(dtype))
+
+    def map(self, func):
+        """Apply a function to every value"""
+        return self._unary(f"map({getattr(func, '__name__', 'func')})", lambda s: s.map(func))
+
+    def pipe(self, func):
+        """Apply a function to the whole Series (for vectorized transforms)"""
+        return self._unary(f"pipe({getattr(func, '__name__', 'func')})", func)
+
+    def agg(self, how):
+        return Agg(self, how)
+
+    def sum(self):
+        return Agg(self, 'sum')
+
+    def mean(self):
+        return Agg(self, 'mean')
+
+    def count(self):
+        return Agg(self, 'count')
+
+    def nunique(self):
+        return Agg(self, 'nunique')
+
+    def first(self):
+        return Agg(self, 'first')
+
+
+class Agg:
+    """Aggregation of an expression: a pandas aggregation name or a Series -> scalar function"""
+
+    def __init__(self, expr, how):
+        self.expr = expr
+        self.how = how
+        self.columns = expr.columns
+
+    def __repr__(self):
+        return f"{self.expr}.{getattr(self.how, '__name__', self.how)}()"
+
+    def reduce(self, series):
+        return series.agg(self.how) if isinstance(self.how, str) else self.how(series)
+
+
+def col(name):
+    return Expr(lambda df: df[name], [name], f"col({name!r})")
+
+
+def lit(value):
+    return Expr(lambda df: pd.Series(value, index=df.index), [], repr(value))
+
+
+class _Node:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def replace(self, **fields):
+        node = type(self).__new__(type(self))
+        node.__dict__.update(self.__dict__)
+        node.__dict__.update(fields)
+        return node
+
+
+class _Scan(_Node):
+    """Read a worksheet; columns and predicate are filled in by the optimizer"""
+
+
+class _Source(_Node):
+    """An already loaded DataFrame"""
+
+
+class _Filter(_Node):
+    pass
+
+
+class _Select(_Node):
+    pass
+
+
+class _WithColumns(_Node):
+    pass
+
+
+class _Aggregate(_Node):
+    pass
+
+
+def _and(left, right):
+    return right if left is None else left & right
+
+
+class LazyFrame:
+    def __init__(self, plan):
+        self._plan = plan
+
+    @classmethod
+    def scan_sheet(cls, file_path, sheet_name, cache=None, rows=None, **read_kwargs):
+        """Lazily read one sheet, through the analysis cache, optionally only some row positions"""
+        return cls(_Scan(file_path=file_path, sheet_name=sheet_name, cache=cache, read_kwargs=read_kwargs,
+                         rows=rows, columns=None, predicate=None, schema=None))
+
+    @classmethod
+    def from_frame(cls, df, rows=None):
+        """Query a loaded DataFrame (or the given row positions of it) without copying it"""
+        return cls(_Source(df=df, rows=rows, columns=None, predicate=None))
+
+    @property
+    def columns(self):
+        """Output column names of the plan"""
+        return _schema(self._plan)
+
+    def select(self, *columns):
+        return LazyFrame(_Select(input=self._plan, columns=list(columns)))
+
+    def filter(self, predicate):
+        return LazyFrame(_Filter(input=self._plan, predicate=predicate))
+
+    def with_columns(self, **exprs):
+        return LazyFrame(_WithColumns(input=self._plan, exprs=exprs))
+
+    def group_by(self, *keys):
+        return GroupBy(self, list(keys))
+
+    def agg(self, **aggs):
+        """Aggregate the whole frame into a single row"""
+        return GroupBy(self, []).agg(**aggs)
+
+    def optimized_plan(self):
+        return _prune(_push_filters(self._plan), None)
+
+    def explain(self):
+        """Text rendering of the optimized plan"""
+        return '\n'.join(_describe(self.optimized_plan(), 0))
+
+    def collect(self):
+        return _execute(self.optimized_plan())
+
+
+class GroupBy:
+    def __init__(self, frame, keys):
+        self.frame = frame
+        self.keys = keys
+
+    def agg(self, **aggs):
+        return LazyFrame(_Aggregate(input=self.frame._plan, keys=self.keys, aggs=aggs))
+
+
+def _schema(node):
+    if isinstance(node, _Source):
+        return list(node.df.columns)
+    if isinstance(node, _Scan):
+        if node.schema is None:
+            # The header row alone is cheap to read
+            header = read_sheet_cached(node.file_path, node.sheet_name, cache=node.cache,
+                                       nrows=0, **node.read_kwargs)
+            node.schema = list(header.columns)
+        return node.schema
+    if isinstance(node, _Filter):
+        return _schema(node.input)
+    if isinstance(node, _Select):
+        return list(node.columns)
+    if isinstance(node, _WithColumns):
+        columns = _schema(node.input)
+        return columns + [name for name in node.exprs if name not in columns]
+    return list(node.keys) + list(node.aggs)
+
+
+def _push_filters(node):
+    """Move filters as close to the loader as they can go"""
+    if isinstance(node, (_Scan, _Source)):
+        return node
+    node = node.replace(input=_push_filters(node.input))
+    if not isinstance(node, _Filter):
+        return node
+
+    child = node.input
+    if isinstance(child, (_Scan, _Source)):
+        return child.replace(predicate=_and(child.predicate, node.predicate))
+    if isinstance(child, _Filter):
+        return _push_filters(child.replace(predicate=child.predicate & node.predicate))
+    if isinstance(child, _Select):
+        return child.replace(input=_push_filters(_Filter(input=child.input, predicate=node.predicate)))
+    if isinstance(child, _WithColumns) and not node.predicate.columns & set(child.exprs):
+        return child.replace(input=_push_filters(_Filter(input=child.input, predicate=node.predicate)))
+    return node
+
+
+def _prune(node, required):
+    """Push the set of required columns down to the loader (None means all)"""
+    if isinstance(node, (_Scan, _Source)):
+        if required is None:
+            return node
+        needed = set(required) | (node.predicate.columns if node.predicate is not None else set())
+        # Keep the sheet's column order
+        return node.replace(columns=[column for column in _schema(node) if column in needed])
+    if isinstance(node, _Filter):
+        below = None if required is None else set(required) | node.predicate.columns
+        return node.replace(input=_prune(node.input, below))
+    if isinstance(node, _Select):
+        return node.replace(input=_prune(node.input, set(node.columns)))
+    if isinstance(node, _WithColumns):
+        exprs = node.exprs if required is None else {
+            name: expr for name, expr in node.exprs.items() if name in required}
+        below = None
+        if required is not None:
+            below = set(required) - set(exprs)
+            for expr in exprs.values():
+                below |= expr.columns
+        return node.replace(input=_prune(node.input, below), exprs=exprs)
+    below = set(node.keys)
+    for agg in node.aggs.values():
+        below |= agg.columns
+    return node.replace(input=_prune(node.input, below))
+
+
+def _mask(predicate, df):
+    return predicate.evaluate(df).fillna(False).astype(bool)
+
+
+def _execute(node):
+    if isinstance(node, _Scan):
+        read_kwargs = dict(node.read_kwargs)
+        if node.columns is not None:
+            read_kwargs['usecols'] = node.columns
+        df = read_sheet_cached(node.file_path, node.sheet_name, cache=node.cache, **read_kwargs)
+        if node.rows is not None:
+            df = df.iloc[node.rows]
+        return df if node.predicate is None else df.loc[_mask(node.predicate, df)]
+    if isinstance(node, _Source):
+        columns = list(node.df.columns) if node.columns is None else node.columns
+        df = node.df
+        if node.rows is not None:
+            # Only the selected rows of the needed columns are gathered
+            df = df.iloc[node.rows, df.columns.get_indexer(columns)]
+        if node.predicate is None:
+            return df[columns]
+        return df.loc[_mask(node.predicate, df), columns]
+
+    df = _execute(node.input)
+    if isinstance(node, _Filter):
+        return df.loc[_mask(node.predicate, df)]
+    if isinstance(node, _Select):
+        return df[node.columns]
+    if isinstance(node, _WithColumns):
+        return df.assign(**{name: expr.evaluate(df) for name, expr in node.exprs.items()})
+
+    if not node.keys:
+        return pd.DataFrame([{name: agg.reduce(agg.expr.evaluate(df)) for name, agg in node.aggs.items()}])
+    inputs = df[node.keys].assign(**{f"_agg_{name}": agg.expr.evaluate(df) for name, agg in node.aggs.items()})
+    grouped = inputs.groupby(node.keys, sort=True, dropna=False)
+    return grouped.agg(**{name: (f"_agg_{name}", agg.reduce) for name, agg in node.aggs.items()}).reset_index()
+
+
+def _describe(node, depth):
+    pad = '  ' * depth
+    if isinstance(node, _Scan):
+        line = f"{pad}Scan {node.sheet_name!r} columns={node.columns or '*'}"
+    elif isinstance(node, _Source):
+        line = f"{pad}Frame columns={node.columns or '*'}"
+    elif isinstance(node, _Filter):
+        line = f"{pad}Filter {node.predicate}"
+    elif isinstance(node, _Select):
+        line = f"{pad}Select {node.columns}"
+    elif isinstance(node, _WithColumns):
+        line = f"{pad}WithColumns {', '.join(f'{name}={expr}' for name, expr in node.exprs.items())}"
+    else:
+        line = f"{pad}Aggregate by {node.keys}: {', '.join(f'{name}={agg}' for name, agg in node.aggs.items())}"
+    if isinstance(node, (_Scan, _Source)):
+        if node.rows is not None:
+            line += f" rows={len(node.rows)}"
+        if node.predicate is not None:
+            line += f" where {node.predicate}"
+        return [line]
+    return [line] + _describe(node.input, depth + 1)
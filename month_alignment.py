@@ -0,0 +1,160 @@
+"""
+Month Alignment
+This module lines up two months of an export by email for the comparison,
+resolving emails that appear on more than one row with an explicit policy.
+
+Duplicates are resolved in one grouped pass: the rows are stably sorted by
+their factorized email code and every group is reduced with ufunc.reduceat,
+rather than scanning the month once per email. The policies are
+
+    'first'    the user's first row (what the comparison has always used)
+    'last'     the user's last row
+    'combine'  one row per user built column by column: sessions summed,
+               Avg Login Time averaged weighted by sessions, VWE the maximum
+               and any other column taken from the first row
+
+and every collapse is counted in a DuplicateReport.
+
+    july_rows, august_rows, reports = align_months(july, august, emails, policy='combine')
+    reports['after']    # DuplicateReport(groups=3, rows=3, policy='combine')
+"""
+
+import numpy as np
+import pandas as pd
+
+DUPLICATE_POLICIES = ('first', 'last', 'combine')
+
+# Per-month session count columns; the first one a month has weights its averages
+SESSION_COLUMNS = ['Login Count', 'Web sessions']
+AGGREGATIONS = ('first', 'last', 'sum', 'max', 'min', 'mean', 'weighted_mean')
+
+
+def check_duplicate_policy(policy):
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy '{policy}'; use one of {list(DUPLICATE_POLICIES)}")
+
+
+def combine_rules(columns):
+    """
+    Column -> aggregation used by the 'combine' policy for a month's columns
+
+    An aggregation is a name from AGGREGATIONS, or ('weighted_mean', weight
+    column). Columns not listed keep the user's first row.
+    """
+    rules = {}
+    sessions = next((column for column in SESSION_COLUMNS if column in columns), None)
+    for column in SESSION_COLUMNS:
+        if column in columns:
+            rules[column] = 'sum'
+    if 'Avg Login Time' in columns:
+        rules['Avg Login Time'] = ('weighted_mean', sessions) if sessions else 'mean'
+    if 'Virtual Work Experience' in columns:
+        rules['Virtual Work Experience'] = 'max'
+    return rules
+
+
+class DuplicateReport:
+    def __init__(self, groups, rows, policy):
+        self.groups = groups
+        self.rows = rows
+        self.policy = policy
+
+    def __bool__(self):
+        return self.groups > 0
+
+    def __repr__(self):
+        return f"DuplicateReport(groups={self.groups}, rows={self.rows}, policy='{self.policy}')"
+
+
+class _Groups:
+    """Rows of a frame grouped by key: a stable sort by key code plus the group boundaries"""
+
+    def __init__(self, keys):
+        codes, self.keys = pd.factorize(keys)
+        self.order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else \
+            np.empty(0, dtype=np.int64)
+        self.sizes = np.diff(np.r_[self.starts, len(codes)])
+
+    def reduce(self, ufunc, values):
+        """ufunc over every group of values (given in row order)"""
+        return ufunc.reduceat(values[self.order], self.starts) if len(self.starts) else values[:0]
+
+    def aggregate(self, values, how, weights=None):
+        values = np.asarray(values)
+        if how == 'first':
+            return values[self.order[self.starts]]
+        if how == 'last':
+            return values[self.order[self.starts + self.sizes - 1]]
+        if values.dtype.kind in 'iub' and how in ('sum', 'max', 'min'):
+            return self.reduce({'sum': np.add, 'max': np.maximum, 'min': np.minimum}[how], values)
+
+        values = values.astype(np.float64)
+        present = ~np.isnan(values)
+        if how in ('max', 'min'):
+            # fmax / fmin skip NaN, so a group is only NaN when all of it is
+            return self.reduce(np.fmax if how == 'max' else np.fmin, values)
+
+        counts = self.reduce(np.add, present.astype(np.int64))
+        sums = self.reduce(np.add, np.where(present, values, 0.0))
+        if how == 'sum':
+            return np.where(counts > 0, sums, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan)
+            if how == 'mean':
+                return means
+            if how != 'weighted_mean':
+                raise ValueError(f"Unknown aggregation '{how}'; use one of {list(AGGREGATIONS)}")
+            # Rows without a positive weight drop out; groups with no weight fall back to the plain mean
+            weights = np.asarray(weights, dtype=np.float64)
+            usable = present & (weights > 0)
+            weight_sums = self.reduce(np.add, np.where(usable, weights, 0.0))
+            weighted = self.reduce(np.add, np.where(usable, values * weights, 0.0))
+            return np.where(weight_sums > 0, weighted / weight_sums, means)
+
+
+def collapse_duplicates(df, key='Email', policy='first', rules=None):
+    """
+    One row per key, indexed by key in order of first appearance
+
+    Rows must all have a key. Returns (rows, DuplicateReport). Keys that
+    appear once keep their row untouched under every policy; under 'combine'
+    rules (see combine_rules) decide each column of the collapsed keys.
+    """
+    check_duplicate_policy(policy)
+    groups = _Groups(df[key].astype(str))
+    duplicated = groups.sizes > 1
+    report = DuplicateReport(int(duplicated.sum()), int((groups.sizes - 1).sum()), policy)
+
+    pick = groups.order[groups.starts + (groups.sizes - 1 if policy == 'last' else 0)]
+    rows = df.iloc[pick].reset_index(drop=True)
+    rows[key] = groups.keys
+    rows = rows.set_index(key)
+    if policy != 'combine' or not report:
+        return rows, report
+
+    rules = combine_rules(df.columns) if rules is None else rules
+    for column, rule in rules.items():
+        if column not in df.columns:
+            continue
+        how, weight_column = (rule, None) if isinstance(rule, str) else rule
+        weights = df[weight_column].to_numpy() if weight_column is not None else None
+        combined = groups.aggregate(df[column].to_numpy(), how, weights)
+        rows[column] = np.where(duplicated, combined, rows[column].to_numpy())
+    return rows, report
+
+
+def align_months(before, after, keys, key='Email', policy='first', rules=None):
+    """
+    The rows of the given keys in both months, one per key
+
+    keys is iterated in its own order and only keys present in both months
+    are kept. Returns (before rows, after rows, {month: DuplicateReport}),
+    the rows indexed by key in the same order.
+    """
+    before_rows, before_report = collapse_duplicates(before, key, policy, rules)
+    after_rows, after_report = collapse_duplicates(after, key, policy, rules)
+    aligned = [k for k in keys if k in before_rows.index and k in after_rows.index]
+    return (before_rows.reindex(aligned), after_rows.reindex(aligned),
+            {'before': before_report, 'after': after_report})
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Parallel Partition Processing
+This module runs the CPU-bound parsing stages (Industries parsing, Person
+tag splitting, faculty and year cleaning and the counting behind them) over
+row partitions of a loaded frame in a process pool, then merges the partial
+aggregates the workers send back.
+
+The frame is placed once in shared memory: numeric columns as their raw
+arrays, text columns Arrow-style, as one UTF-8 buffer plus row offsets, and
+mixed columns the same way with a per-row type tag. Workers attach to the
+block and rebuild only the rows of their partition, so partitions are not
+pickled through the pool. Each worker folds its rows
+into fresh copies of the partials from chunked.py and returns them; the
+parent merges them in partition order.
+
+    stats, cube = parallel_fold(df, [BasicStatsPartial(), IndustryCubePartial(mapping)])
+"""
+
+import copy
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analysis_cache import read_sheet_cached
+from chunked import (BasicStatsPartial, IndustryCubePartial, LoginPivotPartial, TagCountsPartial,
+                     merge_partials)
+from industry_mapping import load_industry_mapping
+
+# Below this many rows starting processes costs more than it saves
+MIN_PARALLEL_ROWS = 20000
+
+# Type tags of mixed-column cells; exact Python types only, anything else is pickled
+_CELL_TYPES = [str, int, float, bool]
+_PICKLED = len(_CELL_TYPES)
+
+
+class SharedFrame:
+    """
+    Columns of a DataFrame copied into one shared memory block
+
+    Use as a context manager; the block is released on exit. The
+    descriptor is small and picklable and is what workers receive.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.index = df.index
+        arrays, specs = [], []
+        for name in df.columns:
+            column_arrays, spec = _encode_column(df[name])
+            spec['name'] = name
+            specs.append(spec)
+            arrays.extend(column_arrays)
+
+        # Lay the arrays out back to back, 8-byte aligned
+        offsets, size = [], 0
+        for array in arrays:
+            offsets.append(size)
+            size += -(-array.nbytes // 8) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for array, offset in zip(arrays, offsets):
+            np.ndarray(array.shape, array.dtype, buffer=self.shm.buf, offset=offset)[...] = array
+
+        layout = iter(zip(offsets, arrays))
+        for spec in specs:
+            spec['arrays'] = [(offset, array.dtype.str, array.shape) for offset, array in
+                              (next(layout) for _ in range(spec.pop('n_arrays')))]
+        self.descriptor = {'name': self.shm.name, 'n_rows': self.n_rows, 'columns': specs}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def _encode_column(series):
+    """Shared memory arrays for one column and the spec to rebuild it"""
+    values = series.to_numpy()
+    if values.dtype.kind in 'biuf':
+        return [np.ascontiguousarray(values)], {'kind': 'array', 'n_arrays': 1}
+
+    missing = series.isna().to_numpy()
+    text = series[~missing]
+    if text.map(type).eq(str).all():
+        # Arrow-style string column: UTF-8 bytes plus start offsets, and a missing mask
+        encoded = [b''] * len(series)
+        for row, value in zip(np.flatnonzero(~missing), text):
+            encoded[row] = value.encode('utf-8')
+        return [*_byte_layout(encoded), missing], {'kind': 'text', 'n_arrays': 3}
+
+    # Mixed cells (numbers among text): str() of each cell plus a type tag to restore it
+    tags = np.array([_CELL_TYPES.index(type(value)) if type(value) in _CELL_TYPES else _PICKLED
+                     for value in values], dtype=np.uint8)
+    encoded = [repr(value).encode('utf-8') if tag == _CELL_TYPES.index(float) else
+               str(value).encode('utf-8') if tag != _PICKLED else pickle.dumps(value)
+               for value, tag in zip(values, tags)]
+    return [*_byte_layout(encoded), tags], {'kind': 'mixed', 'n_arrays': 3}
+
+
+def _byte_layout(encoded):
+    """Start offsets (one extra at the end) and the concatenated bytes of per-row byte strings"""
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _decode_cell(raw, tag):
+    if tag == _PICKLED:
+        return pickle.loads(raw)
+    cell_type = _CELL_TYPES[tag]
+    text = raw.decode('utf-8')
+    return text == 'True' if cell_type is bool else cell_type(text)
+
+
+def _decode_column(spec, buffer, start, stop):
+    arrays = [np.ndarray(shape, np.dtype(dtype), buffer=buffer, offset=offset)
+              for offset, dtype, shape in spec['arrays']]
+    if spec['kind'] == 'array':
+        return arrays[0][start:stop].copy()
+
+    offsets, data, flags = arrays
+    raw = data[offsets[start]:offsets[stop]].tobytes()
+    base = offsets[start]
+    values = np.empty(stop - start, dtype=object)
+    for i, row in enumerate(range(start, stop)):
+        cell = raw[offsets[row] - base:offsets[row + 1] - base]
+        if spec['kind'] == 'mixed':
+            values[i] = _decode_cell(cell, flags[row])
+        else:
+            values[i] = np.nan if flags[row] else cell.decode('utf-8')
+    return values
+
+
+def read_partition(descriptor, start, stop):
+    """Rebuild rows [start, stop) of a shared frame"""
+    shm = shared_memory.SharedMemory(name=descriptor['name'])
+    try:
+        columns = {spec['name']: _decode_column(spec, shm.buf, start, stop) for spec in descriptor['columns']}
+        return pd.DataFrame(columns, index=pd.RangeIndex(start, stop))
+    finally:
+        shm.close()
+
+
+def _fold_partition(descriptor, start, stop, partials):
+    batch = read_partition(descriptor, start, stop)
+    for partial in partials:
+        partial.update(batch)
+    return partials
+
+
+def partition_bounds(n_rows, partitions):
+    """(start, stop) row ranges splitting n_rows into contiguous partitions"""
+    edges = np.linspace(0, n_rows, max(1, min(partitions, n_rows)) + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+
+def parallel_fold(df, partials, workers=None, partitions=None, min_rows=MIN_PARALLEL_ROWS):
+    """
+    Fold a frame into the given (empty) partials using a process pool
+
+    Each partition is folded into its own copies of the partials; the
+    results are merged in partition order and returned in the order given.
+    Frames smaller than min_rows, or a single worker, are folded in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    columns = set()
+    for partial in partials:
+        columns |= set(partial.columns)
+    df = df[[column for column in df.columns if column in columns]]
+
+    if workers == 1 or len(df) < min_rows:
+        for partial in partials:
+            partial.update(df)
+        return partials
+
+    bounds = partition_bounds(len(df), partitions or workers)
+    with SharedFrame(df) as shared, ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+        futures = [pool.submit(_fold_partition, shared.descriptor, start, stop, copy.deepcopy(partials))
+                   for start, stop in bounds]
+        results = [future.result() for future in futures]
+    return [merge_partials([partial] + [result[i] for result in results]) for i, partial in enumerate(partials)]
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August Export_SD 2 Sept.xlsx"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    print("PARALLEL AUGUST ANALYSIS")
+    print("="*50)
+
+    try:
+        mapping = load_industry_mapping(file_path)
+        df = read_sheet_cached(file_path, 'August')
+    except Exception as e:
+        print(f"Error loading {file_path}: {e}")
+        return
+
+    started = time.perf_counter()
+    stats, pivot, industries, tags = parallel_fold(
+        df, [BasicStatsPartial(), LoginPivotPartial(), IndustryCubePartial(mapping), TagCountsPartial()],
+        workers=workers)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(df)} rows processed with up to {workers or os.cpu_count()} workers in {elapsed:.2f} seconds")
+    stats = stats.result()
+    print(f"\nTotal Users: {stats['total_users']}")
+    print(f"Total Login Count (Web Sessions): {stats['total_login_count']}")
+    print(f"Average Time per Session: {stats['avg_time_per_session']:.2f} seconds")
+    print("\nLogin Count by International Status and Year Group:")
+    print(pivot.result().to_string())
+    print(f"\nIndustry preferences recorded: {industries.result().total()}")
+    print(f"Distinct person tags: {len(tags.result()[0])}")
+
+
+if __name__ == "__main__":
+    main()
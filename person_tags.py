@@ -0,0 +1,131 @@
+"""
+Person Tag Index
+This module tokenizes the comma-separated 'Person tag' column once into an
+interned tag vocabulary and a multi-hot row/tag incidence structure.
+
+The incidence is held in CSR form (indptr/indices per row) with a postings
+list per tag, so "users with tag X", tag counts per faculty or year and
+tags-per-session become array lookups instead of repeated substring scans.
+"""
+
+import numpy as np
+import pandas as pd
+
+PERSON_TAG_COLUMN = 'Person tag'
+
+# Flag column -> engagement tag it marks
+ENGAGEMENT_FLAGS = {
+    'Career_Profiling_Flag': 'Career Profiling Engaged',
+    'VWE_Flag': 'VWE Engaged',
+    'Resume_Builder_Flag': 'Resume Builder Engaged',
+}
+
+
+class TagIndex:
+    """Multi-hot index of the tags held in a delimited text column"""
+
+    def __init__(self, values, sep=','):
+        series = pd.Series(values).reset_index(drop=True)
+        self.n_rows = len(series)
+        self.sep = sep
+
+        # Only text cells carry tags; numbers and blanks have none
+        self.is_text = series.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        text = series[self.is_text].astype(str)
+        # Exports keep stray CSV quotes on the first and last tag of a cell
+        tokens = text.str.split(sep).explode().str.strip().str.strip('"').str.strip()
+        tokens = tokens[tokens.notna() & (tokens != '')]
+        rows = tokens.index.to_numpy(dtype=np.int64)
+
+        codes, vocabulary = pd.factorize(tokens.to_numpy(dtype=object), sort=True)
+        self.vocabulary = pd.Index(vocabulary, name='Tag')
+        self._tag_codes = {tag: code for code, tag in enumerate(self.vocabulary)}
+
+        # Token count per row, duplicates included (the engagement count)
+        self.token_counts = np.bincount(rows, minlength=self.n_rows)
+
+        # Multi-hot incidence: one entry per distinct (row, tag) pair
+        pairs = np.unique(rows * len(self.vocabulary) + codes) if len(codes) else np.empty(0, dtype=np.int64)
+        pair_rows = pairs // max(len(self.vocabulary), 1)
+        self.indices = pairs % max(len(self.vocabulary), 1)
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(pair_rows, minlength=self.n_rows))])
+
+        # Postings: rows holding each tag, in row order
+        order = np.argsort(self.indices, kind='stable')
+        self._posting_rows = pair_rows[order]
+        self._posting_ptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.indices, minlength=len(self.vocabulary)))])
+
+    @classmethod
+    def from_frame(cls, df, column=PERSON_TAG_COLUMN, sep=','):
+        return cls(df[column], sep=sep)
+
+    def _matching_codes(self, tag, match='exact'):
+        """Vocabulary codes matching a tag exactly or by substring"""
+        if match == 'exact':
+            code = self._tag_codes.get(tag)
+            return [] if code is None else [code]
+        if match == 'contains':
+            return np.flatnonzero(self.vocabulary.str.contains(tag, regex=False))
+        raise ValueError(f"Unknown match mode: {match}")
+
+    def rows_with(self, tag, match='exact'):
+        """Row positions holding the tag"""
+        codes = self._matching_codes(tag, match)
+        postings = [self._posting_rows[self._posting_ptr[c]:self._posting_ptr[c + 1]] for c in codes]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        return postings[0] if len(postings) == 1 else np.unique(np.concatenate(postings))
+
+    def has_tag(self, tag, match='exact'):
+        """Boolean mask of rows holding the tag"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.rows_with(tag, match)] = True
+        return mask
+
+    def flag(self, tag, match='exact'):
+        """0/1 flag per row for the tag"""
+        return self.has_tag(tag, match).astype(np.int64)
+
+    def flag_columns(self, flags=ENGAGEMENT_FLAGS, match='exact'):
+        """DataFrame with one 0/1 column per flag"""
+        return pd.DataFrame({column: self.flag(tag, match) for column, tag in flags.items()})
+
+    def tags_of(self, row):
+        return list(self.vocabulary[self.indices[self.indptr[row]:self.indptr[row + 1]]])
+
+    def tag_counts(self):
+        """Number of rows holding each tag"""
+        return pd.Series(np.diff(self._posting_ptr), index=self.vocabulary, name='Rows')
+
+    def tag_counts_by(self, groups):
+        """Rows holding each tag per group (e.g. faculty or course year)"""
+        group_codes, group_labels = pd.factorize(pd.Series(groups).reset_index(drop=True), sort=True)
+        n_tags = len(self.vocabulary)
+        pair_rows = np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+        pair_groups = group_codes[pair_rows]
+        # Rows with a missing group are left out
+        valid = pair_groups >= 0
+        counts = np.bincount(pair_groups[valid] * n_tags + self.indices[valid],
+                             minlength=len(group_labels) * n_tags)
+        return pd.DataFrame(counts.reshape(len(group_labels), n_tags),
+                            index=pd.Index(group_labels, name=getattr(groups, 'name', None)),
+                            columns=self.vocabulary)
+
+    def multi_hot(self):
+        """Dense rows x tags 0/1 matrix"""
+        matrix = np.zeros((self.n_rows, len(self.vocabulary)), dtype=np.uint8)
+        matrix[np.repeat(np.arange(self.n_rows), np.diff(self.indptr)), self.indices] = 1
+        return matrix
+
+    def tags_per_row(self):
+        """Number of tags on each row, duplicates included"""
+        return self.token_counts
+
+    def tags_per_session(self, sessions):
+        """Tags per web session; NaN where sessions are missing or not positive or the tag cell is not text"""
+        sessions = pd.to_numeric(pd.Series(sessions).reset_index(drop=True), errors='coerce').to_numpy(dtype=np.float64)
+        valid = (sessions > 0) & self.is_text
+        ratios = np.full(self.n_rows, np.nan)
+        ratios[valid] = self.token_counts[valid] / sessions[valid]
+        return ratios
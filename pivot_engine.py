@@ -0,0 +1,106 @@
+"""
+Coded Pivot Engine
+This module builds two-way sum pivots (with Grand Total margins) directly on
+integer category codes instead of going through pandas.pivot_table.
+
+Both dimensions are encoded once against their display order. The sum grid
+and the occurrence grid come from a single np.bincount over the combined
+codes, the margins are row/column sums of the grid, and the table is laid out
+in display order as it is built, so no reindexing is needed. Categories not
+in the display order are left out of the table but still count towards the
+Grand Total margins, as pivot_table followed by reindex would have done.
+Slicing to a cohort only touches the rows in the slice.
+"""
+
+import numpy as np
+import pandas as pd
+
+BLANK_LABEL = '(blank)'
+
+YEAR_ORDER = ['1st Year', '2nd Year', '3rd Year', '4th Year', '5th Year', BLANK_LABEL]
+INTERNATIONAL_ORDER = ['Domestic', 'International', BLANK_LABEL]
+
+
+def clean_pipe_labels(values, blank=BLANK_LABEL):
+    """
+    Strip the export's quote and pipe wrapping ("'|1st Year|") from labels
+
+    Each distinct value is cleaned once; missing and empty values become the
+    blank label.
+    """
+    codes, uniques = pd.factorize(pd.Series(values).reset_index(drop=True), use_na_sentinel=True)
+    cleaned = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    cleaned = cleaned.str.replace("'|", "").str.replace("|'", "").str.replace("|", "")
+    cleaned = cleaned.replace({'nan': blank, '': blank}).to_numpy(dtype=object)
+    return np.append(cleaned, blank)[codes]
+
+
+def encode(labels, order):
+    """Position of each label in the display order; len(order) for labels outside it"""
+    lookup = {label: position for position, label in enumerate(order)}
+    codes, uniques = pd.factorize(pd.Series(labels).reset_index(drop=True))
+    positions = np.asarray([lookup.get(label, len(order)) for label in uniques], dtype=np.int64)
+    return positions[codes]
+
+
+class CodedPivot:
+    def __init__(self, row_codes, row_order, col_codes, col_order, values=None,
+                 row_name=None, col_name=None, margins_name='Grand Total'):
+        self.row_codes = np.asarray(row_codes, dtype=np.int64)
+        self.col_codes = np.asarray(col_codes, dtype=np.int64)
+        self.row_order = list(row_order)
+        self.col_order = list(col_order)
+        # Combined code per row; the last row and column of the grid collect unlisted categories
+        self.n_cols = len(self.col_order) + 1
+        self.cells = self.row_codes * self.n_cols + self.col_codes
+        self.n_cells = (len(self.row_order) + 1) * self.n_cols
+        self.values = None if values is None else np.asarray(values)
+        self.row_name = row_name
+        self.col_name = col_name
+        self.margins_name = margins_name
+
+    @classmethod
+    def from_labels(cls, row_labels, row_order, col_labels, col_order, values=None, **kwargs):
+        return cls(encode(row_labels, row_order), row_order, encode(col_labels, col_order), col_order,
+                   values, **kwargs)
+
+    def grids(self, rows=None):
+        """(sums, occurrences) grids over all rows or the given row positions"""
+        cells = self.cells if rows is None else self.cells[rows]
+        occurrences = np.bincount(cells, minlength=self.n_cells).reshape(-1, self.n_cols)
+        if self.values is None:
+            return occurrences, occurrences
+        values = self.values if rows is None else self.values[rows]
+        sums = np.bincount(cells, weights=values, minlength=self.n_cells).reshape(-1, self.n_cols)
+        if values.dtype.kind in 'iub':
+            sums = sums.astype(np.int64)
+        return sums, occurrences
+
+    def table(self, rows=None):
+        """Pivot table with Grand Total margins, laid out in display order"""
+        return self.layout(*self.grids(rows))
+
+    def layout(self, sums, occurrences):
+        """Lay out (possibly merged) sum and occurrence grids as the pivot table"""
+        # A category appears when any row carries it, even with a zero value
+        row_keep = np.flatnonzero(occurrences[:-1].sum(axis=1) > 0)
+        col_keep = np.flatnonzero(occurrences[:, :-1].sum(axis=0) > 0)
+
+        grid = np.empty((len(row_keep) + 1, len(col_keep) + 1), dtype=sums.dtype)
+        grid[:-1, :-1] = sums[np.ix_(row_keep, col_keep)]
+        grid[-1, :-1] = sums[:, col_keep].sum(axis=0)
+        grid[:-1, -1] = sums[row_keep].sum(axis=1)
+        grid[-1, -1] = sums.sum()
+
+        index = pd.Index([self.row_order[i] for i in row_keep] + [self.margins_name], name=self.row_name)
+        columns = pd.Index([self.col_order[i] for i in col_keep] + [self.margins_name], name=self.col_name)
+        return pd.DataFrame(grid, index=index, columns=columns)
+
+
+def year_international_pivot(df, values_column, year_column='Course Year',
+                             international_column='International Status'):
+    """Sum of a column by International status (rows) and Course Year (columns)"""
+    values = df[values_column].fillna(0).to_numpy()
+    return CodedPivot.from_labels(clean_pipe_labels(df[international_column]), INTERNATIONAL_ORDER,
+                                  clean_pipe_labels(df[year_column]), YEAR_ORDER, values,
+                                  row_name=international_column, col_name=year_column)
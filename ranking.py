@@ -0,0 +1,62 @@
+"""
+Top-k Ranking
+This module picks the top k items (e.g. industries) for every group (e.g.
+faculty x year cell) of a count grid without sorting each group's full list.
+
+np.argpartition finds each group's k-th largest score in linear time; only
+the k selected items are then sorted. Ties are broken deterministically in
+favour of the item listed first, which is what a stable descending sort of
+the full list gives.
+"""
+
+import numpy as np
+
+
+def top_k_indices(scores, k):
+    """
+    Column indices of the k highest scores in each row of a (groups, items) grid
+
+    Rows are ordered by descending score, ties by ascending column index. NaN
+    scores rank last. With fewer than k items every item is returned.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.ndim == 1:
+        return top_k_indices(scores[None, :], k)[0]
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    n_groups, n_items = scores.shape
+    k = min(k, n_items)
+    if k <= 0:
+        return np.empty((n_groups, 0), dtype=np.int64)
+
+    # k-th largest score per group
+    threshold = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+    above = scores > threshold[:, None]
+    # Fill the remaining places with the first items tied at the threshold
+    tied = scores == threshold[:, None]
+    room = k - above.sum(axis=1)
+    selected = above | (tied & (np.cumsum(tied, axis=1) <= room[:, None]))
+
+    # Exactly k per row; nonzero lists them in ascending column order
+    columns = np.nonzero(selected)[1].reshape(n_groups, k)
+    order = np.argsort(-np.take_along_axis(scores, columns, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(columns, order, axis=1)
+
+
+def top_k_frame(grid, item_labels, group_index, k, item_name='Item', value_name='Count'):
+    """
+    Long table of the top k items per group
+
+    grid is a (groups, items) array; group_index is a pandas Index (or
+    MultiIndex) labelling its rows. Returns one row per group and rank.
+    """
+    grid = np.asarray(grid)
+    indices = top_k_indices(grid, k)
+    n_groups, k = indices.shape
+    item_labels = np.asarray(item_labels, dtype=object)
+
+    table = group_index.repeat(k).to_frame(index=False)
+    table['Rank'] = np.tile(np.arange(1, k + 1), n_groups)
+    table[item_name] = item_labels[indices.ravel()]
+    table[value_name] = np.take_along_axis(grid, indices, axis=1).ravel()
+    return table
+
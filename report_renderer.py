@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Report Renderer
+This module renders the industry preferences and July/August comparison
+workbooks for any cohort and metric spec, instead of editing the faculty and
+year orders inside the report scripts and re-running them.
+
+Industry workbooks are slices of the count cube and comparison workbooks are
+column selections of the comparison results, so rendering never goes back to
+the sheets. The rendered .xlsx bytes are kept in an LRU cache keyed on the
+content hash of the data and the spec, so a popular variant is rendered once
+per snapshot and then served from memory.
+
+    spec = IndustryTableSpec(faculties=['Faculty of Science', 'Faculty of Engineering'],
+                             years=['1st Year', '2nd Year'])
+    data = renderer.industry_workbook(cube, content_hash, spec)
+"""
+
+import io
+import sys
+from collections import OrderedDict
+
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from analysis_cache import sheet_content_hash
+from cohorts import STANDARD_YEARS
+from count_cube import ENGINEERING_VS_ARTS
+from industry_mapping import INDUSTRY_ORDER
+from industry_preferences_analysis import IndustryPreferencesAnalysis
+from sheet_writer import CellStyle, set_column_widths, write_block, write_dataframe
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_ENTRIES = 256
+
+# Metric -> comparison result columns, in report order
+COMPARISON_METRICS = {
+    'Login Count': ['July Login Count', 'August Login Count', 'Login Count Increase', 'Login Count % Increase'],
+    'Avg Login Time': ['July Avg Login Time', 'August Avg Login Time', 'Avg Time Increase (seconds)',
+                       'Avg Time % Increase'],
+    'VWE': ['July VWE', 'August VWE', 'VWE Increase', 'VWE % Increase'],
+}
+
+_HEADER_FILL = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+_FACULTY_FILL = PatternFill(start_color="E6E6FA", end_color="E6E6FA", fill_type="solid")
+_THIN = Side(style='thin')
+
+
+def _labels(values, default):
+    """Spec labels as a tuple; a single string is one label"""
+    if values is None:
+        return tuple(default) if default is not None else None
+    return (values,) if isinstance(values, str) else tuple(values)
+
+
+class IndustryTableSpec:
+    """
+    Which industry table to render
+
+    faculties and years pick and order the column groups; industries picks
+    and orders the rows (every industry of the display order by default).
+    international restricts the students counted, e.g. ['International'].
+    """
+
+    def __init__(self, faculties=ENGINEERING_VS_ARTS, years=STANDARD_YEARS, industries=None,
+                 international=None, drop_empty_rows=False, title="INDUSTRY PREFERENCES BY FACULTY AND YEAR GROUP"):
+        self.faculties = _labels(faculties, ENGINEERING_VS_ARTS)
+        self.years = _labels(years, STANDARD_YEARS)
+        self.industries = _labels(industries, INDUSTRY_ORDER)
+        self.international = _labels(international, None)
+        self.drop_empty_rows = bool(drop_empty_rows)
+        self.title = title
+
+    def key(self):
+        return ('industry', self.faculties, self.years, self.industries, self.international,
+                self.drop_empty_rows, self.title)
+
+    def cohort(self):
+        """Selector of the students the cube is built from"""
+        return {'international': list(self.international)} if self.international else None
+
+
+class ComparisonSpec:
+    """
+    Which comparison table to render
+
+    metrics picks the metric column groups, sort_by orders the rows (by
+    Email when not given) and top_n keeps only the first rows after sorting.
+    emails restricts the rows to a cohort's users.
+    """
+
+    def __init__(self, metrics=tuple(COMPARISON_METRICS), sort_by=None, ascending=False, top_n=None, emails=None):
+        self.metrics = _labels(metrics, COMPARISON_METRICS)
+        unknown = [metric for metric in self.metrics if metric not in COMPARISON_METRICS]
+        if unknown:
+            raise ValueError(f"Unknown comparison metrics: {unknown}; use {list(COMPARISON_METRICS)}")
+        if sort_by is not None and sort_by not in self.columns():
+            raise ValueError(f"Cannot sort by '{sort_by}'; use one of {self.columns()}")
+        self.sort_by = sort_by
+        self.ascending = bool(ascending)
+        self.top_n = None if top_n is None else int(top_n)
+        self.emails = None if emails is None else frozenset(emails)
+
+    def columns(self):
+        return ['Email', 'First Name'] + [column for metric in self.metrics for column in COMPARISON_METRICS[metric]]
+
+    def key(self):
+        emails = None if self.emails is None else tuple(sorted(self.emails))
+        return ('comparison', self.metrics, self.sort_by, self.ascending, self.top_n, emails)
+
+
+class ByteLRU:
+    """Least recently used cache of rendered bytes, bounded in entries and total size"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """The cached value, or None"""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        size = _size(value)
+        if key in self.entries:
+            self.total_bytes -= _size(self.entries.pop(key))
+        if size > self.max_bytes:
+            return value
+        self.entries[key] = value
+        self.total_bytes += size
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= _size(evicted)
+        return value
+
+    def get_or_render(self, key, render):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, render())
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+
+def _size(value):
+    """Bytes held by a cached body, or by the body of a (content type, body) pair"""
+    return len(value[1]) if isinstance(value, tuple) else len(value)
+
+
+def industry_table(cube, spec):
+    """Industries x (faculty, year) counts of a cube, laid out by the spec"""
+    table = cube.sel(industry=spec.industries, faculty=spec.faculties, year=spec.years).table()
+    if spec.drop_empty_rows:
+        table = table.loc[table.sum(axis=1) > 0]
+    return table
+
+
+def comparison_table(results, spec):
+    """Comparison result rows and columns picked by the spec"""
+    table = results
+    if spec.emails is not None:
+        table = table[table['Email'].isin(spec.emails)]
+    table = table.reindex(columns=spec.columns())
+    if spec.sort_by is not None:
+        table = table.sort_values([spec.sort_by, 'Email'], ascending=[spec.ascending, True], kind='stable')
+    else:
+        table = table.sort_values('Email', kind='stable')
+    if spec.top_n is not None:
+        table = table.head(spec.top_n)
+    return table.reset_index(drop=True)
+
+
+def write_industry_sheet(ws, table, title):
+    """Title, faculty and year header rows, then one row per industry, in the exact table layout"""
+    faculty_labels = table.columns.get_level_values(0)
+    n_columns = 1 + table.shape[1]
+
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=n_columns)
+    ws['A1'] = title
+    ws['A1'].font = Font(size=16, bold=True)
+    ws['A1'].alignment = Alignment(horizontal='center')
+
+    # One merged header per faculty over its years
+    column = 2
+    for faculty in dict.fromkeys(faculty_labels):
+        width = int((faculty_labels == faculty).sum())
+        ws.merge_cells(start_row=2, start_column=column, end_row=2, end_column=column + width - 1)
+        cell = ws.cell(row=2, column=column, value=faculty)
+        cell.font = Font(bold=True, size=12)
+        cell.fill = _FACULTY_FILL
+        cell.alignment = Alignment(horizontal='center')
+        column += width
+
+    header = CellStyle(font=Font(bold=True), fill=_HEADER_FILL, alignment=Alignment(horizontal='center'))
+    write_block(ws, [['Industry'] + list(table.columns.get_level_values(1))], start_row=3, styles=[header])
+
+    # Industry names in bold, counts plain
+    rows = table.reset_index()
+    mask = [[0] + [-1] * table.shape[1]] * len(rows)
+    write_block(ws, rows, start_row=4, styles=[CellStyle(font=Font(bold=True))], style_mask=mask if mask else None)
+
+    border = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+    for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
+        for cell in row:
+            cell.border = border
+
+    # Size columns to their longest value, headers and title included
+    for column in ws.columns:
+        longest = max(len(str(cell.value)) for cell in column)
+        ws.column_dimensions[get_column_letter(column[0].column)].width = min(longest + 2, 50)
+
+
+def workbook_bytes(wb):
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def render_industry_workbook(cube, spec):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Industry Preferences Table"
+    write_industry_sheet(ws, industry_table(cube, spec), spec.title)
+    return workbook_bytes(wb)
+
+
+def render_comparison_workbook(results, spec):
+    table = comparison_table(results, spec)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Comparison Results"
+    header_style = CellStyle(font=Font(bold=True), fill=_HEADER_FILL)
+    write_dataframe(ws, table, header_style=header_style)
+    set_column_widths(ws, table)
+    return workbook_bytes(wb)
+
+
+class ReportRenderer:
+    """Renders workbook variants, caching the bytes per (data hash, spec)"""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else ByteLRU()
+
+    def industry_workbook(self, cube, data_hash, spec):
+        return self.cache.get_or_render((data_hash, spec.key()), lambda: render_industry_workbook(cube, spec))
+
+    def comparison_workbook(self, results, data_hash, spec):
+        return self.cache.get_or_render((data_hash, spec.key()), lambda: render_comparison_workbook(results, spec))
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August Export_SD 2 Sept.xlsx"
+    faculties = sys.argv[2:] or ENGINEERING_VS_ARTS
+
+    print("INDUSTRY TABLE RENDERER")
+    print("="*50)
+
+    analysis = IndustryPreferencesAnalysis(file_path)
+    if not (analysis.load_industry_mapping() and analysis.load_august_data()):
+        return
+
+    spec = IndustryTableSpec(faculties=faculties)
+    data = ReportRenderer().industry_workbook(analysis.preference_cube(),
+                                              sheet_content_hash(file_path, ['August', 'Sheet7']), spec)
+    output_filename = "Industry_Preferences_" + "_vs_".join(
+        faculty.replace("Faculty of ", "").replace(" ", "_") for faculty in spec.faculties) + ".xlsx"
+    with open(output_filename, "wb") as handle:
+        handle.write(data)
+    print(f"\nExcel table saved as: {output_filename} ({len(data)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Report Server
+This script serves the analysis results of one workbook over HTTP as JSON or
+CSV, so a dashboard can ask for the basic statistics, the login pivot,
+industry cube slices and the July/August comparison without opening the
+output workbooks or regenerating them.
+
+Results are computed through the analysis classes (and so come from the
+analysis cache when the sheets are unchanged), then held in memory, and their
+rendered bodies are kept in an LRU cache. Only 304s and cached bodies are
+answered on the event loop; a cache miss is computed on a worker thread,
+once per ETag however many requests wait for it, so a slow report never
+stalls the other connections. Workbook variants for any cohort
+are rendered by report_renderer.py from the same cube and comparison.
+
+Every response carries an ETag derived from the content hash of the sheets
+behind it and the request, and a request whose If-None-Match matches gets
+304 Not Modified. When the workbook changes on disk the in-memory results
+are dropped and recomputed on the next request.
+
+    python report_server.py "August Export_SD 2 Sept.xlsx" 8050
+    curl localhost:8050/pivot?format=csv
+    curl "localhost:8050/industries?faculty=Faculty of Engineering&axes=industry"
+    curl -o table.xlsx "localhost:8050/workbooks/industries?faculty=Faculty of Science&year=1st Year"
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from analysis_cache import get_default_cache, sheet_content_hash
+from august_analysis import AugustAnalysis
+from count_cube import AXES
+from industry_preferences_analysis import IndustryPreferencesAnalysis
+from july_august_comparison import JulyAugustComparison
+from report_renderer import XLSX_CONTENT_TYPE, ByteLRU, ComparisonSpec, IndustryTableSpec, ReportRenderer
+
+DEFAULT_PORT = 8050
+COHORT_PARAMS = ('faculty', 'year', 'international')
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _quietly(func, *args, **kwargs):
+    """Call an analysis method without its console output"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def cohort_selector(params):
+    """Cohort selector from repeated faculty / year / international query parameters"""
+    return {dimension: params[dimension] for dimension in COHORT_PARAMS if dimension in params} or None
+
+
+class ReportResults:
+    """Results of one workbook, computed on first use and kept until the file changes"""
+
+    def __init__(self, file_path, cache=None):
+        self.file_path = file_path
+        self.cache = cache or get_default_cache()
+        # Rendered workbooks are keyed on the data hash, so they outlive a reset
+        self.renderer = ReportRenderer()
+        self._signature = None
+        self._reset()
+
+    def _reset(self):
+        self.results = {}
+        self._hashes = {}
+        self._august = None
+        self._industries = None
+        self._comparison = None
+
+    def refresh(self):
+        """Drop everything held in memory when the workbook has changed on disk"""
+        stat = os.stat(self.file_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature != self._signature:
+            self._reset()
+            self._signature = signature
+
+    def known_hash(self, sheets):
+        """The content hash of the sheets when it is already known, else None"""
+        return self._hashes.get(tuple(sheets))
+
+    def content_hash(self, sheets):
+        key = tuple(sheets)
+        if key not in self._hashes:
+            self._hashes[key] = sheet_content_hash(self.file_path, list(sheets))
+        return self._hashes[key]
+
+    def memo(self, key, compute):
+        if key not in self.results:
+            self.results[key] = compute()
+        return self.results[key]
+
+    def cube(self, international=None):
+        """Preference cube of all students, or of the given international statuses"""
+        def build():
+            analysis = self.industries()
+            cohort = {'international': list(international)} if international else None
+            return analysis.preference_cube(analysis.cohorts().rows(cohort))
+        return self.memo(('cube', international), build)
+
+    def cohort_emails(self, cohort):
+        """Emails of the August students in a cohort"""
+        analysis = self.august()
+        emails = analysis.august_data['Email'].iloc[analysis.cohorts().rows(cohort)]
+        return emails.dropna().astype(str)
+
+    def august(self):
+        if self._august is None:
+            analysis = AugustAnalysis(self.file_path, cache=self.cache)
+            if not _quietly(analysis.load_august_data):
+                raise RequestError(500, "August data could not be loaded")
+            self._august = analysis
+        return self._august
+
+    def industries(self):
+        if self._industries is None:
+            analysis = IndustryPreferencesAnalysis(self.file_path, cache=self.cache)
+            if not (_quietly(analysis.load_industry_mapping) and _quietly(analysis.load_august_data)):
+                raise RequestError(500, "Industry preferences could not be loaded")
+            self._industries = analysis
+        return self._industries
+
+    def comparison(self):
+        if self._comparison is None:
+            comparison = JulyAugustComparison(self.file_path, cache=self.cache)
+            if not _quietly(comparison.load_data):
+                raise RequestError(500, "July and August data could not be loaded")
+            existing = _quietly(comparison.find_existing_users)
+            if _quietly(comparison.calculate_increases, existing) is None:
+                raise RequestError(500, "The comparison could not be computed")
+            self._comparison = comparison
+        return self._comparison
+
+
+def _checked(result, what):
+    if result is None or result is False:
+        raise RequestError(500, f"{what} could not be computed")
+    return result
+
+
+def basic_stats(results, params):
+    cohort = cohort_selector(params)
+    analysis = results.august()
+    _checked(_quietly(analysis.analyze_basic_stats, cohort), "Basic statistics")
+    return dict(analysis.analysis_results['basic_stats'])
+
+
+def login_pivot(results, params):
+    return _checked(_quietly(results.august().create_pivot_table, cohort_selector(params)), "The pivot table")
+
+
+def industry_slice(results, params):
+    """Cube slice by faculty / year / industry labels; axes= gives marginal counts instead"""
+    cube = results.cube().sel(industry=params.get('industry'), faculty=params.get('faculty'), year=params.get('year'))
+    axes = [axis for value in params.get('axes', []) for axis in value.split(',') if axis]
+    if axes:
+        unknown = sorted(set(axes) - set(AXES))
+        if unknown:
+            raise RequestError(400, f"Unknown cube axes: {unknown}; use {list(AXES)}")
+        return cube.marginal(*axes)
+    return cube.table(drop_empty_rows='industry' not in params, drop_empty_columns=True)
+
+
+def focused_table(results, params):
+    return _checked(_quietly(results.industries().create_focused_table, cohort_selector(params)),
+                    "The focused table")
+
+
+def comparison_summary(results, params):
+    return _checked(_quietly(results.comparison().generate_summary_statistics), "The comparison summary")
+
+
+def comparison_results(results, params):
+    return results.comparison().comparison_results.sort_values('Email', kind='stable', ignore_index=True)
+
+
+def industry_workbook(results, params):
+    spec = IndustryTableSpec(faculties=params.get('faculty'), years=params.get('year'),
+                             industries=params.get('industry'), international=params.get('international'),
+                             drop_empty_rows=params.get('drop_empty', ['0'])[-1] == '1')
+    data_hash = results.content_hash(ROUTES['/workbooks/industries'][0])
+    return XLSX_CONTENT_TYPE, results.renderer.industry_workbook(results.cube(spec.international), data_hash, spec)
+
+
+def comparison_workbook(results, params):
+    cohort = cohort_selector(params)
+    spec = ComparisonSpec(metrics=params.get('metric'), sort_by=params.get('sort', [None])[-1],
+                          ascending=params.get('ascending', ['0'])[-1] == '1',
+                          top_n=params.get('top', [None])[-1],
+                          emails=None if cohort is None else results.cohort_emails(cohort))
+    data_hash = results.content_hash(ROUTES['/workbooks/comparison'][0])
+    return XLSX_CONTENT_TYPE, results.renderer.comparison_workbook(results.comparison().comparison_results,
+                                                                   data_hash, spec)
+
+
+# Path -> (sheets the result depends on, handler, description)
+ROUTES = {
+    '/stats': (['August'], basic_stats, "Total users, logins and average session time"),
+    '/pivot': (['August'], login_pivot, "Login count by year group and international status"),
+    '/industries': (['August', 'Sheet7'], industry_slice, "Industry x faculty x year preference counts"),
+    '/industries/focused': (['August', 'Sheet7'], focused_table, "Engineering vs Arts preference table"),
+    '/comparison/summary': (['July ', 'August'], comparison_summary, "July to August increase statistics"),
+    '/comparison/results': (['July ', 'August'], comparison_results, "Per-user July to August increases"),
+    '/workbooks/industries': (['August', 'Sheet7'], industry_workbook,
+                              "Industry table workbook for any faculties, years and international status"),
+    '/workbooks/comparison': (['July ', 'August'], comparison_workbook,
+                              "Comparison workbook for any metrics, ordering and cohort"),
+}
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def _clean(value):
+    """Replace NaN with None so the JSON is valid"""
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, np.floating) and np.isnan(value):
+        return None
+    return value
+
+
+def _flatten(value, prefix=''):
+    for key, item in value.items():
+        name = f"{prefix}{key}"
+        if isinstance(item, dict):
+            yield from _flatten(item, f"{name}.")
+        else:
+            yield name, item
+
+
+def render(payload, fmt):
+    """(content type, body bytes) of a result"""
+    if isinstance(payload, tuple):
+        # Already rendered, e.g. a workbook
+        return payload
+    if isinstance(payload, dict):
+        if fmt == 'csv':
+            frame = pd.DataFrame(list(_flatten(payload)), columns=['Metric', 'Value'], dtype=object)
+            return 'text/csv; charset=utf-8', frame.to_csv(index=False).encode('utf-8')
+        body = json.dumps(_clean(payload), default=_json_default)
+        return 'application/json', body.encode('utf-8')
+
+    if isinstance(payload, pd.Series):
+        payload = payload.to_frame()
+    # Row numbers carry no information
+    index = not isinstance(payload.index, pd.RangeIndex)
+    if fmt == 'csv':
+        return 'text/csv; charset=utf-8', payload.to_csv(index=index).encode('utf-8')
+    return 'application/json', payload.to_json(orient='split', index=index, date_format='iso').encode('utf-8')
+
+
+def request_format(params, headers):
+    fmt = params.get('format', [None])[-1]
+    if fmt is None:
+        fmt = 'csv' if 'text/csv' in headers.get('accept', '') else 'json'
+    if fmt not in ('json', 'csv'):
+        raise RequestError(400, f"Unknown format '{fmt}'; use json or csv")
+    return fmt
+
+
+def make_etag(content_hash, path, params, fmt):
+    digest = hashlib.sha256()
+    digest.update(content_hash.encode('utf-8'))
+    digest.update(repr((path, sorted((k, tuple(v)) for k, v in params.items() if k != 'format'), fmt)).encode('utf-8'))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(etag, if_none_match):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    # Weak validators compare equal to the strong tag for GET
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ReportServer:
+    def __init__(self, file_path, host='127.0.0.1', port=DEFAULT_PORT, cache=None):
+        self.results = ReportResults(file_path, cache)
+        # Bodies are keyed on their ETag, so entries of an older snapshot simply age out
+        self.bodies = ByteLRU()
+        # One worker: misses share the analysis objects, so they are computed one at a time
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report')
+        self.pending = {}
+        self.host = host
+        self.port = port
+
+    async def blocking(self, func, *args):
+        """Run a blocking call on the worker thread"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def render_once(self, etag, build):
+        """Rendered body of a cache miss; concurrent requests for the same ETag share one computation"""
+        task = self.pending.get(etag)
+        if task is None:
+            task = asyncio.ensure_future(self.blocking(build))
+            self.pending[etag] = task
+            task.add_done_callback(lambda _: self.pending.pop(etag, None))
+        rendered = await task
+        if etag not in self.bodies:
+            self.bodies.put(etag, rendered)
+        return rendered
+
+    async def handle(self, method, target, headers):
+        """(status, headers, body) for one request"""
+        if method not in ('GET', 'HEAD'):
+            raise RequestError(405, f"Method {method} not allowed")
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        params = parse_qs(url.query)
+
+        if path == '/':
+            index = {route: description for route, (_, _, description) in ROUTES.items()}
+            return 200, {'Content-Type': 'application/json'}, json.dumps(index).encode('utf-8')
+        if path not in ROUTES:
+            raise RequestError(404, f"No report at {path}")
+
+        sheets, handler, _ = ROUTES[path]
+        fmt = request_format(params, headers)
+        self.results.refresh()
+        content_hash = self.results.known_hash(sheets)
+        if content_hash is None:
+            # Hashing the sheets reads the workbook, so it happens off the loop too
+            content_hash = await self.blocking(self.results.content_hash, sheets)
+        etag = make_etag(content_hash, path, params, fmt)
+        response_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(etag, headers.get('if-none-match')):
+            return 304, response_headers, b''
+
+        rendered = self.bodies.get(etag)
+        if rendered is None:
+            def build():
+                try:
+                    payload = handler(self.results, params)
+                except (KeyError, ValueError) as e:
+                    raise RequestError(400, str(e))
+                return render(payload, fmt)
+            rendered = await self.render_once(etag, build)
+        content_type, body = rendered
+        response_headers['Content-Type'] = content_type
+        return 200, response_headers, body
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {}, b'', close=True)
+                    break
+                try:
+                    status, response_headers, body = await self.handle(method, target, headers)
+                except RequestError as e:
+                    status, response_headers = e.status, {'Content-Type': 'application/json'}
+                    body = json.dumps({'error': str(e)}).encode('utf-8')
+                except Exception as e:
+                    print(f"Error serving {target}: {e}")
+                    status, response_headers = 500, {'Content-Type': 'application/json'}
+                    body = json.dumps({'error': 'Internal error'}).encode('utf-8')
+
+                close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+                await self.respond(writer, status, response_headers, b'' if method == 'HEAD' else body,
+                                   close, content_length=len(body))
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, headers, body, close=False, content_length=None):
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        headers = dict(headers, **{'Content-Length': str(len(body) if content_length is None else content_length)})
+        if close:
+            headers['Connection'] = 'close'
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self):
+        server = await asyncio.start_server(self.serve_connection, self.host, self.port)
+        print(f"Serving reports of {self.results.file_path} on http://{self.host}:{self.port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "August Export_SD 2 Sept.xlsx"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT
+
+    print("REPORT SERVER")
+    print("="*50)
+
+    if not os.path.exists(file_path):
+        print(f"Error: {file_path} not found")
+        return
+    server = ReportServer(file_path, port=port)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Bulk Worksheet Writer
+This module writes a DataFrame block, or a 2-D NumPy array plus a style mask,
+into an openpyxl worksheet in one call.
+
+Styles are registered with the workbook once per distinct style rather than
+once per cell, and cells are created directly instead of going through
+ws.cell() lookups. Conditional fills (positive/negative/neutral) are computed
+as a vectorized style mask instead of per-cell if-chains.
+"""
+
+import numpy as np
+import pandas as pd
+from openpyxl.cell.cell import Cell
+from openpyxl.utils import get_column_letter
+
+
+class CellStyle:
+    """A combination of font, fill, alignment, border and number format"""
+
+    def __init__(self, font=None, fill=None, alignment=None, border=None, number_format=None):
+        self.font = font
+        self.fill = fill
+        self.alignment = alignment
+        self.border = border
+        self.number_format = number_format
+
+    def style_array(self, ws):
+        """Register this style with the worksheet's workbook and return its style array"""
+        cell = Cell(ws)
+        if self.font is not None:
+            cell.font = self.font
+        if self.fill is not None:
+            cell.fill = self.fill
+        if self.alignment is not None:
+            cell.alignment = self.alignment
+        if self.border is not None:
+            cell.border = self.border
+        if self.number_format is not None:
+            cell.number_format = self.number_format
+        return cell._style
+
+
+def _to_cell_values(values):
+    """Convert a DataFrame or array into a 2-D object array with None for missing"""
+    if isinstance(values, pd.DataFrame):
+        frame = values.astype(object)
+        return frame.where(values.notna(), None).to_numpy(dtype=object)
+    values = np.asarray(values, dtype=object)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    missing = pd.isna(values)
+    if missing.any():
+        values = values.copy()
+        values[missing] = None
+    return values
+
+
+def write_block(ws, values, start_row=1, start_col=1, styles=None, style_mask=None):
+    """
+    Write a 2-D block of values into the worksheet
+
+    Args:
+        ws: Target worksheet
+        values: DataFrame or 2-D array of cell values (NaN is written as an empty cell)
+        start_row: Row of the block's top-left cell (1-based)
+        start_col: Column of the block's top-left cell (1-based)
+        styles: List of CellStyle objects
+        style_mask: Integer array with the block's shape selecting a style per
+            cell; -1 leaves a cell unstyled. Without a mask every cell gets styles[0].
+
+    Returns the row following the last written row.
+    """
+    cells = _to_cell_values(values)
+    n_rows, n_cols = cells.shape
+    if n_rows == 0:
+        return start_row
+
+    style_arrays = [style.style_array(ws) for style in styles] if styles else []
+    if style_mask is None:
+        style_mask = np.full(cells.shape, 0 if style_arrays else -1, dtype=np.intp)
+    else:
+        style_mask = np.asarray(style_mask, dtype=np.intp)
+        if style_mask.shape != cells.shape:
+            raise ValueError(f"Style mask shape {style_mask.shape} does not match block shape {cells.shape}")
+    lookup = style_arrays + [None]
+
+    # ws.cell() per value costs a lookup and a style registration; build the cells directly
+    sheet_cells = ws._cells
+    columns = range(start_col, start_col + n_cols)
+    for row_idx, row_values, row_styles in zip(range(start_row, start_row + n_rows),
+                                               cells.tolist(), style_mask.tolist()):
+        for col_idx, value, style_idx in zip(columns, row_values, row_styles):
+            sheet_cells[(row_idx, col_idx)] = Cell(ws, row=row_idx, column=col_idx, value=value,
+                                                   style_array=lookup[style_idx])
+
+    ws._current_row = max(ws._current_row, start_row + n_rows - 1)
+    return start_row + n_rows
+
+
+def write_dataframe(ws, df, start_row=1, start_col=1, header=True, header_style=None,
+                    styles=None, style_mask=None):
+    """Write a DataFrame (optionally with a styled header row) into the worksheet"""
+    row = start_row
+    if header:
+        row = write_block(ws, [list(df.columns)], start_row=row, start_col=start_col,
+                          styles=[header_style] if header_style else None)
+    return write_block(ws, df, start_row=row, start_col=start_col, styles=styles, style_mask=style_mask)
+
+
+def sign_style_mask(df, columns, positive, negative, neutral, default=0):
+    """
+    Build a style mask selecting styles by the sign of the given columns
+
+    Cells in the listed columns get the positive, negative or neutral style
+    index by sign; missing values and all other columns get default.
+    """
+    mask = np.full(df.shape, default, dtype=np.intp)
+    for column in columns:
+        col_idx = df.columns.get_loc(column)
+        values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+        mask[:, col_idx] = np.select([values > 0, values < 0, values == 0],
+                                     [positive, negative, neutral], default=default)
+    return mask
+
+
+def scale_style_mask(values, edges, first_style=0, default=-1):
+    """
+    Build a style mask selecting one of len(edges) + 1 graded styles per cell
+
+    Each numeric value gets first_style plus the index of its bin among the
+    edges (np.digitize), for heatmap-style fills. Missing values get default.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mask = first_style + np.digitize(values, np.asarray(edges, dtype=np.float64))
+    return np.where(np.isnan(values), default, mask).astype(np.intp)
+
+
+def set_column_widths(ws, df, start_col=1, header=True, max_width=50):
+    """Size columns to their longest rendered value, computed per column"""
+    for offset, column in enumerate(df.columns):
+        lengths = df[column].astype(str).str.len()
+        longest = int(lengths.max()) if len(lengths) else 0
+        if header:
+            longest = max(longest, len(str(column)))
+        ws.column_dimensions[get_column_letter(start_col + offset)].width = min(longest + 2, max_width)
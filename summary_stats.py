@@ -0,0 +1,290 @@
+"""
+Streaming Summary Statistics
+This module provides mergeable, single-pass accumulators for the summary
+statistics reported on comparison and metrics sheets.
+
+RunningStats tracks count, mean and variance (Welford/Chan), min, max and sign
+counts. KLLSketch answers median and percentile queries from a bounded sample
+of weighted items. MetricAccumulator combines both. All three fold over row
+batches and can be merged, so statistics over chunked or parallel data are
+computed in one pass and combined afterwards.
+"""
+
+import math
+import random
+
+import numpy as np
+
+# Sketches hold every value (and so stay exact) up to this many items
+DEFAULT_SKETCH_K = 1024
+
+
+def _clean_batch(values):
+    """Return a 1-D array of the batch with missing values removed"""
+    arr = np.asarray(values)
+    if arr.ndim != 1:
+        arr = arr.ravel()
+    if arr.dtype == object:
+        arr = np.asarray([v for v in arr if v is not None and not (isinstance(v, float) and math.isnan(v))])
+        if arr.size == 0:
+            return arr.astype(np.float64)
+    if arr.dtype.kind == 'f':
+        arr = arr[~np.isnan(arr)]
+    return arr
+
+
+class RunningStats:
+    """Count, mean, variance, min, max and sign counts in one pass"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.positive = 0
+        self.negative = 0
+        self.zero = 0
+
+    def update(self, values):
+        """Fold a batch of values into the running statistics"""
+        arr = _clean_batch(values)
+        if arr.size == 0:
+            return self
+
+        batch = RunningStats()
+        as_float = arr.astype(np.float64, copy=False)
+        batch.count = int(arr.size)
+        batch.mean = float(as_float.mean())
+        batch.m2 = float(np.square(as_float - batch.mean).sum())
+        # Keep min/max in the input dtype so integer metrics stay integers
+        batch.min = arr.min()
+        batch.max = arr.max()
+        batch.positive = int(np.count_nonzero(arr > 0))
+        batch.negative = int(np.count_nonzero(arr < 0))
+        batch.zero = batch.count - batch.positive - batch.negative
+        return self.merge(batch)
+
+    def merge(self, other):
+        """Combine another accumulator into this one (Chan et al.)"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.positive += other.positive
+        self.negative += other.negative
+        self.zero += other.zero
+        return self
+
+    def variance(self, ddof=1):
+        if self.count <= ddof:
+            return math.nan
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return math.sqrt(self.variance(ddof))
+
+    def mean_or_nan(self):
+        return self.mean if self.count else math.nan
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (Karnin, Lang and Liberty)
+
+    Keeps at most about 3k items regardless of stream length. While nothing
+    has been compacted the sketch holds every value and quantiles are exact,
+    using the same linear interpolation as numpy and pandas.
+    """
+
+    def __init__(self, k=DEFAULT_SKETCH_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self):
+        return sum(level.size for level in self.levels)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def update(self, values):
+        """Add a batch of values to the sketch"""
+        arr = _clean_batch(values).astype(np.float64, copy=False)
+        if arr.size == 0:
+            return self
+        self.n += int(arr.size)
+        self.levels[0] = np.concatenate([self.levels[0], arr])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Combine another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self):
+        while self._size() > self._max_size():
+            for h in range(len(self.levels)):
+                if self.levels[h].size >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append(np.empty(0))
+                    items = np.sort(self.levels[h])
+                    # An odd item stays behind; the rest are halved into the next level
+                    keep = items[:1] if items.size % 2 else items[:0]
+                    pairs = items[keep.size:]
+                    promoted = pairs[self._rng.randint(0, 1)::2]
+                    self.levels[h] = keep
+                    self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                    break
+
+    def is_exact(self):
+        return len(self.levels) == 1
+
+    def quantiles(self, qs):
+        """Return the estimated values at the given quantiles (0..1)"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        if self.is_exact():
+            return np.quantile(self.levels[0], qs)
+
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2 ** h, dtype=np.float64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+        cumulative = np.cumsum(weights[order])
+        targets = qs * cumulative[-1]
+        positions = np.searchsorted(cumulative, targets, side='left')
+        return values[np.minimum(positions, values.size - 1)]
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+class MetricAccumulator:
+    """Running stats plus a quantile sketch for one metric"""
+
+    def __init__(self, k=DEFAULT_SKETCH_K, buffer_size=4096):
+        self.stats = RunningStats()
+        self.sketch = KLLSketch(k=k)
+        self.buffer_size = buffer_size
+        self._buffer = []
+
+    def update(self, values):
+        """Fold a batch of values into the accumulator"""
+        self._flush()
+        self.stats.update(values)
+        self.sketch.update(values)
+        return self
+
+    def add(self, value):
+        """Add a single value; values are buffered and folded in batches"""
+        self._buffer.append(value)
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+        return self
+
+    def _flush(self):
+        if self._buffer:
+            batch = np.asarray(self._buffer)
+            self._buffer = []
+            self.stats.update(batch)
+            self.sketch.update(batch)
+
+    def merge(self, other):
+        self._flush()
+        other._flush()
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def count(self):
+        self._flush()
+        return self.stats.count
+
+    def mean(self):
+        self._flush()
+        return self.stats.mean_or_nan()
+
+    def min(self):
+        self._flush()
+        return self.stats.min if self.stats.count else math.nan
+
+    def max(self):
+        self._flush()
+        return self.stats.max if self.stats.count else math.nan
+
+    def median(self):
+        self._flush()
+        return self.sketch.median()
+
+    def percentiles(self, percents):
+        """Return the values at the given percentiles (0..100)"""
+        self._flush()
+        return self.sketch.quantiles(np.asarray(percents, dtype=np.float64) / 100)
+
+    def to_summary(self, suffix=''):
+        """Return the summary section in generate_summary_statistics format"""
+        self._flush()
+        return {
+            f'Average Increase{suffix}': round(self.mean(), 2),
+            f'Median Increase{suffix}': round(self.median(), 2),
+            f'Max Increase{suffix}': self.max(),
+            f'Min Increase{suffix}': self.min(),
+            'Users with Positive Increase': self.stats.positive,
+            'Users with Negative Increase': self.stats.negative
+        }
+
+
+def iter_row_batches(df, batch_size=65536):
+    """Yield consecutive row slices of a DataFrame"""
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+
+def fold_batches(batches, columns, accumulators=None):
+    """Fold DataFrame batches into one accumulator per column"""
+    if accumulators is None:
+        accumulators = {column: MetricAccumulator() for column in columns}
+    for batch in batches:
+        for column in columns:
+            if column in batch.columns:
+                accumulators[column].update(batch[column].to_numpy())
+    return accumulators
+
+
+def merge_accumulators(partials):
+    """Merge per-worker accumulator dictionaries into one"""
+    merged = {}
+    for partial in partials:
+        for column, accumulator in partial.items():
+            if column in merged:
+                merged[column].merge(accumulator)
+            else:
+                merged[column] = accumulator
+    return merged
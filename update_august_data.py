@@ -1,7 +1,8 @@
 import pandas as pd
 import numpy as np
-from openpyxl import load_workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
+import zipfile
+from derived_columns import CAREER_PROFILING_RULE, DerivedColumnEngine
+from xlsx_patch import patch_columns, sheet_part_names
 
 def update_august_data():
     """Update August data sheet by adding '1' in column T when 'Career Profiling Engaged' appears in column E"""
@@ -11,13 +12,11 @@ def update_august_data():
         file_path = "August Export_SD 2 Sept_modified.xlsx"
         print(f"Reading data from: {file_path}")
         
-        # Load the workbook
-        workbook = load_workbook(file_path)
-        
-        # Check if August sheet exists
-        if 'August' not in workbook.sheetnames:
-            print("Error: 'August' sheet not found!")
-            return
+        # Check if August sheet exists without loading the workbook
+        with zipfile.ZipFile(file_path) as package:
+            if 'August' not in sheet_part_names(package):
+                print("Error: 'August' sheet not found!")
+                return
         
         # Read the August sheet as DataFrame
         august_df = pd.read_excel(file_path, sheet_name='August')
@@ -26,31 +25,18 @@ def update_august_data():
         # Check current columns
         print(f"Current columns: {list(august_df.columns)}")
         
-        # Check if column T already exists, if not create it
-        if len(august_df.columns) < 20:  # Column T is the 20th column (index 19)
-            # Add new column T
-            august_df['Career_Profiling_Flag'] = 0
-            print("Added new column 'Career_Profiling_Flag'")
-        else:
-            # Use existing column T
-            august_df['Career_Profiling_Flag'] = 0
-            print("Using existing column T")
-        
         # Find rows where column E (Person tag) contains "Career Profiling Engaged"
         # Column E is index 4 (Person tag)
         person_tag_col = august_df.columns[4]  # Get the actual column name
         print(f"Checking column: {person_tag_col}")
         
-        # Count matches before update
-        matches_before = august_df[person_tag_col].str.contains('Career Profiling Engaged', na=False).sum()
-        print(f"Found {matches_before} rows with 'Career Profiling Engaged' in {person_tag_col}")
+        # Evaluate the flag rule (column T) in one pass over the tag index
+        engine = DerivedColumnEngine([dict(CAREER_PROFILING_RULE, source=person_tag_col)])
+        derived = engine.evaluate(august_df)
+        august_df['Career_Profiling_Flag'] = derived['Career_Profiling_Flag']
         
-        # Update column T (Career_Profiling_Flag) to 1 where condition is met
-        mask = august_df[person_tag_col].str.contains('Career Profiling Engaged', na=False)
-        august_df.loc[mask, 'Career_Profiling_Flag'] = 1
-        
-        # Count matches after update
         matches_after = august_df['Career_Profiling_Flag'].sum()
+        print(f"Found {matches_after} rows with 'Career Profiling Engaged' in {person_tag_col}")
         print(f"Updated {matches_after} rows with '1' in Career_Profiling_Flag column")
         
         # Show sample of updated data
@@ -58,19 +44,12 @@ def update_august_data():
         updated_rows = august_df[august_df['Career_Profiling_Flag'] == 1]
         print(updated_rows[['First name', person_tag_col, 'Career_Profiling_Flag']].head())
         
-        # Save to new file
+        # Save to new file: a copy of the workbook with only the flag column patched
         output_file = "August_Export_SD_2_Sept_updated.xlsx"
-        
-        # Create new workbook with updated data
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            # Write August sheet with updates
-            august_df.to_excel(writer, sheet_name='August', index=False)
-            
-            # Copy other sheets
-            for sheet_name in workbook.sheetnames:
-                if sheet_name != 'August':
-                    sheet_df = pd.read_excel(file_path, sheet_name=sheet_name)
-                    sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+        positions = engine.column_positions(august_df)
+        patch_columns(file_path, 'August',
+                      {positions[name]: (name, derived[name].tolist()) for name in derived.columns},
+                      output_path=output_file)
         
         print(f"\nUpdated data saved to: {output_file}")
         
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-from openpyxl import load_workbook
+import zipfile
+from derived_columns import CAREER_PROFILING_RULE, DerivedColumnEngine
+from xlsx_patch import sheet_part_names
 
 def update_master_file():
     """Update the master file directly by adding '1' in column T when 'Career Profiling Engaged' appears in column E"""
@@ -10,57 +12,19 @@ def update_master_file():
         file_path = "August Export_SD 2 Sept_modified.xlsx"
         print(f"Reading data from: {file_path}")
         
-        # Load the workbook
-        workbook = load_workbook(file_path)
+        # Check if August sheet exists without loading the workbook
+        with zipfile.ZipFile(file_path) as package:
+            if 'August' not in sheet_part_names(package):
+                print("Error: 'August' sheet not found!")
+                return
         
-        # Check if August sheet exists
-        if 'August' not in workbook.sheetnames:
-            print("Error: 'August' sheet not found!")
-            return
-        
-        # Get the August worksheet
-        august_worksheet = workbook['August']
-        print(f"August sheet loaded successfully")
-        
-        # Find the column T (20th column, index 19)
-        # First, let's check if we need to add a new column
-        max_col = august_worksheet.max_column
-        
-        if max_col < 20:
-            # Add new column T
-            print("Adding new column T (Career Profiling Flag)")
-            # Insert column T at position 20
-            august_worksheet.insert_cols(20)
-            # Add header
-            august_worksheet.cell(row=1, column=20, value="Career_Profiling_Flag")
-        else:
-            # Use existing column T
-            print("Using existing column T")
-            # Update header
-            august_worksheet.cell(row=1, column=20, value="Career_Profiling_Flag")
-        
-        # Column E is the 5th column (index 4)
-        person_tag_col = 5
-        
-        # Initialize counter
-        updated_count = 0
-        
-        # Process each row starting from row 2 (skip header)
-        for row in range(2, august_worksheet.max_row + 1):
-            person_tag_value = august_worksheet.cell(row=row, column=person_tag_col).value
-            
-            if person_tag_value and "Career Profiling Engaged" in str(person_tag_value):
-                # Set column T to 1
-                august_worksheet.cell(row=row, column=20, value=1)
-                updated_count += 1
-            else:
-                # Set column T to 0
-                august_worksheet.cell(row=row, column=20, value=0)
+        # Evaluate the flag from the Person tag index and patch only column T
+        # (20th column); the other sheets and columns are left untouched
+        engine = DerivedColumnEngine([CAREER_PROFILING_RULE])
+        derived = engine.apply_to_workbook(file_path, 'August')
+        updated_count = int(derived['Career_Profiling_Flag'].sum())
         
         print(f"Updated {updated_count} rows with '1' in column T")
-        
-        # Save the updated master file
-        workbook.save(file_path)
         print(f"Master file updated and saved: {file_path}")
         
         # Verify the update by reading the file again
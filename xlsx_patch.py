@@ -0,0 +1,704 @@
+"""
+XLSX Package Patching
+This module edits .xlsx packages at the zip/XML level instead of loading and
+re-saving the whole workbook with openpyxl.
+
+Cells of an existing sheet can be patched in place, and whole sheets built
+with openpyxl in a scratch workbook can be added or replaced. Only the parts
+being changed (plus workbook.xml, its rels, the content types and styles.xml
+when sheets are injected) are rewritten; every other part of the package is
+copied through with identical content, so untouched sheets keep their data,
+formulas and styling exactly as they were.
+"""
+
+import bisect
+import io
+import math
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+_ROW_RE = re.compile(r'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+_CELL_RE = re.compile(r'<c\b([^>]*?)(?:/>|>.*?</c>)', re.S)
+_REF_RE = re.compile(r'\br="([A-Z]+)(\d+)"')
+_ROW_NUMBER_RE = re.compile(r'\br="(\d+)"')
+_STYLE_RE = re.compile(r'\bs="(\d+)"')
+_SPANS_RE = re.compile(r'\s+spans="[^"]*"')
+_DIMENSION_RE = re.compile(r'<dimension\b[^>]*\bref="([^"]*)"[^>]*/>')
+_SHEET_DATA_RE = re.compile(r'<sheetData\s*/>|<sheetData\b[^>]*>(.*?)</sheetData>', re.S)
+
+
+def sheet_part_names(package):
+    """Map sheet names to their worksheet part names inside the package"""
+    workbook_xml = package.read("xl/workbook.xml").decode("utf-8")
+    rels_xml = package.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+
+    targets = {}
+    for rel in re.findall(r"<Relationship\b[^>]*>", rels_xml):
+        rel_id = re.search(r'\bId="([^"]+)"', rel)
+        target = re.search(r'\bTarget="([^"]+)"', rel)
+        if rel_id and target:
+            target = target.group(1)
+            if target.startswith("/"):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join("xl", target))
+            targets[rel_id.group(1)] = target
+
+    parts = {}
+    prefixes = _relationship_prefixes(workbook_xml)
+    for sheet in re.findall(r"<sheet\b[^>]*>", workbook_xml):
+        name = re.search(r'\bname="([^"]*)"', sheet)
+        rel_id = next((match for match in (re.search(rf'(?<![\w:]){prefix}:id="([^"]+)"', sheet)
+                                           for prefix in prefixes) if match), None)
+        if name and rel_id and rel_id.group(1) in targets:
+            parts[unescape_xml(name.group(1))] = targets[rel_id.group(1)]
+    return parts
+
+
+def _relationship_prefixes(workbook_xml):
+    """Prefixes bound to the relationships namespace, on the root or on individual sheet entries"""
+    return list(dict.fromkeys(re.findall(rf'xmlns:([\w.-]+)="{re.escape(RELATIONSHIPS_NS)}"', workbook_xml)))
+
+
+def unescape_xml(value):
+    """Undo XML attribute escaping"""
+    return (value.replace("&quot;", '"').replace("&apos;", "'")
+            .replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&"))
+
+
+def rewrite_package(path, replacements, output_path=None, additions=None, removals=()):
+    """
+    Write a copy of the package with some parts replaced, added or removed
+
+    replacements maps part names to new bytes; additions maps new part names
+    to bytes; removals lists parts to drop. All other parts are copied through
+    unchanged and in their original order. The result replaces path unless
+    output_path is given.
+    """
+    output_path = output_path or path
+    additions = additions or {}
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".xlsx.tmp")
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(path) as source, \
+                zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                if info.filename in removals:
+                    continue
+                if info.filename in replacements:
+                    target.writestr(info, replacements[info.filename])
+                else:
+                    with source.open(info) as src, target.open(info, "w") as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+            for name, data in additions.items():
+                target.writestr(zipfile.ZipInfo(name, date_time=_zip_timestamp()), data,
+                                compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _zip_timestamp():
+    return time.localtime()[:6]
+
+
+def cell_xml(ref, value, style=None):
+    """Serialize one cell; returns '' for missing values"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    style_attr = f' s="{style}"' if style is not None else ''
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return f'<c r="{ref}"{style_attr}/>' if style is not None else ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int):
+        return f'<c r="{ref}"{style_attr} t="n"><v>{value}</v></c>'
+    if isinstance(value, float):
+        return f'<c r="{ref}"{style_attr} t="n"><v>{repr(value)}</v></c>'
+    text = str(value)
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def _column_index(column):
+    return column if isinstance(column, int) else column_index_from_string(column)
+
+
+def _numbered_tag(xml, tag, ref):
+    """Give an element without an r attribute an explicit one"""
+    return re.sub(rf'^<{tag}\b', f'<{tag} r="{ref}"', xml, count=1)
+
+
+def _patch_row(row_number, attrs, body, new_cells):
+    """Replace or insert the given cells (column index -> value) in one row"""
+    cells = []
+    col_idx = 0
+    for match in _CELL_RE.finditer(body or ''):
+        # Cells without an r attribute follow the previous cell of the row
+        ref = _REF_RE.search(match.group(1))
+        col_idx = column_index_from_string(ref.group(1)) if ref else col_idx + 1
+        xml, attrs_text = match.group(0), match.group(1)
+        if ref is None:
+            xml = _numbered_tag(xml, 'c', f"{get_column_letter(col_idx)}{row_number}")
+        cells.append((col_idx, xml, attrs_text))
+
+    existing = {col_idx: attrs_text for col_idx, _, attrs_text in cells}
+    kept = [(col_idx, xml) for col_idx, xml, _ in cells if col_idx not in new_cells]
+    for col_idx, value in new_cells.items():
+        # Keep the cell's existing style so patched values look like their neighbours
+        style = _STYLE_RE.search(existing[col_idx]) if col_idx in existing else None
+        xml = cell_xml(f"{get_column_letter(col_idx)}{row_number}", value, style.group(1) if style else None)
+        if xml:
+            kept.append((col_idx, xml))
+    kept.sort(key=lambda item: item[0])
+
+    attrs = _SPANS_RE.sub('', attrs)
+    if not kept:
+        return f'<row{attrs}/>'
+    return f'<row{attrs}>{"".join(xml for _, xml in kept)}</row>'
+
+
+def patch_cells(sheet_xml, updates):
+    """
+    Apply cell updates to a worksheet's XML
+
+    updates maps row number -> {column index: value}. Rows that do not exist
+    yet are created in order. Returns the new XML text.
+    """
+    sheet_data = _SHEET_DATA_RE.search(sheet_xml)
+    if sheet_data is None:
+        raise ValueError("Worksheet has no sheetData element")
+
+    new_rows = sorted(updates)
+    next_new = 0
+    pieces = []
+    row_number = 0
+    for match in _ROW_RE.finditer(sheet_data.group(1) or ''):
+        # A row without an r attribute follows the previous one; number it
+        # explicitly so rows inserted before it cannot shift it
+        number = _ROW_NUMBER_RE.search(match.group(1))
+        row_number = int(number.group(1)) if number else row_number + 1
+        if number is None:
+            match = _ROW_RE.match(_numbered_tag(match.group(0), 'row', str(row_number)))
+        # Rows that do not exist yet and sort before this one
+        while next_new < len(new_rows) and new_rows[next_new] < row_number:
+            new_row = new_rows[next_new]
+            pieces.append(_patch_row(new_row, f' r="{new_row}"', '', updates[new_row]))
+            next_new += 1
+        if next_new < len(new_rows) and new_rows[next_new] == row_number:
+            pieces.append(_patch_row(row_number, match.group(1), match.group(2), updates[row_number]))
+            next_new += 1
+        else:
+            pieces.append(match.group(0))
+    for new_row in new_rows[next_new:]:
+        pieces.append(_patch_row(new_row, f' r="{new_row}"', '', updates[new_row]))
+
+    new_sheet_data = f'<sheetData>{"".join(pieces)}</sheetData>'
+    sheet_xml = sheet_xml[:sheet_data.start()] + new_sheet_data + sheet_xml[sheet_data.end():]
+    return _extend_dimension(sheet_xml, updates)
+
+
+def _extend_dimension(sheet_xml, updates):
+    """Grow the sheet's dimension ref to cover the patched cells"""
+    match = _DIMENSION_RE.search(sheet_xml)
+    if match is None or not updates:
+        return sheet_xml
+    refs = re.findall(r'([A-Z]+)(\d+)', match.group(1))
+    if not refs:
+        return sheet_xml
+    first_col, first_row = column_index_from_string(refs[0][0]), int(refs[0][1])
+    last_col, last_row = column_index_from_string(refs[-1][0]), int(refs[-1][1])
+    max_col = max(col for cells in updates.values() for col in cells)
+    last_col = max(last_col, max_col)
+    last_row = max(last_row, max(updates))
+    ref = f"{get_column_letter(first_col)}{first_row}:{get_column_letter(last_col)}{last_row}"
+    return sheet_xml[:match.start(1)] + ref + sheet_xml[match.end(1):]
+
+
+def patch_columns(path, sheet_name, columns, start_row=2, output_path=None):
+    """
+    Overwrite whole columns of one sheet in place
+
+    columns maps a column letter or 1-based index to (header, values); the
+    header goes in row start_row - 1 (skipped when None) and values fill the
+    rows from start_row down. Other sheets are copied through untouched.
+    """
+    updates = {}
+    for column, (header, values) in columns.items():
+        col_idx = _column_index(column)
+        if header is not None:
+            updates.setdefault(start_row - 1, {})[col_idx] = header
+        for row_number, value in enumerate(values, start_row):
+            updates.setdefault(row_number, {})[col_idx] = value
+
+    with zipfile.ZipFile(path) as package:
+        parts = sheet_part_names(package)
+        if sheet_name not in parts:
+            raise KeyError(f"Sheet '{sheet_name}' not found in {path}")
+        part = parts[sheet_name]
+        sheet_xml = package.read(part).decode("utf-8")
+
+    patched = patch_cells(sheet_xml, updates)
+    rewrite_package(path, {part: patched.encode("utf-8")}, output_path=output_path)
+
+
+def patch_column(path, sheet_name, column, values, header=None, start_row=2, output_path=None):
+    """Overwrite a single column of one sheet in place"""
+    patch_columns(path, sheet_name, {column: (header, values)}, start_row=start_row, output_path=output_path)
+
+
+def _read_sheet_xml(package, path, sheet_name):
+    parts = sheet_part_names(package)
+    if sheet_name not in parts:
+        raise KeyError(f"Sheet '{sheet_name}' not found in {path}")
+    return parts[sheet_name], package.read(parts[sheet_name]).decode("utf-8")
+
+
+def _iter_rows(sheet_xml):
+    """(row number, row match) for every row, numbering rows without an r attribute"""
+    sheet_data = _SHEET_DATA_RE.search(sheet_xml)
+    if sheet_data is None:
+        raise ValueError("Worksheet has no sheetData element")
+    row_number = 0
+    for match in _ROW_RE.finditer(sheet_data.group(1) or ''):
+        number = _ROW_NUMBER_RE.search(match.group(1))
+        row_number = int(number.group(1)) if number else row_number + 1
+        yield row_number, match
+
+
+def _text(xml):
+    return unescape_xml("".join(re.findall(r'<t\b[^>]*?(?:/>|>(.*?)</t>)', xml, re.S)))
+
+
+def _cell_value(cell, shared):
+    """Python value of one cell's XML, the way openpyxl reads it"""
+    cell_type = re.search(r'\bt="(\w+)"', cell.group(1))
+    cell_type = cell_type.group(1) if cell_type else 'n'
+    if cell_type == 'inlineStr':
+        return _text(cell.group(0))
+    value = re.search(r'<v>(.*?)</v>', cell.group(0), re.S)
+    if value is None:
+        return None
+    value = value.group(1)
+    if cell_type == 's':
+        return shared[int(value)]
+    if cell_type == 'b':
+        return value == '1'
+    if cell_type in ('str', 'e'):
+        return unescape_xml(value)
+    return float(value) if re.search(r'[.eE]', value) else int(value)
+
+
+def read_cells(path, sheet_name, rows=(), columns=()):
+    """
+    Values of some whole rows and whole columns of one sheet
+
+    Returns {row number: {column index: value}} holding every non-empty cell
+    that is in one of rows or in one of columns. Only that sheet's XML and the
+    shared string table are read; cells right of the wanted columns are not
+    decoded.
+    """
+    rows = set(rows)
+    columns = {_column_index(column) for column in columns}
+    last_column = max(columns, default=0)
+    with zipfile.ZipFile(path) as package:
+        _, sheet_xml = _read_sheet_xml(package, path, sheet_name)
+        shared = []
+        if "xl/sharedStrings.xml" in package.namelist():
+            shared_xml = package.read("xl/sharedStrings.xml").decode("utf-8")
+            shared = [_text(m.group(1) or '') for m in re.finditer(r"<si>(.*?)</si>|<si/>", shared_xml, re.S)]
+
+    cells = {}
+    for row_number, match in _iter_rows(sheet_xml):
+        whole_row = row_number in rows
+        if not whole_row and not columns:
+            continue
+        col_idx = 0
+        for cell in _CELL_RE.finditer(match.group(2) or ''):
+            ref = _REF_RE.search(cell.group(1))
+            col_idx = column_index_from_string(ref.group(1)) if ref else col_idx + 1
+            if not whole_row and col_idx > last_column:
+                break
+            if whole_row or col_idx in columns:
+                value = _cell_value(cell, shared)
+                if value is not None:
+                    cells.setdefault(row_number, {})[col_idx] = value
+    return cells
+
+
+def remove_rows(sheet_xml, row_numbers):
+    """
+    Delete rows from a worksheet's XML, moving the rows below them up
+
+    Rows and cells below a removed row are renumbered. Formulas, merged
+    cells and other references to the moved rows are not adjusted.
+    """
+    removed = sorted(set(row_numbers))
+    if not removed:
+        return sheet_xml
+    sheet_data = _SHEET_DATA_RE.search(sheet_xml)
+
+    pieces = []
+    dropped = 0
+    for row_number, match in _iter_rows(sheet_xml):
+        shift = bisect.bisect_left(removed, row_number)
+        if shift < len(removed) and removed[shift] == row_number:
+            dropped += 1
+            continue
+        xml = match.group(0)
+        if not _ROW_NUMBER_RE.search(match.group(1)):
+            xml = _numbered_tag(xml, 'row', str(row_number))
+        if shift:
+            new_number = row_number - shift
+            xml = _ROW_NUMBER_RE.sub(f'r="{new_number}"', xml, count=1)
+            xml = re.sub(r'(<c\b[^>]*?\br="[A-Z]+)\d+"', rf'\g<1>{new_number}"', xml)
+        pieces.append(xml)
+
+    new_sheet_data = f'<sheetData>{"".join(pieces)}</sheetData>'
+    sheet_xml = sheet_xml[:sheet_data.start()] + new_sheet_data + sheet_xml[sheet_data.end():]
+
+    match = _DIMENSION_RE.search(sheet_xml)
+    refs = re.findall(r'([A-Z]+)(\d+)', match.group(1)) if match else []
+    if len(refs) == 2 and dropped:
+        last_row = max(int(refs[0][1]), int(refs[1][1]) - dropped)
+        ref = f"{refs[0][0]}{refs[0][1]}:{refs[1][0]}{last_row}"
+        sheet_xml = sheet_xml[:match.start(1)] + ref + sheet_xml[match.end(1):]
+    return sheet_xml
+
+
+def patch_rows(path, sheet_name, updates=None, appended=(), deleted=(), output_path=None):
+    """
+    Update, append and delete rows of one sheet in a single rewrite
+
+    updates maps row number -> {column index: value}; appended lists rows of
+    values (from column 1) to add below the last row; deleted lists row
+    numbers to remove, moving the rows below them up. Row numbers refer to
+    the sheet before the patch. Other rows and sheets are copied through.
+    """
+    with zipfile.ZipFile(path) as package:
+        part, sheet_xml = _read_sheet_xml(package, path, sheet_name)
+
+    updates = dict(updates or {})
+    last_row = max((row_number for row_number, _ in _iter_rows(sheet_xml)), default=0)
+    for row_number, values in enumerate(appended, last_row + 1):
+        updates[row_number] = dict(enumerate(values, 1))
+    if updates:
+        sheet_xml = patch_cells(sheet_xml, updates)
+    sheet_xml = remove_rows(sheet_xml, deleted)
+    rewrite_package(path, {part: sheet_xml.encode("utf-8")}, output_path=output_path)
+
+
+# Sheet injection ---------------------------------------------------------
+
+WORKSHEET_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+WORKSHEET_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+HYPERLINK_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink"
+RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+# Style collections merged from a rendered sheet, in styles.xml order
+_STYLE_SECTIONS = [('fonts', 'font'), ('fills', 'fill'), ('borders', 'border'),
+                   ('cellXfs', 'xf'), ('dxfs', 'dxf')]
+
+
+def new_sheet(title):
+    """Create a worksheet in a scratch workbook, ready to be rendered and injected"""
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = title
+    return worksheet
+
+
+def load_sheet(path, sheet_name):
+    """
+    Load a single sheet of a package into a scratch workbook
+
+    Only that sheet's XML is parsed. Edit the returned worksheet and pass it
+    to inject_sheet to write it back.
+    """
+    with zipfile.ZipFile(path) as package:
+        parts = sheet_part_names(package)
+        if sheet_name not in parts:
+            raise KeyError(f"Sheet '{sheet_name}' not found in {path}")
+        others = {part for name, part in parts.items() if name != sheet_name}
+        others |= {_rels_part(part) for part in others}
+
+        workbook_xml = package.read("xl/workbook.xml").decode("utf-8")
+        sheet_tags = [tag for tag in re.findall(r"<sheet\b[^>]*>", workbook_xml)
+                      if unescape_xml(re.search(r'\bname="([^"]*)"', tag).group(1)) == sheet_name]
+        workbook_xml = re.sub(r"<sheets>.*?</sheets>", lambda m: f"<sheets>{sheet_tags[0]}</sheets>",
+                              workbook_xml, flags=re.S)
+        # Defined names may point at the sheets left out
+        workbook_xml = re.sub(r"<definedNames\s*/>|<definedNames>.*?</definedNames>", "", workbook_xml, flags=re.S)
+        workbook_xml = re.sub(r'\b(activeTab|firstSheet)="\d+"', r'\1="0"', workbook_xml)
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as scratch:
+            for info in package.infolist():
+                if info.filename in others:
+                    continue
+                data = workbook_xml.encode("utf-8") if info.filename == "xl/workbook.xml" else package.read(info)
+                scratch.writestr(info.filename, data)
+
+    buffer.seek(0)
+    return load_workbook(buffer)[sheet_name]
+
+
+def inject_sheet(path, worksheet, output_path=None):
+    """Add a rendered worksheet to the package, replacing any sheet with the same title"""
+    inject_sheets(path, [worksheet], output_path=output_path)
+
+
+def inject_sheets(path, worksheets, output_path=None, hidden=()):
+    """
+    Add or replace several worksheets in one rewrite of the package
+
+    Each worksheet is rendered from its scratch workbook, its styles are merged
+    into the package's styles.xml and its strings are stored inline, so no
+    other sheet is parsed or rewritten. A replaced sheet keeps its position
+    and visibility; new sheets are appended, hidden when their title is in
+    hidden.
+    """
+    with zipfile.ZipFile(path) as package:
+        names = set(package.namelist())
+        parts = sheet_part_names(package)
+        workbook_xml = package.read("xl/workbook.xml").decode("utf-8")
+        rels_xml = package.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+        types_xml = package.read("[Content_Types].xml").decode("utf-8")
+        styles_xml = package.read("xl/styles.xml").decode("utf-8")
+
+    replacements = {}
+    additions = {}
+    removals = set()
+    for worksheet in worksheets:
+        sheet_xml, sheet_rels, source_styles = _render_sheet(worksheet)
+        styles_xml, index_maps = merge_styles(styles_xml, source_styles)
+        sheet_xml = _remap_sheet_styles(sheet_xml, index_maps)
+
+        title = worksheet.title
+        if title in parts:
+            part = parts[title]
+            replacements[part] = sheet_xml.encode("utf-8")
+            if _rels_part(part) in names:
+                removals.add(_rels_part(part))
+        else:
+            part = _free_sheet_part(names | set(additions))
+            additions[part] = sheet_xml.encode("utf-8")
+            rel_id = _free_rel_id(rels_xml)
+            rels_xml = rels_xml.replace(
+                "</Relationships>",
+                f'<Relationship Type="{WORKSHEET_REL_TYPE}" Target="/{part}" Id="{rel_id}"/></Relationships>')
+            workbook_xml = _add_workbook_sheet(workbook_xml, title, rel_id,
+                                               'hidden' if title in hidden else 'visible')
+            types_xml = types_xml.replace(
+                "</Types>", f'<Override PartName="/{part}" ContentType="{WORKSHEET_CONTENT_TYPE}"/></Types>')
+            parts[title] = part
+
+        if sheet_rels is not None:
+            removals.discard(_rels_part(part))
+            if _rels_part(part) in names:
+                replacements[_rels_part(part)] = sheet_rels.encode("utf-8")
+            else:
+                additions[_rels_part(part)] = sheet_rels.encode("utf-8")
+
+    replacements.update({
+        "xl/workbook.xml": workbook_xml.encode("utf-8"),
+        "xl/_rels/workbook.xml.rels": rels_xml.encode("utf-8"),
+        "[Content_Types].xml": types_xml.encode("utf-8"),
+        "xl/styles.xml": styles_xml.encode("utf-8"),
+    })
+    rewrite_package(path, replacements, output_path=output_path, additions=additions, removals=removals)
+
+
+def _rels_part(part):
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", f"{name}.rels")
+
+
+def _render_sheet(worksheet):
+    """Serialize a worksheet on its own; returns (sheet XML with inline strings, rels XML or None, styles XML)"""
+    workbook = worksheet.parent
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    with zipfile.ZipFile(buffer) as package:
+        part = sheet_part_names(package)[worksheet.title]
+        sheet_xml = package.read(part).decode("utf-8")
+        styles_xml = package.read("xl/styles.xml").decode("utf-8")
+        shared = []
+        if "xl/sharedStrings.xml" in package.namelist():
+            shared_xml = package.read("xl/sharedStrings.xml").decode("utf-8")
+            shared = [m.group(1) or '' for m in re.finditer(r"<si>(.*?)</si>|<si/>", shared_xml, re.S)]
+        sheet_rels = None
+        if _rels_part(part) in package.namelist():
+            sheet_rels = package.read(_rels_part(part)).decode("utf-8")
+            rel_types = re.findall(r'\bType="([^"]+)"', sheet_rels)
+            if any(rel_type != HYPERLINK_REL_TYPE for rel_type in rel_types):
+                raise ValueError(f"Sheet '{worksheet.title}' has drawings, comments or tables, "
+                                 "which cannot be injected")
+
+    def inline(match):
+        attrs = match.group(1)
+        if not re.search(r'\bt="s"', attrs):
+            return match.group(0)
+        index = int(re.search(r"<v>(\d+)</v>", match.group(2)).group(1))
+        attrs = re.sub(r'\bt="s"', 't="inlineStr"', attrs)
+        return f"<c{attrs}><is>{shared[index]}</is></c>"
+
+    sheet_xml = _CELL_RE_WITH_BODY.sub(inline, sheet_xml)
+    # The sheet was the active tab of its scratch workbook
+    sheet_xml = re.sub(r'\s+tabSelected="1"', '', sheet_xml)
+    return sheet_xml, sheet_rels, styles_xml
+
+
+_CELL_RE_WITH_BODY = re.compile(r'<c\b([^>]*?)(?<!/)>(.*?)</c>', re.S)
+
+
+def _canonical(xml):
+    """Normalize whitespace so equal style records compare equal across writers"""
+    return re.sub(r'\s*(/?>)', r'\1', re.sub(r'\s+', ' ', xml.strip()))
+
+
+def _style_section(styles_xml, section):
+    return re.search(rf'<{section}\b[^>]*?(?:/>|>(.*?)</{section}>)', styles_xml, re.S)
+
+
+def _style_items(styles_xml, section, item):
+    match = _style_section(styles_xml, section)
+    if match is None or not match.group(1):
+        return []
+    return re.findall(rf'<{item}\b[^>]*?/>|<{item}\b[^>]*?>.*?</{item}>', match.group(1), re.S)
+
+
+def _set_style_items(styles_xml, section, item_xml_list):
+    body = "".join(item_xml_list)
+    new_section = f'<{section} count="{len(item_xml_list)}">{body}</{section}>'
+    match = _style_section(styles_xml, section)
+    if match is not None:
+        return styles_xml[:match.start()] + new_section + styles_xml[match.end():]
+    # Missing sections go where the schema expects them
+    if section == 'numFmts':
+        opening = re.search(r'<styleSheet\b[^>]*>', styles_xml)
+        return styles_xml[:opening.end()] + new_section + styles_xml[opening.end():]
+    anchor = re.search(r'</cellStyles>|<cellStyles\b[^>]*/>|</cellXfs>', styles_xml)
+    return styles_xml[:anchor.end()] + new_section + styles_xml[anchor.end():]
+
+
+def _remap_attrs(xml, attr_maps):
+    for attr, mapping in attr_maps.items():
+        xml = re.sub(rf'\b{attr}="(\d+)"', lambda m: f'{attr}="{mapping.get(int(m.group(1)), int(m.group(1)))}"', xml)
+    return xml
+
+
+def merge_styles(target_xml, source_xml):
+    """
+    Merge the style records of source_xml into target_xml
+
+    Returns the new target styles XML and a map per collection from source
+    indices to target indices. Records already present are reused.
+    """
+    maps = {}
+
+    # Custom number formats (ids from 164) are renumbered; built-in ids are shared
+    target_formats = {int(m.group(1)): m.group(2) for m in
+                      re.finditer(r'<numFmt\b[^>]*?numFmtId="(\d+)"[^>]*?formatCode="([^"]*)"', target_xml)}
+    source_formats = {int(m.group(1)): m.group(2) for m in
+                      re.finditer(r'<numFmt\b[^>]*?numFmtId="(\d+)"[^>]*?formatCode="([^"]*)"', source_xml)}
+    by_code = {code: fmt_id for fmt_id, code in target_formats.items()}
+    num_fmt_map = {}
+    for fmt_id, code in source_formats.items():
+        if code not in by_code:
+            new_id = max([163] + list(target_formats)) + 1
+            target_formats[new_id] = code
+            by_code[code] = new_id
+        num_fmt_map[fmt_id] = by_code[code]
+    if num_fmt_map:
+        target_xml = _set_style_items(target_xml, 'numFmts', [
+            f'<numFmt numFmtId="{fmt_id}" formatCode="{code}"/>' for fmt_id, code in sorted(target_formats.items())])
+    maps['numFmtId'] = num_fmt_map
+
+    attr_names = {'fonts': 'fontId', 'fills': 'fillId', 'borders': 'borderId', 'cellXfs': 's', 'dxfs': 'dxfId'}
+    for section, item in _STYLE_SECTIONS:
+        target_items = _style_items(target_xml, section, item)
+        source_items = _style_items(source_xml, section, item)
+        if section == 'cellXfs':
+            source_items = [_remap_attrs(xf, {'numFmtId': maps['numFmtId'], 'fontId': maps['fontId'],
+                                              'fillId': maps['fillId'], 'borderId': maps['borderId']})
+                            for xf in source_items]
+        elif section == 'dxfs':
+            source_items = [_remap_attrs(dxf, {'numFmtId': maps['numFmtId']}) for dxf in source_items]
+
+        positions = {}
+        for index, xml in enumerate(target_items):
+            positions.setdefault(_canonical(xml), index)
+        mapping = {}
+        appended = False
+        for index, xml in enumerate(source_items):
+            key = _canonical(xml)
+            if key not in positions:
+                positions[key] = len(target_items)
+                target_items.append(xml)
+                appended = True
+            mapping[index] = positions[key]
+        if appended:
+            target_xml = _set_style_items(target_xml, section, target_items)
+        maps[attr_names[section]] = mapping
+    return target_xml, maps
+
+
+def _remap_sheet_styles(sheet_xml, maps):
+    """Point a rendered sheet's style references at the merged style records"""
+    xf_map = maps['s']
+
+    def remap_tag(match):
+        tag = re.sub(r'\bs="(\d+)"', lambda m: f's="{xf_map.get(int(m.group(1)), 0)}"', match.group(0))
+        return re.sub(r'\bstyle="(\d+)"', lambda m: f'style="{xf_map.get(int(m.group(1)), 0)}"', tag)
+
+    sheet_xml = re.sub(r'<(?:c|row|col)\b[^>]*>', remap_tag, sheet_xml)
+    return _remap_attrs(sheet_xml, {'dxfId': maps['dxfId']})
+
+
+def _free_sheet_part(names):
+    index = 1
+    while f"xl/worksheets/sheet{index}.xml" in names:
+        index += 1
+    return f"xl/worksheets/sheet{index}.xml"
+
+
+def _free_rel_id(rels_xml):
+    used = {int(n) for n in re.findall(r'\bId="rId(\d+)"', rels_xml)}
+    return f"rId{max(used | {0}) + 1}"
+
+
+def _add_workbook_sheet(workbook_xml, title, rel_id, state='visible'):
+    """Append a sheet entry to workbook.xml"""
+    # Use the root element's prefix for the relationships namespace; when only
+    # the other sheet entries declare it (or nothing does), declare it on the entry
+    root = re.search(r'<workbook\b[^>]*>', workbook_xml)
+    prefix = re.search(rf'xmlns:([\w.-]+)="{re.escape(RELATIONSHIPS_NS)}"', root.group(0)) if root else None
+    declaration = '' if prefix else f' xmlns:r="{RELATIONSHIPS_NS}"'
+    prefix = prefix.group(1) if prefix else 'r'
+    sheet_ids = [int(n) for n in re.findall(r'<sheet\b[^>]*\bsheetId="(\d+)"', workbook_xml)]
+    entry = (f'<sheet{declaration} name="{escape(title, {chr(34): "&quot;"})}" sheetId="{max(sheet_ids + [0]) + 1}" '
+             f'state="{state}" {prefix}:id="{rel_id}"/>')
+    if re.search(r'<sheets\s*/>', workbook_xml):
+        return re.sub(r'<sheets\s*/>', lambda m: f"<sheets>{entry}</sheets>", workbook_xml, count=1)
+    return workbook_xml.replace("</sheets>", f"{entry}</sheets>", 1)
+
+
+def sheet_names(path):
+    """Sheet names of a package in workbook order, without loading the workbook"""
+    with zipfile.ZipFile(path) as package:
+        return list(sheet_part_names(package))